@@ -0,0 +1,186 @@
+"""Headless batch runs of the research graph.
+
+Reads research requests from a JSONL file, one object per line::
+
+    {"id": "uganda-coffee", "query": "Coffee export volumes from Uganda 2019-2024", "clarification": "Use FAO data"}
+
+``id`` and ``clarification`` are optional. Requests run concurrently on one
+event loop. If a run stops to ask a clarification question, the request's
+``clarification`` is sent as the reply; without one, ``--clarification skip``
+replies with a standing instruction to proceed on reasonable assumptions and
+``--clarification fail`` records the question as an error.
+
+For each request the output directory gets ``<id>.md`` (formatted report) and
+``<id>.json`` (brief, report, Vega-Lite chart specs and timings), and ``results.jsonl`` gets one line
+per finished run with its status, end-to-end time and per-node times.
+Requests already recorded as ``ok`` in ``results.jsonl`` are skipped, so an
+interrupted batch resumes where it stopped.
+
+    python -m agents.batch_runner requests.jsonl --out batch_output --concurrency 4
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agents.scoping_agent import agent
+from utils.chart_specs import spec_of
+from utils.document_export import format_research_report
+from utils.history_compaction import message_text
+from utils.node_timing import record_task_event
+
+SKIP_CLARIFICATION_REPLY = (
+    "No further details are available. Proceed with reasonable assumptions and state them in the report."
+)
+# A run asks at most this many clarification questions before it is marked as an error
+MAX_CLARIFICATION_TURNS = 2
+
+
+def load_requests(path: str) -> List[Dict]:
+    """Parse the JSONL request file, assigning a stable id where none is given."""
+    requests = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            if not request.get("query"):
+                raise ValueError(f"{path}:{line_number}: request has no 'query'.")
+            request.setdefault("id", hashlib.sha1(request["query"].encode()).hexdigest()[:12])
+            requests.append(request)
+    return requests
+
+
+def completed_ids(results_path: str) -> set:
+    if not os.path.exists(results_path):
+        return set()
+    done = set()
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                result = json.loads(line)
+                if result.get("status") == "ok":
+                    done.add(result["id"])
+    return done
+
+
+def _dump(value):
+    return value.model_dump() if hasattr(value, "model_dump") else value
+
+
+async def _run_turn(state, config, node_times: Dict[str, List[float]]) -> Dict:
+    started: Dict[str, float] = {}
+    final: Dict = {}
+    async for mode, chunk in agent.astream(state, config=config, stream_mode=["tasks", "values"]):
+        if mode == "tasks":
+            record_task_event(chunk, started, node_times)
+        else:
+            final = chunk
+    return final
+
+
+async def run_request(request: Dict, clarification_policy: str) -> Dict:
+    """Run one request to a report, answering clarification questions per the policy."""
+    config = {"configurable": {"thread_id": f"batch-{request['id']}-{uuid.uuid4()}"}}
+    state = {"research_brief": "", "messages": [AIMessage(content=request["query"])]}
+    node_times: Dict[str, List[float]] = defaultdict(list)
+    begin = time.perf_counter()
+    final: Dict = {}
+    for _ in range(MAX_CLARIFICATION_TURNS + 1):
+        final = await _run_turn(state, config, node_times)
+        if final.get("research_report"):
+            break
+        messages = final.get("messages") or []
+        question = message_text(messages[-1]) if messages else ""
+        reply = request.get("clarification")
+        if not reply and clarification_policy == "skip":
+            reply = SKIP_CLARIFICATION_REPLY
+        if not reply:
+            raise RuntimeError(f"Clarification needed: {question}")
+        # Resume the same thread with only the reply; the rest of the state is in its checkpoint
+        state = {"messages": [HumanMessage(content=reply)]}
+        request = {**request, "clarification": None}
+    else:
+        raise RuntimeError("No report after answering clarification questions.")
+    return {
+        "final": final,
+        "seconds": time.perf_counter() - begin,
+        "nodes": {name: round(sum(times), 3) for name, times in sorted(node_times.items())},
+    }
+
+
+def write_outputs(out_dir: str, request: Dict, outcome: Dict) -> None:
+    final = outcome["final"]
+    report = _dump(final.get("research_report"))
+    with open(os.path.join(out_dir, f"{request['id']}.md"), "w", encoding="utf-8") as f:
+        f.write(format_research_report(report))
+    with open(os.path.join(out_dir, f"{request['id']}.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "id": request["id"],
+            "query": request["query"],
+            "research_brief": final.get("research_brief", ""),
+            "research_report": report,
+            "graphs": [spec_of(graph) for graph in final.get("graphs") or []],
+            "seconds": round(outcome["seconds"], 3),
+            "nodes": outcome["nodes"],
+        }, f, indent=2, default=str)
+
+
+async def run_batch(requests: List[Dict], out_dir: str, concurrency: int = 4,
+                    clarification_policy: str = "skip") -> List[Dict]:
+    """Run every request not yet completed in ``out_dir`` (failed ones are retried) and append its result line."""
+    os.makedirs(out_dir, exist_ok=True)
+    results_path = os.path.join(out_dir, "results.jsonl")
+    done = completed_ids(results_path)
+    pending = [r for r in requests if r["id"] not in done]
+    print(f"{len(requests)} requests, {len(requests) - len(pending)} already done, {len(pending)} to run")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    results: List[Dict] = []
+
+    async def worker(request: Dict) -> None:
+        async with semaphore:
+            try:
+                outcome = await run_request(request, clarification_policy)
+                write_outputs(out_dir, request, outcome)
+                result = {"id": request["id"], "status": "ok", "seconds": round(outcome["seconds"], 3),
+                          "nodes": outcome["nodes"]}
+            except Exception as e:
+                result = {"id": request["id"], "status": "error", "error": f"{type(e).__name__}: {e}"}
+        async with write_lock:
+            # One line per finished run, flushed immediately, is what makes the batch resumable
+            with open(results_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result) + "\n")
+            results.append(result)
+            print(f"[{len(results)}/{len(pending)}] {result['id']}: {result['status']}"
+                  + (f" in {result['seconds']:.1f}s" if result["status"] == "ok" else f" ({result['error']})"))
+
+    await asyncio.gather(*(worker(r) for r in pending))
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run research requests from a JSONL file without the UI.")
+    parser.add_argument("requests", help="JSONL file with one {'query': ...} object per line")
+    parser.add_argument("--out", default="batch_output", help="Output directory (reused to resume)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--clarification", choices=["skip", "fail"], default="skip",
+                        help="What to do when a run asks a question and the request has no 'clarification'")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_batch(load_requests(args.requests), args.out, args.concurrency, args.clarification))
+    failed = [r for r in results if r["status"] != "ok"]
+    print(f"Done: {len(results) - len(failed)} ok, {len(failed)} failed. Results in {args.out}/results.jsonl")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Rule-based pre-classifier for the clarification step.
+
+Mirrors the `ClarifyWithUser` fields with cheap local checks (location,
+timeframe, visualization intent) so that obviously specific first requests
+skip the clarification LLM call and go straight to `write_research_brief`.
+Anything the rules are not sure about returns None and is left to the LLM.
+
+Run ``python -m agents.clarification_heuristics`` to measure fast-path rate,
+precision and per-request latency, and to check that the request still reaches
+the brief prompt for every fast-path decision. It reports two labelled sets:
+``agents/fixtures/clarification_cases.jsonl`` was written alongside the rules
+(a regression check), ``agents/fixtures/clarification_heldout.jsonl`` was
+labelled from the clarification prompt's rules without looking at these and is
+never used to tune them; quote the held-out numbers.
+"""
+
+import json
+import os
+import re
+import time
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage
+from langgraph.graph.message import add_messages
+
+from agents.state_scope import ClarifyWithUser
+from utils.history_compaction import compact_history, status_message
+
+_PLACES = {
+    # Countries and regions
+    "africa", "asia", "europe", "america", "usa", "uk", "canada", "mexico", "brazil",
+    "argentina", "germany", "france", "spain", "italy", "netherlands", "sweden", "norway",
+    "poland", "russia", "china", "japan", "korea", "india", "pakistan", "indonesia",
+    "australia", "nigeria", "kenya", "uganda", "tanzania", "rwanda", "ethiopia", "ghana",
+    "egypt", "morocco", "zambia", "zimbabwe",
+    # Cities
+    "nairobi", "kampala", "kigali", "lagos", "accra", "cairo", "johannesburg", "london",
+    "paris", "berlin", "madrid", "rome", "amsterdam", "new york", "san francisco",
+    "los angeles", "chicago", "toronto", "tokyo", "beijing", "shanghai", "singapore",
+    "mumbai", "delhi", "sydney", "dubai",
+}
+_GLOBAL_SCOPE = re.compile(r"\b(global(ly)?|worldwide|world|international(ly)?|across countries)\b", re.I)
+_PLACE_RE = re.compile(r"\b(" + "|".join(re.escape(place) for place in sorted(_PLACES, key=len, reverse=True)) + r")\b", re.I)
+# "in Kisumu County", "Austin, Texas" - capitalised place names the list does not know
+_LOCATION_PHRASE = re.compile(
+    r"\b(?:in|across|within|around|near)\s+[A-Z][a-z]+(?:\s+(?:City|County|State|Province|Region|District)"
+    r"|,\s*[A-Z][a-z]+)"
+)
+_TIMEFRAME = re.compile(
+    r"\b((19|20)\d{2}|last\s+\d+\s+(years?|months?|weeks?|days?)|past\s+(decade|year|\d+\s+years?)"
+    r"|since\s+\w+|this\s+(year|month|quarter)|(q[1-4])\b|january|february|march|april|june|july"
+    r"|august|september|october|november|december|monthly|quarterly|annual(ly)?|yearly|today|current(ly)?)",
+    re.I,
+)
+_TIME_SENSITIVE = re.compile(r"\b(trends?|over time|history|historical|growth|change[sd]?|forecast)\b", re.I)
+_VISUALIZATION = re.compile(r"\b(graph|chart|plot|visuali[sz](e|ation)|diagram|histogram)\b", re.I)
+_GRAPH_TYPE = re.compile(r"\b(bar|line|pie|scatter|area|histogram)\b", re.I)
+_AXIS = re.compile(r"\b([xy])[\s-]?axis\s*[:=]?\s*([^,;()\n]+)", re.I)
+_VERSUS = re.compile(r"([\w\s]+?)\s+(?:vs\.?|versus|against)\s+([\w\s]+)", re.I)
+# Needs enough content to be a research topic rather than a greeting or a single word
+_MIN_WORDS = 4
+# Words of the request repeated in the verification message
+_VERIFICATION_WORDS = 30
+
+
+def _has_location(text: str) -> bool:
+    return bool(_GLOBAL_SCOPE.search(text) or _PLACE_RE.search(text) or _LOCATION_PHRASE.search(text))
+
+
+def heuristic_clarification(messages: List[BaseMessage]) -> Optional[ClarifyWithUser]:
+    """Return a "no clarification needed" decision for clearly specific requests, else None.
+
+    Only the first turn is classified; once a clarification dialog has started
+    the LLM sees the whole exchange.
+    """
+    if len(messages) != 1:
+        return None
+    message = messages[0]
+    text = (message.get("content", "") if isinstance(message, dict) else getattr(message, "content", "")) or ""
+    text = text.strip()
+    if len(text.split()) < _MIN_WORDS:
+        return None
+
+    has_location = _has_location(text)
+    has_timeframe = bool(_TIMEFRAME.search(text))
+    needs_visualization = bool(_VISUALIZATION.search(text))
+    if not has_location:
+        return None
+    if _TIME_SENSITIVE.search(text) and not has_timeframe:
+        return None
+
+    graph_type = x_axis = y_axis = None
+    if needs_visualization:
+        graph_type_match = _GRAPH_TYPE.search(text)
+        axes = {axis.lower(): value.strip() for axis, value in _AXIS.findall(text)}
+        versus = _VERSUS.search(text)
+        x_axis = axes.get("x") or (versus.group(2).strip() if versus else None)
+        y_axis = axes.get("y") or (versus.group(1).strip().split()[-1] if versus else None)
+        if not (graph_type_match and x_axis and y_axis):
+            return None
+        graph_type = graph_type_match.group(1).lower()
+
+    return ClarifyWithUser(
+        need_clarification=False,
+        has_location=has_location,
+        needs_visualization=needs_visualization,
+        graph_type=graph_type,
+        x_axis=x_axis,
+        y_axis=y_axis,
+        question="",
+        verification=_verification(text),
+    )
+
+
+def _verification(text: str) -> str:
+    """Acknowledge the request in its own words, as the clarification LLM does."""
+    words = text.split()
+    topic = " ".join(words[:_VERIFICATION_WORDS]) + (" ..." if len(words) > _VERIFICATION_WORDS else "")
+    return f'I have enough details. I will start the research on "{topic.rstrip(".?!")}" now.'
+
+
+def evaluate(path: Optional[str] = None) -> dict:
+    """Score the heuristic against labelled cases (``{"text": ..., "need_clarification": bool}``)."""
+    path = path or os.path.join(os.path.dirname(__file__), "fixtures", "clarification_cases.jsonl")
+    with open(path, "r", encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    fast_path = correct = 0
+    decisions = []
+    start = time.perf_counter()
+    for case in cases:
+        decision = heuristic_clarification([{"type": "human", "content": case["text"]}])
+        decisions.append(decision)
+        if decision is not None:
+            fast_path += 1
+            correct += not case["need_clarification"]
+    elapsed = time.perf_counter() - start
+    # What `write_research_brief` renders once the clarification update is merged into state
+    kept_query = sum(
+        case["text"] in compact_history(add_messages([{"type": "human", "content": case["text"]}],
+                                                     [status_message(decision.verification)]))
+        for case, decision in zip(cases, decisions) if decision is not None
+    )
+    sufficient = sum(not case["need_clarification"] for case in cases)
+    return {
+        "cases": len(cases),
+        "fast_path_rate": fast_path / len(cases),
+        # Share of skipped LLM calls where skipping was the right call
+        "precision": correct / fast_path if fast_path else 1.0,
+        # Share of sufficient requests that were caught by the fast path
+        "recall": correct / sufficient if sufficient else 1.0,
+        "avg_latency_ms": elapsed / len(cases) * 1000,
+        # Share of fast-path decisions whose brief input still contains the request
+        "brief_keeps_query": kept_query / fast_path if fast_path else 1.0,
+    }
+
+
+if __name__ == "__main__":
+    fixtures = os.path.join(os.path.dirname(__file__), "fixtures")
+    print(json.dumps({
+        "dev": evaluate(os.path.join(fixtures, "clarification_cases.jsonl")),
+        "heldout": evaluate(os.path.join(fixtures, "clarification_heldout.jsonl")),
+    }, indent=2))
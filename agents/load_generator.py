@@ -0,0 +1,266 @@
+"""Load generator for the research graph.
+
+Runs simulated sessions through the compiled `agent` against local fake LLM
+and search servers (`utils.fake_servers`), both answering with log-normal
+latencies around realistic medians. The models are real OpenAI chat clients
+and search goes through the hedged Tavily backend, so HTTP clients, connection
+pools and sockets are part of what is measured. Concurrency is ramped level by
+level; each level reports end-to-end and per-node latency percentiles,
+throughput, and the peak thread count and resident memory sampled while it ran.
+The servers run in a child process, so they do not count towards either.
+
+    python -m agents.load_generator --levels 1,4,16,64 --sessions-per-level 64 --mode async
+    python -m agents.load_generator --mode thread --time-scale 0.05 --json load.json
+
+``--time-scale`` multiplies every simulated latency so a ramp finishes quickly
+while keeping the ratios between nodes. ``--transport inprocess`` uses the
+in-process fake model provider and fake search backend instead of the servers,
+to separate orchestration cost from I/O cost. ``--cassette`` replays a recorded
+session (see `utils.cassettes`) instead, with its recorded latencies scaled by
+``--time-scale``.
+"""
+
+import os
+
+# Offline by construction: never reach real models, the web or the on-disk memory
+os.environ["MODEL_PROVIDER"] = "fake"
+os.environ["SEARCH_BACKEND"] = "fake"
+os.environ["RESEARCH_MEMORY_ENABLED"] = "false"
+# Only the local fake servers see these
+os.environ["OPENAI_API_KEY"] = "fake"
+os.environ["TAVILY_API_KEY"] = "fake"
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.messages import AIMessage
+
+from agents.model_registry import model_registry
+from agents.scoping_agent import agent
+from agents.tools import FakeSearchBackend, TavilyBackend, _hedged, search_tool
+from utils.cassettes import cassette
+from utils.fake_servers import FakeServer
+from utils.node_timing import record_task_event
+
+# Median latencies in seconds before --time-scale
+TIER_LATENCY = {"fast": 0.6, "default": 1.5, "strong": 6.0}
+SEARCH_LATENCY = 1.2
+
+TOPICS = [
+    "Compare lithium-ion and sodium-ion battery costs for grid storage in 2024",
+    "Coffee export volumes from Uganda and Ethiopia over the last five years",
+    "Adoption of mobile money in East Africa since 2015",
+    "Market share of the top five cloud providers in 2024",
+    "Effects of remote work on commercial real estate prices in US cities",
+    "Solar panel efficiency improvements from 2010 to 2024",
+]
+
+
+def _tier_latency(tier: str, time_scale: float) -> float:
+    return TIER_LATENCY.get(tier, TIER_LATENCY["default"]) * time_scale
+
+
+def fake_server(time_scale: float) -> FakeServer:
+    """Fake LLM and search servers with one model name per tier, at the tiers' scaled latencies."""
+    return FakeServer({f"fake-{tier}": _tier_latency(tier, time_scale) for tier in model_registry.tiers},
+                      search_latency=SEARCH_LATENCY * time_scale)
+
+
+def configure(time_scale: float, cassette_path: str = None, server: FakeServer = None) -> None:
+    """Point every model tier and the search tool at the fake servers, in-process fakes or a recorded cassette."""
+    if cassette_path:
+        # The simulated topics differ from the recorded ones; only the traffic shape is replayed
+        cassette.configure("replay", cassette_path, latency_scale=time_scale, search_fallback=True)
+        search_tool.backend = cassette.wrap_search(None)
+        return
+    for tier, spec in model_registry.tiers.items():
+        if server:
+            spec.pop("latency", None)
+            spec.update(provider="openai", model=f"fake-{tier}", base_url=server.openai_url)
+        else:
+            spec.update(provider="fake", latency=_tier_latency(tier, time_scale))
+    model_registry.reset()
+    if server:
+        # The same hedged Tavily stack as production, against the fake server
+        search_tool.backend = _hedged(TavilyBackend(api_base_url=server.tavily_url))
+    else:
+        search_tool.backend = FakeSearchBackend(latency=SEARCH_LATENCY * time_scale)
+
+
+def _session_input(index: int):
+    config = {"configurable": {"thread_id": f"load-{uuid.uuid4()}"}}
+    state = {"research_brief": "", "messages": [AIMessage(content=TOPICS[index % len(TOPICS)])]}
+    return state, config
+
+
+def run_session_sync(index: int, node_times: Dict[str, List[float]]) -> float:
+    state, config = _session_input(index)
+    started: Dict[str, float] = {}
+    begin = time.perf_counter()
+    for event in agent.stream(state, config=config, stream_mode="tasks"):
+        record_task_event(event, started, node_times)
+    return time.perf_counter() - begin
+
+
+async def run_session_async(index: int, node_times: Dict[str, List[float]]) -> float:
+    state, config = _session_input(index)
+    started: Dict[str, float] = {}
+    begin = time.perf_counter()
+    async for event in agent.astream(state, config=config, stream_mode="tasks"):
+        record_task_event(event, started, node_times)
+    return time.perf_counter() - begin
+
+
+class ResourceSampler:
+    """Samples thread count and RSS in a background thread and keeps the peaks."""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def rss_mb() -> float:
+        try:
+            with open("/proc/self/statm", "r") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+        except (OSError, ValueError):
+            import resource
+            # Peak rather than current RSS where /proc is unavailable (kilobytes on Linux)
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self.peak_rss_mb = max(self.peak_rss_mb, self.rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "ResourceSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def _flight_counts() -> Dict[str, Dict[str, int]]:
+    """Cumulative single-flight counters of the search tool and the model registry."""
+    return {kind: {k: v for k, v in flights.stats().items() if k != "in_flight"}
+            for kind, flights in (("search", search_tool.flights), ("llm", model_registry.flights))}
+
+
+def run_level(concurrency: int, sessions: int, mode: str, loop: asyncio.AbstractEventLoop = None) -> Dict:
+    """Run ``sessions`` sessions with at most ``concurrency`` in flight (async mode on ``loop`` if given)."""
+    node_times: Dict[str, List[float]] = defaultdict(list)
+    flights_before = _flight_counts()
+    with ResourceSampler() as sampler:
+        begin = time.perf_counter()
+        if mode == "async":
+            async def main():
+                semaphore = asyncio.Semaphore(concurrency)
+
+                async def bounded(index: int):
+                    async with semaphore:
+                        return await run_session_async(index, node_times)
+
+                return await asyncio.gather(*(bounded(i) for i in range(sessions)), return_exceptions=True)
+
+            outcomes = loop.run_until_complete(main()) if loop else asyncio.run(main())
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="session") as pool:
+                futures = [pool.submit(run_session_sync, i, node_times) for i in range(sessions)]
+                outcomes = []
+                for future in futures:
+                    try:
+                        outcomes.append(future.result())
+                    except Exception as e:
+                        outcomes.append(e)
+        elapsed = time.perf_counter() - begin
+    latencies = [o for o in outcomes if isinstance(o, float)]
+    errors = len(outcomes) - len(latencies)
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "end_to_end": _percentiles(latencies),
+        "nodes": {name: _percentiles(times) for name, times in sorted(node_times.items())},
+        "peak_threads": sampler.peak_threads,
+        "peak_rss_mb": sampler.peak_rss_mb,
+        "coalesced": {kind: {k: v - flights_before[kind][k] for k, v in counts.items()}
+                      for kind, counts in _flight_counts().items()},
+    }
+
+
+def print_level(result: Dict) -> None:
+    e2e = result["end_to_end"]
+    print(f"\n== concurrency {result['concurrency']}: {result['sessions']} sessions, {result['errors']} errors, "
+          f"{result['throughput_per_s']:.2f} sessions/s, peak threads {result['peak_threads']}, "
+          f"peak RSS {result['peak_rss_mb']:.0f} MB")
+    print("coalesced: " + ", ".join(f"{kind} {c['coalesced']}/{c['calls']} calls" for kind, c in result["coalesced"].items()))
+    print(f"{'node':28s} {'p50 s':>8s} {'p95 s':>8s} {'p99 s':>8s}")
+    print(f"{'end_to_end':28s} {e2e['p50']:8.3f} {e2e['p95']:8.3f} {e2e['p99']:8.3f}")
+    for name, stats in result["nodes"].items():
+        print(f"{name:28s} {stats['p50']:8.3f} {stats['p95']:8.3f} {stats['p99']:8.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ramp concurrent simulated sessions through the research graph.")
+    parser.add_argument("--levels", default="1,4,16,64", help="Comma-separated concurrency levels")
+    parser.add_argument("--sessions-per-level", type=int, default=0,
+                        help="Sessions per level (default: 2x the concurrency, at least 4)")
+    parser.add_argument("--mode", choices=["async", "thread"], default="async",
+                        help="astream on one event loop, or stream from a pool of threads like the Streamlit app")
+    parser.add_argument("--time-scale", type=float, default=0.1, help="Multiplier for simulated latencies")
+    parser.add_argument("--transport", choices=["http", "inprocess"], default="http",
+                        help="Local fake LLM and search servers over HTTP, or in-process fakes without any I/O")
+    parser.add_argument("--cassette", help="Replay this recorded cassette instead of the simulated fakes")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    server = fake_server(args.time_scale) if args.transport == "http" and not args.cassette else None
+    loop = None
+    if server:
+        server.start()
+    try:
+        configure(args.time_scale, args.cassette, server)
+        # One loop for every level: the async HTTP clients keep pooled connections bound to it
+        loop = asyncio.new_event_loop() if args.mode == "async" else None
+        results = []
+        for concurrency in [int(level) for level in args.levels.split(",")]:
+            sessions = args.sessions_per_level or max(4, 2 * concurrency)
+            result = run_level(concurrency, sessions, args.mode, loop)
+            print_level(result)
+            results.append(result)
+    finally:
+        if loop:
+            loop.close()
+        if server:
+            server.stop()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"mode": args.mode, "transport": "cassette" if args.cassette else args.transport,
+                       "time_scale": args.time_scale, "levels": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
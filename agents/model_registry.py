@@ -0,0 +1,211 @@
+"""Per-node model tiers.
+
+Each LLM-calling node asks the registry for its model by node name. Nodes map
+to a tier (``fast``, ``default``, ``strong``) and tiers map to a provider and
+model name, so latency-sensitive steps can use a cheaper model while the
+report keeps a stronger one. Models are created lazily and cached per tier.
+
+Configuration, in increasing precedence:
+- the defaults below
+- a JSON file named by ``MODEL_REGISTRY_CONFIG``:
+  ``{"tiers": {"fast": {"provider": "google", "model": "..."}}, "nodes": {"plan_research": "fast"}}``
+- ``MODEL_PROVIDER`` to switch every tier to one provider (e.g. ``fake``)
+- ``MODEL_TIER_FAST`` / ``MODEL_TIER_DEFAULT`` / ``MODEL_TIER_STRONG`` (``provider:model`` or just ``model``)
+- ``MODEL_NODE_TIERS``, e.g. ``generate_report=default,plan_research=fast``
+
+Models are wrapped per node by the record/replay cassette when
+``CASSETTE_MODE`` is set (see `utils.cassettes`). Identical concurrent calls to
+a temperature-0 tier share one in-flight request (see `utils.single_flight`).
+
+The ``fake`` provider returns placeholder structured outputs without any
+network access, for local testing of the graphs. A tier's ``latency`` option
+(seconds) makes its fake model simulate response times. The ``openai``
+provider talks to any OpenAI-compatible endpoint given by the tier's
+``base_url`` option, such as the local fake server in `utils.fake_servers`.
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import threading
+import time
+import typing
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+
+from utils.cassettes import cassette
+from utils.single_flight import SINGLE_FLIGHT_ENABLED, CoalescingModel, SingleFlight
+
+load_dotenv()
+
+DEFAULT_TIERS: Dict[str, Dict[str, Any]] = {
+    "fast": {"provider": "google", "model": "gemini-2.0-flash-lite", "temperature": 0},
+    "default": {"provider": "google", "model": "gemini-2.0-flash", "temperature": 0},
+    "strong": {"provider": "google", "model": "gemini-2.5-pro", "temperature": 0},
+}
+
+DEFAULT_NODE_TIERS: Dict[str, str] = {
+    "clarify_with_user": "fast",
+    "scope_and_plan": "default",
+    "write_research_brief": "default",
+    "plan_research": "fast",
+    "extract_findings": "fast",
+    "generate_report": "strong",
+    "researcher": "default",
+    "compress_research": "fast",
+}
+
+
+def _placeholder(annotation):
+    """Build a minimal valid value for a type annotation (used by the fake provider)."""
+    origin = typing.get_origin(annotation)
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    if origin is typing.Union:
+        return _placeholder(args[0]) if args else None
+    if origin in (list, typing.List):
+        return [_placeholder(args[0])] if args else []
+    if origin in (dict, typing.Dict):
+        return {}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        values = {}
+        for name, field in annotation.model_fields.items():
+            values[name] = field.get_default() if not field.is_required() else _placeholder(field.annotation)
+        return annotation(**values)
+    if annotation is bool:
+        return False
+    if annotation in (int, float):
+        return annotation(1)
+    return "fake"
+
+
+class FakeChatModel(FakeListChatModel):
+    """Offline chat model: fixed text replies and placeholder structured outputs.
+
+    ``latency`` (seconds) adds a log-normally distributed delay around that
+    median to every call, for load testing.
+    """
+
+    responses: list = ["fake response"]
+    latency: float = 0.0
+
+    def _delay(self) -> float:
+        return random.lognormvariate(math.log(self.latency), 0.35) if self.latency > 0 else 0.0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self._delay())
+        return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self._delay())
+        return super()._generate(messages, stop=stop, **kwargs)
+
+    def bind_tools(self, tools, *, tool_choice=None, parallel_tool_calls=None, strict=None, **kwargs):
+        # The fake model never calls tools, so the tool-calling options have nothing to act on
+        if kwargs:
+            raise TypeError(f"FakeChatModel.bind_tools() does not support {sorted(kwargs)}")
+        return self
+
+    def with_structured_output(self, schema, *, include_raw: bool = False, method=None, strict=None, **kwargs):
+        if kwargs:
+            raise TypeError(f"FakeChatModel.with_structured_output() does not support {sorted(kwargs)}")
+
+        def output():
+            parsed = _placeholder(schema)
+            return {"raw": AIMessage(content=""), "parsed": parsed, "parsing_error": None} if include_raw else parsed
+
+        def structured(_input):
+            time.sleep(self._delay())
+            return output()
+
+        async def astructured(_input):
+            await asyncio.sleep(self._delay())
+            return output()
+
+        return RunnableLambda(structured, afunc=astructured)
+
+
+class ModelRegistry:
+    def __init__(self, tiers: Dict[str, Dict[str, Any]] = None, node_tiers: Dict[str, str] = None):
+        self.tiers = {name: dict(spec) for name, spec in (tiers or DEFAULT_TIERS).items()}
+        self.node_tiers = dict(node_tiers or DEFAULT_NODE_TIERS)
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.flights = SingleFlight()
+
+    @classmethod
+    def from_env(cls) -> "ModelRegistry":
+        registry = cls()
+        config_path = os.getenv("MODEL_REGISTRY_CONFIG")
+        if config_path:
+            with open(config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            for name, spec in config.get("tiers", {}).items():
+                registry.tiers.setdefault(name, {}).update(spec)
+            registry.node_tiers.update(config.get("nodes", {}))
+        provider = os.getenv("MODEL_PROVIDER")
+        if provider:
+            # e.g. MODEL_PROVIDER=fake runs every tier offline
+            for spec in registry.tiers.values():
+                spec["provider"] = provider
+        for name in list(registry.tiers):
+            value = os.getenv(f"MODEL_TIER_{name.upper()}")
+            if value:
+                provider, _, model = value.rpartition(":")
+                registry.tiers[name].update({"model": model, **({"provider": provider} if provider else {})})
+        for assignment in filter(None, os.getenv("MODEL_NODE_TIERS", "").split(",")):
+            node, _, tier = assignment.partition("=")
+            registry.node_tiers[node.strip()] = tier.strip()
+        return registry
+
+    def reset(self) -> None:
+        """Drop the cached models, so changed tier specs take effect on the next `get`."""
+        with self._lock:
+            self._models.clear()
+
+    def tier_for(self, node: str) -> str:
+        return self.node_tiers.get(node, "default")
+
+    def _create(self, spec: Dict[str, Any]):
+        options = {k: v for k, v in spec.items() if k not in ("provider", "model")}
+        provider = spec.get("provider", "google")
+        if provider == "fake":
+            return FakeChatModel(latency=float(spec.get("latency", 0)))
+        if provider == "openai":
+            from langchain_openai import ChatOpenAI
+            return ChatOpenAI(model=spec["model"], api_key=os.getenv("OPENAI_API_KEY"), **options)
+        if provider == "google":
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            return ChatGoogleGenerativeAI(model=spec["model"], api_key=os.getenv("GOOGLE_API_KEY"), **options)
+        raise ValueError(f"Unknown model provider '{provider}' for model '{spec.get('model')}'.")
+
+    def get(self, node: str):
+        """Return the (cached) chat model for the tier assigned to ``node``."""
+        if cassette.replaying:
+            # Recorded responses only; no provider client (or API key) needed
+            return cassette.wrap_model(None, node)
+        tier = self.tier_for(node)
+        with self._lock:
+            if tier not in self._models:
+                if tier not in self.tiers:
+                    raise ValueError(f"Node '{node}' is assigned to unknown model tier '{tier}'.")
+                self._models[tier] = self._create(self.tiers[tier])
+            model = cassette.wrap_model(self._models[tier], node)
+        # Only deterministic tiers: sharing a sampled reply would change what each caller gets
+        if SINGLE_FLIGHT_ENABLED and self.tiers[tier].get("temperature") == 0:
+            model = CoalescingModel(self.flights, model, tier)
+        return model
+
+
+model_registry = ModelRegistry.from_env()
+
+
+def get_model(node: str):
+    """Chat model for a graph node, according to the configured tiers."""
+    return model_registry.get(node)
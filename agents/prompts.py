@@ -133,6 +133,74 @@ User: "Show me a price graph of gyms in Kampala"
 """
 
 
+scope_and_plan_prompt = """
+You are scoping and planning a research request in a single step.
+
+Conversation so far:
+<Messages>
+{messages}
+</Messages>
+Date: {date}
+
+Do the following in order:
+
+1. Clarification - decide if ONE clarifying question is needed.
+   - Ask ONLY if critical info is missing (e.g., location, evaluation criteria, visualization details).
+   - If a graph was requested without details, clarify graph type and what goes on the X-axis and Y-axis.
+   - If clarification is needed, set "brief" and "plan" to null and stop.
+
+2. Research brief - if no clarification is needed, translate the conversation into a clear, detailed brief:
+   - Capture all user-stated preferences explicitly (location, evaluation focus, visualization requests).
+   - Define evaluation criteria and acceptable methods to assess them.
+   - Prioritize official websites, reputable review organizations and prominent review aggregators.
+   - If visualization is requested, state the graph type and the X-axis and Y-axis data points with units.
+   - Do not invent constraints the user did not give; phrase the brief in the first person ("I want...").
+
+3. Research plan - create a structured step-by-step plan for the brief. Each step has a step number,
+   an action (e.g., search, summarize, analyze) and a brief description.
+
+Respond ONLY in this JSON schema:
+{{
+  "clarification": {{
+    "need_clarification": bool,
+    "has_location": bool,
+    "needs_visualization": bool,
+    "graph_type": "<string or null>",
+    "x_axis": "<string or null>",
+    "y_axis": "<string or null>",
+    "question": "<string>",
+    "verification": "<string>"
+  }},
+  "brief": {{
+    "research_brief": "<string>",
+    "graph_type": "<string or null>",
+    "x_axis": "<string or null>",
+    "y_axis": "<string or null>",
+    "graph_data": [<list of dicts>] or null
+  }} or null,
+  "plan": {{
+    "topic": "<string>",
+    "steps": [{{"step_number": int, "action": "<string>", "description": "<string>"}}]
+  }} or null
+}}
+"""
+
+extract_findings_prompt = """
+Extract the findings from these search results that are relevant to the query.
+
+Query: {query}
+
+<Search Results>
+{results}
+</Search Results>
+
+Rules:
+- Return at most {max_findings} short, self-contained factual findings.
+- Keep names, numbers, dates and units exactly as written in the results.
+- End each finding with its source URL in parentheses.
+- Skip results that are irrelevant to the query. Return an empty list if nothing is relevant.
+"""
+
 
 research_agent_prompt =  """You are a research assistant conducting research on the user's input topic. For context, today's date is {date}.
 
@@ -142,10 +210,10 @@ You can use any of the tools provided to you to find resources that can help ans
 </Task>
 
 <Available Tools>
-You have access to two main tools:
+You have access to three main tools:
 1. **tavily_search**: For conducting web searches to gather information
 2. **think_tool**: For reflection and strategic planning during research.
-3. **draw_tool**: For creating graphs or visualizations if requested by the user.
+3. **draw_graph**: For creating graphs or visualizations if requested by the user.
 
 
 **CRITICAL: Use think_tool after each search to reflect on results and plan next steps**
@@ -182,6 +250,27 @@ After each search tool call, use think_tool to analyze the results:
 </Show Your Thinking>
 """
 
+compress_research_prompt = """You have conducted research on the following topic by calling tools. For context, today's date is {date}.
+
+Topic:
+{research_topic}
+
+<Raw Notes>
+{raw_notes}
+</Raw Notes>
+
+Your job is to clean up these notes into a compact set of findings for a report writer.
+
+<Guidelines>
+- Keep every relevant fact, figure, name and date, verbatim where possible.
+- Drop duplicates, navigation text, and results unrelated to the topic.
+- Group related findings under short headings.
+- Cite the source URL for each finding inline, e.g. "(https://example.com)".
+- Do not add information that is not in the notes.
+- Keep the output under {max_words} words.
+</Guidelines>
+"""
+
 research_agent_prompt_with_mcp = """You are a research assistant conducting research on the user's input topic using local files. For context, today's date is {date}.
 
 <Task>
@@ -1,28 +1,33 @@
+import asyncio
 import json
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.messages import HumanMessage, AIMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.runnables import RunnableLambda
 from typing import List, Dict
 import re
 import os
 
 from .state import ResearchAgentInput, ResearchAgentState, ResearchPlan, ResearchStep
 from .tools import tavily_search, think_tool, draw_graph
+from .model_registry import get_model
+from utils.chart_specs import build_graph
 from agents import state
 
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0)
 tools = [tavily_search, think_tool, draw_graph]
-llm = llm.bind_tools(tools) # Integrate tools with the LLM
-# binding to tools to the LLM
+
+
+def llm(node: str):
+    """The node's model from the tier registry, with tools integrated."""
+    return get_model(node).bind_tools(tools)
 
 def create_research_agent():
 
     # --------------------------
     # 1. Plan research
     # --------------------------
-    def plan_research(state: ResearchAgentState):
+    def _plan_prompt(state: ResearchAgentState):
         research_brief = state.research_brief
 
         plan_prompt = f"""
@@ -37,8 +42,9 @@ def create_research_agent():
 
         Format the output as JSON matching the ResearchPlan schema.
         """
-        response = llm.invoke([HumanMessage(content=plan_prompt)])
-        
+        return [HumanMessage(content=plan_prompt)]
+
+    def _parse_plan(response):
         try:
             plan_data = json.loads(response.content)
             research_plan = ResearchPlan(**plan_data)
@@ -55,6 +61,12 @@ def create_research_agent():
                 "current_step": "Planning failed"
             }
 
+    def plan_research(state: ResearchAgentState):
+        return _parse_plan(llm("plan_research").invoke(_plan_prompt(state)))
+
+    async def aplan_research(state: ResearchAgentState):
+        return _parse_plan(await llm("plan_research").ainvoke(_plan_prompt(state)))
+
 
     # --------------------------
     # 2. Gather information
@@ -71,6 +83,24 @@ def create_research_agent():
                 "results": results
             })
 
+        return _gathered_update(gathered_info, iterations)
+
+    async def agather_information(state: ResearchAgentState):
+        research_plan = state.research_plan
+        gathered_info = state.gathered_information
+        iterations = state.iterations
+
+        # Search all plan queries concurrently
+        results = await asyncio.gather(*(tavily_search.ainvoke(query) for query in research_plan))
+        for query, result in zip(research_plan, results):
+            gathered_info.append({
+                "query": query,
+                "results": result
+            })
+
+        return _gathered_update(gathered_info, iterations)
+
+    def _gathered_update(gathered_info, iterations):
         return {
             "messages": [AIMessage(content=f"Information gathering completed. Iteration {iterations + 1}")],
             "gathered_information": gathered_info,
@@ -96,7 +126,7 @@ def create_research_agent():
         if not data:
             return {"messages": [AIMessage(content="No numeric data found to generate a graph.")]}
 
-        graph_path = draw_graph(
+        graph = build_graph(
             title=state.get("graph_title", "Research Data"),
             data=data,
             chart_type=state.get("graph_type", "bar"),
@@ -104,14 +134,17 @@ def create_research_agent():
             y_key="value",
             x_label=state.get("graph_x_label", "Entity"),
             y_label=state.get("graph_y_label", "Metric"),
-            filename=state.get("graph_filename", "research_graph.png")
         )
 
         return {
-            "messages": [AIMessage(content=f"Graph created at {graph_path}")],
-            "graph_path": graph_path
+            "messages": [AIMessage(content=f"Chart spec created: {graph.title}")],
+            "graphs": [graph]
         }
 
+    async def agenerate_graph_node(state: ResearchAgentState):
+        # Building a spec is cheap, so there is nothing to take off the event loop
+        return generate_graph_node(state)
+
     # --------------------------
     # 4. Evaluate information
     # --------------------------
@@ -135,10 +168,14 @@ def create_research_agent():
             "current_step": "Evaluation completed - need more information"
         }
 
+    async def aevaluate_information(state: ResearchAgentState):
+        # No I/O here, so the async variant simply reuses the sync logic
+        return evaluate_information(state)
+
     # --------------------------
     # 5. Generate report
     # --------------------------
-    def generate_report(state: ResearchAgentState):
+    def _report_prompt(state: ResearchAgentState):
         gathered_info = state.gathered_information
         research_brief = state.research_brief
 
@@ -155,7 +192,15 @@ def create_research_agent():
 
         Create a report with Introduction, Key Findings, Analysis, Conclusion, and References.
         """
-        response = llm.invoke([HumanMessage(content=report_prompt)])
+        return [HumanMessage(content=report_prompt)]
+
+    def generate_report(state: ResearchAgentState):
+        return _report_update(llm("generate_report").invoke(_report_prompt(state)))
+
+    async def agenerate_report(state: ResearchAgentState):
+        return _report_update(await llm("generate_report").ainvoke(_report_prompt(state)))
+
+    def _report_update(response):
         report = response.content
 
         return {
@@ -168,11 +213,12 @@ def create_research_agent():
     # Build the workflow
     # --------------------------
     workflow = StateGraph(ResearchAgentState)
-    workflow.add_node("plan_research", plan_research)
-    workflow.add_node("gather_information", gather_information)
-    workflow.add_node("generate_graph", generate_graph_node)
-    workflow.add_node("evaluate_information", evaluate_information)
-    workflow.add_node("generate_report", generate_report)
+    # Every node has a native async variant for `ainvoke`/`astream`
+    workflow.add_node("plan_research", RunnableLambda(plan_research, afunc=aplan_research))
+    workflow.add_node("gather_information", RunnableLambda(gather_information, afunc=agather_information))
+    workflow.add_node("generate_graph", RunnableLambda(generate_graph_node, afunc=agenerate_graph_node))
+    workflow.add_node("evaluate_information", RunnableLambda(evaluate_information, afunc=aevaluate_information))
+    workflow.add_node("generate_report", RunnableLambda(generate_report, afunc=agenerate_report))
 
     workflow.set_entry_point("plan_research")
     workflow.add_edge("plan_research", "gather_information")
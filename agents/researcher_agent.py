@@ -0,0 +1,162 @@
+"""Tool-calling researcher subgraph.
+
+A ReAct-style loop over `ResearcherState`:
+1. `llm_call` lets the model decide on tool calls, guided by `research_agent_prompt`
+2. `tool_node` executes every tool call of that turn in parallel
+3. the loop repeats until the model stops calling tools or the
+   `tool_call_iterations` budget is used up
+4. `compress_research` condenses `raw_notes` into `compressed_research`, which
+   is all that is handed back to the parent graph
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import StateGraph, START, END
+from typing_extensions import Literal
+
+from agents.model_registry import get_model
+from agents.prompts import compress_research_prompt, research_agent_prompt
+from agents.state import ResearcherState
+from agents.tools import tavily_search, think_tool, draw_graph
+
+# ===== CONFIGURATION =====
+
+tools = [tavily_search, think_tool, draw_graph]
+tools_by_name = {tool.name: tool for tool in tools}
+
+MAX_TOOL_CALL_ITERATIONS = int(os.getenv("MAX_TOOL_CALL_ITERATIONS", "5"))
+COMPRESSED_RESEARCH_MAX_WORDS = int(os.getenv("COMPRESSED_RESEARCH_MAX_WORDS", "800"))
+_tool_pool = ThreadPoolExecutor(max_workers=int(os.getenv("TOOL_MAX_WORKERS", "8")), thread_name_prefix="tools")
+
+
+def get_today_str() -> str:
+    """Get current date in a human-readable format."""
+    today = datetime.now()
+    return f"{today.strftime('%a %b')} {today.day}, {today.year}"
+
+# ===== NODES =====
+
+def _llm_prompt(state: ResearcherState):
+    return [SystemMessage(content=research_agent_prompt.format(date=get_today_str()))] + list(state["researcher_messages"])
+
+
+def llm_call(state: ResearcherState):
+    """Let the model decide on the next tool calls, or stop."""
+    response = get_model("researcher").bind_tools(tools).invoke(_llm_prompt(state))
+    return {"researcher_messages": [response]}
+
+
+async def allm_call(state: ResearcherState):
+    response = await get_model("researcher").bind_tools(tools).ainvoke(_llm_prompt(state))
+    return {"researcher_messages": [response]}
+
+
+def _run_tool(tool_call) -> str:
+    tool = tools_by_name.get(tool_call["name"])
+    if tool is None:
+        return f"Error: unknown tool '{tool_call['name']}'."
+    try:
+        return str(tool.invoke(tool_call["args"]))
+    except Exception as e:
+        return f"Error: {tool_call['name']} failed: {str(e)}"
+
+
+async def _arun_tool(tool_call) -> str:
+    tool = tools_by_name.get(tool_call["name"])
+    if tool is None:
+        return f"Error: unknown tool '{tool_call['name']}'."
+    try:
+        return str(await tool.ainvoke(tool_call["args"]))
+    except Exception as e:
+        return f"Error: {tool_call['name']} failed: {str(e)}"
+
+
+def _tool_update(state: ResearcherState, tool_calls, observations):
+    return {
+        "researcher_messages": [
+            ToolMessage(content=observation, name=call["name"], tool_call_id=call["id"])
+            for call, observation in zip(tool_calls, observations)
+        ],
+        "tool_call_iterations": state.get("tool_call_iterations", 0) + 1,
+        # Reflections are working notes for the loop, not findings
+        "raw_notes": [
+            observation for call, observation in zip(tool_calls, observations) if call["name"] != think_tool.name
+        ],
+    }
+
+
+def tool_node(state: ResearcherState):
+    """Execute all tool calls from the last model turn in parallel."""
+    tool_calls = state["researcher_messages"][-1].tool_calls
+    observations = list(_tool_pool.map(_run_tool, tool_calls))
+    return _tool_update(state, tool_calls, observations)
+
+
+async def atool_node(state: ResearcherState):
+    tool_calls = state["researcher_messages"][-1].tool_calls
+    observations = await asyncio.gather(*(_arun_tool(call) for call in tool_calls))
+    return _tool_update(state, tool_calls, observations)
+
+
+def should_continue(state: ResearcherState) -> Literal["tool_node", "compress_research"]:
+    """Keep calling tools while the model asks for them and the iteration budget allows."""
+    last_message = state["researcher_messages"][-1]
+    if getattr(last_message, "tool_calls", None) and state.get("tool_call_iterations", 0) < MAX_TOOL_CALL_ITERATIONS:
+        return "tool_node"
+    return "compress_research"
+
+
+def _compress_prompt(state: ResearcherState):
+    raw_notes = "\n\n".join(state.get("raw_notes", []))
+    return [HumanMessage(content=compress_research_prompt.format(
+        date=get_today_str(),
+        research_topic=state["research_topic"],
+        raw_notes=raw_notes or "No notes were collected.",
+        max_words=COMPRESSED_RESEARCH_MAX_WORDS,
+    ))]
+
+
+def compress_research(state: ResearcherState):
+    """Condense the raw notes into compact findings for the parent graph."""
+    if not state.get("raw_notes"):
+        # Nothing was searched; the model's own answer is the finding
+        return {"compressed_research": str(state["researcher_messages"][-1].content)}
+    response = get_model("compress_research").invoke(_compress_prompt(state))
+    return {"compressed_research": str(response.content)}
+
+
+async def acompress_research(state: ResearcherState):
+    if not state.get("raw_notes"):
+        return {"compressed_research": str(state["researcher_messages"][-1].content)}
+    response = await get_model("compress_research").ainvoke(_compress_prompt(state))
+    return {"compressed_research": str(response.content)}
+
+
+def researcher_input(research_topic: str) -> dict:
+    """Initial `ResearcherState` for one research topic."""
+    return {
+        "researcher_messages": [HumanMessage(content=research_topic)],
+        "tool_call_iterations": 0,
+        "research_topic": research_topic,
+        "compressed_research": "",
+        "raw_notes": [],
+    }
+
+# ===== GRAPH CONSTRUCTION =====
+
+researcher_builder = StateGraph(ResearcherState)
+researcher_builder.add_node("llm_call", RunnableLambda(llm_call, afunc=allm_call))
+researcher_builder.add_node("tool_node", RunnableLambda(tool_node, afunc=atool_node))
+researcher_builder.add_node("compress_research", RunnableLambda(compress_research, afunc=acompress_research))
+
+researcher_builder.add_edge(START, "llm_call")
+researcher_builder.add_conditional_edges("llm_call", should_continue, ["tool_node", "compress_research"])
+researcher_builder.add_edge("tool_node", "llm_call")
+researcher_builder.add_edge("compress_research", END)
+
+researcher_agent = researcher_builder.compile()
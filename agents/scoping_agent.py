@@ -27,36 +27,46 @@ The workflow uses structured output to make deterministic decisions about
 whether sufficient context exists to proceed with research.
 """
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import json
+import logging
 import re
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import Optional
 from typing_extensions import Literal
-from langchain_core.messages import HumanMessage, AIMessage, get_buffer_string
+from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import InMemorySaver
-from langgraph.types import Command
-from langgraph.graph import MessagesState
-
-
-
-from agents.state import ResearchPlan, ResearchReport, ResearchAgentState
-from agents.tools import tavily_search, think_tool, draw_graph
-from agents.prompts import clarify_with_user_instructions, transform_messages_into_research_topic_prompt
-from agents.state_scope import ClarifyWithUser, ResearchQuestion, AgentInputState
+from langgraph.types import Command, Send
+
+
+
+from agents.state import ResearchPlan, ReportDraft, ResearchReport, ResearchAgentState, GatheredInformation, InformationItem, ExtractedFindings, SubResearchTask
+from agents.tools import search_tool, tavily_search, think_tool, draw_graph
+from agents.prompts import clarify_with_user_instructions, transform_messages_into_research_topic_prompt, scope_and_plan_prompt, extract_findings_prompt
+from agents.state_scope import ClarifyWithUser, ResearchQuestion, ScopeAndPlan, AgentInputState
+from agents.clarification_heuristics import heuristic_clarification
+from agents.model_registry import get_model
+from agents.researcher_agent import researcher_agent, researcher_input
+from utils.research_memory import research_memory, tokenize
+from utils.vector_index import build_index
+from utils.search_prefetch import SearchPrefetcher
+from utils.checkpoint_blobs import create_checkpointer
+from utils.history_compaction import compact_history, status_message
+from utils.chart_specs import CHART_TYPES, build_graph
+from utils.citations import SourceTable
+from utils.query_optimizer import optimize_plan
 
 from dotenv import load_dotenv
 import os
 load_dotenv()
 
-# Get the API key from the environment variable
-api_key = os.getenv("GOOGLE_API_KEY")
+logger = logging.getLogger(__name__)
+
 # ===== UTILITY FUNCTIONS =====
 tools = [tavily_search, think_tool, draw_graph]
 
 
-from datetime import datetime
-
 def get_today_str() -> str:
     """Get current date in a human-readable format."""
     
@@ -65,31 +75,54 @@ def get_today_str() -> str:
 
 # ===== CONFIGURATION =====
 
-# Initialize model
-model = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0, api_key=api_key)
-model = model.bind_tools(tools) 
+# Models are resolved per node from the tier registry (see agents/model_registry.py)
+# Snippets retrieved from the vector index for each report section
+REPORT_SNIPPETS_PER_SECTION = int(os.getenv("REPORT_SNIPPETS_PER_SECTION", "4"))
+# Give the report prompt short source IDs instead of URLs and build the references locally
+REPORT_SOURCE_IDS = os.getenv("REPORT_SOURCE_IDS", "true").lower() not in ("0", "false", "no")
+# Decide clearly specific first requests locally instead of with a clarification LLM call
+HEURISTIC_CLARIFICATION = os.getenv("HEURISTIC_CLARIFICATION", "true").lower() not in ("0", "false", "no")
+# "combined" answers clarification, brief and plan in one LLM call; "three_step" makes one call each
+SCOPING_MODE = os.getenv("SCOPING_MODE", "three_step").lower()
+# "search" runs one search per plan step; "researcher" runs the tool-calling researcher subgraph;
+# "supervisor" fans plan steps out to parallel researcher subgraphs
+GATHER_MODE = os.getenv("GATHER_MODE", "search").lower()
+# Supervisor mode: at most this many parallel sub-researchers, merging steps at least this similar
+SUPERVISOR_MAX_WORKERS = int(os.getenv("SUPERVISOR_MAX_WORKERS", "4"))
+SUPERVISOR_CLUSTER_SIMILARITY = float(os.getenv("SUPERVISOR_CLUSTER_SIMILARITY", "0.5"))
+# Extract findings from each search result as it lands, so the report step only reduces
+PIPELINED_EXTRACTION = os.getenv("PIPELINED_EXTRACTION", "true").lower() not in ("0", "false", "no")
+MAX_FINDINGS_PER_SEARCH = int(os.getenv("MAX_FINDINGS_PER_SEARCH", "5"))
+# Search keyword queries for the retrieval steps of the plan, merging overlapping ones,
+# instead of every step's description
+PLAN_QUERY_OPTIMIZER = os.getenv("PLAN_QUERY_OPTIMIZER", "true").lower() not in ("0", "false", "no")
+# Worker threads for search -> extraction pipelines in sync runs
+_gather_pool = ThreadPoolExecutor(max_workers=int(os.getenv("GATHER_MAX_WORKERS", "8")), thread_name_prefix="gather")
+# Candidate searches started from the raw request while scoping runs (0 disables prefetch)
+search_prefetcher = SearchPrefetcher(
+    tavily_search.invoke,
+    tavily_search.ainvoke,
+    max_queries=int(os.getenv("SEARCH_PREFETCH_QUERIES", "3")),
+)
 # ===== WORKFLOW NODES =====
+# Each node has a sync and an async variant sharing the same prompt-building and
+# state-update helpers, so `agent.invoke` and `agent.ainvoke`/`agent.astream`
+# run the same workflow with blocking or non-blocking I/O respectively.
 
-def clarify_with_user(state: ResearchAgentState) -> Command[Literal["write_research_brief", "__end__"]]:
-    """
-    Determine if the user's request contains sufficient information to proceed with research.
-
-    Uses structured output to make deterministic decisions and avoid hallucination.
-    Routes to either research brief generation or ends with a clarification question.
-    """
-    # Set up structured output model
-    structured_output_model = model.with_structured_output(ClarifyWithUser)
-
-    # Invoke the model with clarification instructions
-    response = structured_output_model.invoke([
+def _clarify_prompt(state: ResearchAgentState):
+    return [
         HumanMessage(content=clarify_with_user_instructions.format(
-            messages=get_buffer_string(messages=state.messages), 
+            messages=compact_history(state.messages), 
             date=get_today_str()
         ))
-    ])
+    ]
 
-    
+
+def _route_clarification(state: ResearchAgentState, response: ClarifyWithUser, config: RunnableConfig = None):
     if response.need_clarification:
+        # The run ends here; the reply starts a new turn that gathers without these prefetches
+        if _run_key(config):
+            search_prefetcher.discard(_run_key(config))
         return Command(
             goto=END,
             update=propagate_state(state, {"messages": [{"type": "ai", "content": response.question}]})
@@ -97,27 +130,50 @@ def clarify_with_user(state: ResearchAgentState) -> Command[Literal["write_resea
     else:
         return Command(
             goto="write_research_brief",
-            update=propagate_state(state, {"messages": [{"type": "ai", "content": response.verification}]})
+            update=propagate_state(state, {"messages": [status_message(response.verification)], **_chart_update(response)})
         )
 
-def write_research_brief(state: ResearchAgentState):
+
+def _chart_update(response: ClarifyWithUser) -> dict:
+    """The chart type and axes the user asked for, as read by `_graph_input`."""
+    return {"graph_type": response.graph_type, "graph_x_label": response.x_axis, "graph_y_label": response.y_axis}
+
+
+def clarify_with_user(state: ResearchAgentState, config: RunnableConfig) -> Command[Literal["write_research_brief", "__end__"]]:
     """
-    Transform the conversation history into a comprehensive research brief.
+    Determine if the user's request contains sufficient information to proceed with research.
 
-    Uses structured output to ensure the brief follows the required format
-    and contains all necessary details for effective research.
+    Uses structured output to make deterministic decisions and avoid hallucination.
+    Routes to either research brief generation or ends with a clarification question.
+    Clearly specific first requests are decided locally without calling the LLM.
     """
-    # Always use the full conversation history for the prompt
-    full_history = get_buffer_string(getattr(state, "messages", []))
+    response = heuristic_clarification(state.messages) if HEURISTIC_CLARIFICATION else None
+    if response is None:
+        structured_output_model = get_model("clarify_with_user").with_structured_output(ClarifyWithUser)
+        response = structured_output_model.invoke(_clarify_prompt(state))
+    return _route_clarification(state, response, config)
+
+
+async def aclarify_with_user(state: ResearchAgentState, config: RunnableConfig) -> Command[Literal["write_research_brief", "__end__"]]:
+    """Async variant of `clarify_with_user`."""
+    response = heuristic_clarification(state.messages) if HEURISTIC_CLARIFICATION else None
+    if response is None:
+        structured_output_model = get_model("clarify_with_user").with_structured_output(ClarifyWithUser)
+        response = await structured_output_model.ainvoke(_clarify_prompt(state))
+    return _route_clarification(state, response, config)
+
+
+def _brief_prompt(state: ResearchAgentState):
+    # Use the user-relevant conversation history, compacted to a bounded size
+    full_history = compact_history(getattr(state, "messages", []))
     prompt = transform_messages_into_research_topic_prompt.format(
         messages=full_history,
         date=get_today_str()
     )
-    structured_output_model = model.with_structured_output(ResearchQuestion)
-    response = structured_output_model.invoke([
-        HumanMessage(content=prompt)
-    ])
+    return [HumanMessage(content=prompt)]
 
+
+def _brief_update(state: ResearchAgentState, response: ResearchQuestion):
     # Fallback: If the research brief is too short or just echoes the last message, use the initial request and clarification
     brief = response.research_brief
     if not brief or len(brief.strip()) < 20:
@@ -133,44 +189,172 @@ def write_research_brief(state: ResearchAgentState):
         "supervisor_messages": [{"type": "human", "content": f"{brief}."}]
     })
 
+
+def write_research_brief(state: ResearchAgentState):
+    """
+    Transform the conversation history into a comprehensive research brief.
+
+    Uses structured output to ensure the brief follows the required format
+    and contains all necessary details for effective research.
+    """
+    structured_output_model = get_model("write_research_brief").with_structured_output(ResearchQuestion)
+    response = structured_output_model.invoke(_brief_prompt(state))
+    return _brief_update(state, response)
+
+
+async def awrite_research_brief(state: ResearchAgentState):
+    """Async variant of `write_research_brief`."""
+    structured_output_model = get_model("write_research_brief").with_structured_output(ResearchQuestion)
+    response = await structured_output_model.ainvoke(_brief_prompt(state))
+    return _brief_update(state, response)
+
+def _run_key(config: RunnableConfig):
+    return (config or {}).get("configurable", {}).get("thread_id")
+
+
+def _first_message_text(state: ResearchAgentState) -> str:
+    message = state.messages[0] if state.messages else None
+    return (message.get("content", "") if isinstance(message, dict) else getattr(message, "content", "")) or ""
+
+
+def _should_prefetch(state: ResearchAgentState, config: RunnableConfig) -> bool:
+    # Only the per-step search gathering claims prefetched results
+    return GATHER_MODE == "search" and len(state.messages) == 1 and bool(_run_key(config))
+
+
+def prefetch_searches(state: ResearchAgentState, config: RunnableConfig):
+    """Start speculative searches for a fresh request so they overlap the scoping LLM calls."""
+    if _should_prefetch(state, config):
+        search_prefetcher.start(_run_key(config), _first_message_text(state))
+    return {}
+
+
+async def aprefetch_searches(state: ResearchAgentState, config: RunnableConfig):
+    """Async variant of `prefetch_searches`; searches run as tasks on the event loop."""
+    if _should_prefetch(state, config):
+        search_prefetcher.astart(_run_key(config), _first_message_text(state))
+    return {}
+
+
+def route_scoping(state: ResearchAgentState) -> Literal["scope_and_plan", "clarify_with_user"]:
+    """Use the combined scoping call for a fresh request, the three-step flow otherwise."""
+    if SCOPING_MODE == "combined" and len(state.messages) == 1:
+        return "scope_and_plan"
+    return "clarify_with_user"
+
+
+def _scope_and_plan_prompt(state: ResearchAgentState):
+    return [
+        HumanMessage(content=scope_and_plan_prompt.format(
+            messages=compact_history(state.messages),
+            date=get_today_str()
+        ))
+    ]
+
+
+def _route_scope_and_plan(state: ResearchAgentState, response: ScopeAndPlan, config: RunnableConfig = None):
+    if response.clarification.need_clarification:
+        # The reply to this question is handled by the three-step flow on the next turn
+        return _route_clarification(state, response.clarification, config)
+    if response.brief is None or response.plan is None or not response.plan.steps:
+        # Incomplete combined answer: fall back to the three-step flow
+        return Command(goto="clarify_with_user")
+    update = _plan_update(state, response.plan)
+    update["research_brief"] = _brief_update(state, response.brief)["research_brief"]
+    update.update(_chart_update(response.clarification))
+    return Command(goto=route_gathering(state), update=update)
+
+
+def scope_and_plan(state: ResearchAgentState, config: RunnableConfig) -> Command[Literal["gather_information", "research_with_tools", "supervisor", "clarify_with_user", "__end__"]]:
+    """
+    Decide on clarification, write the research brief and plan the research in one LLM call.
+
+    Replaces the clarify -> brief -> plan round-trips on the happy path so that
+    searching starts after a single LLM latency.
+    """
+    structured_output_model = get_model("scope_and_plan").with_structured_output(ScopeAndPlan)
+    response = structured_output_model.invoke(_scope_and_plan_prompt(state))
+    return _route_scope_and_plan(state, response, config)
+
+
+async def ascope_and_plan(state: ResearchAgentState, config: RunnableConfig) -> Command[Literal["gather_information", "research_with_tools", "supervisor", "clarify_with_user", "__end__"]]:
+    """Async variant of `scope_and_plan`."""
+    structured_output_model = get_model("scope_and_plan").with_structured_output(ScopeAndPlan)
+    response = await structured_output_model.ainvoke(_scope_and_plan_prompt(state))
+    return _route_scope_and_plan(state, response, config)
+
 # ===== RESEARCH PHASE NODES =====
-def plan_research(state: ResearchAgentState):
+def _plan_prompt(state: ResearchAgentState):
     research_brief = state.research_brief
+    # Prior reports on an overlapping topic let the plan focus on what is still missing
+    prior_reports = research_memory.recall(research_brief, k=2, kind="report")
+    prior_findings = "\n".join(f"- {hit.text}" for hit in prior_reports)
+    prior_section = f"""
+    Findings already available from earlier research (plan steps only for gaps or updates):
+    {prior_findings}
+    """ if prior_findings else ""
     plan_prompt = f"""
     You are an expert research assistant. Based on the following research brief,
     create a structured step-by-step research plan.
 
     Research brief: {research_brief}
-
+    {prior_section}
     Format output as JSON matching the ResearchPlanSchema.
     """
-    structured_output_model = model.with_structured_output(ResearchPlan)
-    response = structured_output_model.invoke([HumanMessage(content=plan_prompt)])
+    return [HumanMessage(content=plan_prompt)]
 
+
+def _plan_update(state: ResearchAgentState, response: ResearchPlan):
     steps = [step.dict() for step in response.steps]
     return propagate_state(state, {
-        "messages": [{"type": "ai", "content": f"Research plan created with {len(steps)} steps."}],
+        "messages": [status_message(f"Research plan created with {len(steps)} steps.")],
         "research_plan": response,
         "current_step": "Planning completed"
     })
 
 
-def gather_information(state: ResearchAgentState):
+def plan_research(state: ResearchAgentState):
+    structured_output_model = get_model("plan_research").with_structured_output(ResearchPlan)
+    response = structured_output_model.invoke(_plan_prompt(state))
+    return _plan_update(state, response)
 
-    # Ensure gathered_info is a list
+
+async def aplan_research(state: ResearchAgentState):
+    structured_output_model = get_model("plan_research").with_structured_output(ResearchPlan)
+    response = await structured_output_model.ainvoke(_plan_prompt(state))
+    return _plan_update(state, response)
+
+
+def _recall_or_queue(state: ResearchAgentState):
+    """Reuse remembered results per plan query; return them, the queries still to search and a status note."""
+    # Ensure gathered_info is a list, also when a previous turn already gathered information
     gathered_info = state.gathered_information or []
-    iterations = state.iterations
+    gathered_info = list(gathered_info.items) if isinstance(gathered_info, GatheredInformation) else list(gathered_info)
+    pending_queries = []
 
     # Get steps from research_plan
     steps = state.research_plan.steps if (state.research_plan is not None and hasattr(state.research_plan, 'steps')) else []
-    for step in steps:
-        # Use step.description or step.action as the query
-        query = step.description
-        # Use .invoke for langchain tool
-        results = tavily_search.invoke(query)
-        gathered_info.append({"query": query, "results": results})
-
-    from agents.state import GatheredInformation, InformationItem
+    queries = [planned.query for planned in optimize_plan(steps)] if PLAN_QUERY_OPTIMIZER else []
+    # A plan without retrieval steps still gets its steps searched, as before
+    queries = queries or [step.description for step in steps]
+    for query in queries:
+        # Reuse fresh, relevant results from earlier runs before searching the web
+        hits = research_memory.recall(query, kind="item")
+        if hits:
+            gathered_info.extend(
+                InformationItem(query=query, source=hit.source, snippet=hit.text,
+                                metadata={"from_memory": True, "stored_at": hit.stored_at})
+                for hit in hits
+            )
+        else:
+            pending_queries.append(query)
+    return gathered_info, pending_queries, f" {len(queries)} search(es) for {len(steps)} plan step(s)."
+
+
+def _gathered_update(state: ResearchAgentState, gathered_info, prefetch_hits: int = 0, plan_note: str = ""):
+    iterations = state.iterations
+    searched = [item for item in gathered_info if isinstance(item, dict)]
+    extraction_failures = sum(1 for item in searched if item.get("extraction_error"))
     # Convert dicts to InformationItem objects if needed
     info_items = []
     for item in gathered_info:
@@ -179,29 +363,209 @@ def gather_information(state: ResearchAgentState):
                 query=item.get("query", ""),
                 source=item.get("source", ""),
                 snippet=item.get("results", ""),
-                metadata=None
+                metadata={"findings": item["findings"]} if item.get("findings") else None
             ))
         else:
             info_items.append(item)
 
+    research_memory.add_items(info_items)
     gathered_obj = GatheredInformation(topic=state.research_brief, items=info_items)
+    prefetch_stats = search_prefetcher.stats()
+    prefetch_note = (
+        f" Prefetch: {prefetch_hits} hit(s) this run, {prefetch_stats['hit_rate']:.0%} overall hit rate,"
+        f" {prefetch_stats['saved_seconds']:.1f}s search latency saved overall."
+    ) if search_prefetcher.enabled and GATHER_MODE == "search" else ""
+    search_stats = search_tool.stats()
+    hedge_note = (
+        f" Search: {search_stats['hedge_rate']:.0%} hedged, {search_stats['fallbacks']} fallback(s),"
+        f" p99 {search_stats.get('p99_seconds', 0):.2f}s vs {search_stats.get('unhedged_p99_seconds', 0):.2f}s unhedged."
+    ) if search_stats else ""
+    extraction_note = (
+        f" Extraction: {extraction_failures} of {len(searched)} search(es) failed."
+    ) if PIPELINED_EXTRACTION and searched else ""
     return propagate_state(state, {
-        "messages": [{"type": "ai", "content": f"Information gathered. Iteration {iterations + 1}"}],
+        "messages": [status_message(
+            f"Information gathered. Iteration {iterations + 1}.{plan_note}{prefetch_note}{hedge_note}{extraction_note}"
+        )],
         "gathered_information": gathered_obj,
         "iterations": iterations + 1,
         "current_step": f"Gathering info (Iteration {iterations + 1})"
     })
 
 
-def generate_graph_node(state: ResearchAgentState):
+def _extract_prompt(query: str, results: str):
+    return [HumanMessage(content=extract_findings_prompt.format(
+        query=query, results=results, max_findings=MAX_FINDINGS_PER_SEARCH
+    ))]
+
+
+def _extraction_failed(gathered: dict, error: Exception) -> None:
+    logger.warning("Findings extraction failed for %r: %s: %s", gathered["query"], type(error).__name__, error)
+    gathered["extraction_error"] = f"{type(error).__name__}: {error}"
+
+
+def _search_and_extract(query: str, prefetched: dict) -> dict:
+    """Search one plan step (unless prefetched) and extract its findings as soon as it lands."""
+    # Use .invoke for langchain tool
+    results = prefetched[query] if query in prefetched else tavily_search.invoke(query)
+    gathered = {"query": query, "results": results}
+    if PIPELINED_EXTRACTION and not results.startswith("No results found"):
+        try:
+            structured_output_model = get_model("extract_findings").with_structured_output(ExtractedFindings)
+            gathered["findings"] = structured_output_model.invoke(_extract_prompt(query, results)).findings
+        except Exception as e:
+            # Extraction is an optimisation; the report falls back to the raw snippet
+            _extraction_failed(gathered, e)
+    return gathered
+
+
+async def _asearch_and_extract(query: str, prefetched: dict) -> dict:
+    results = prefetched[query] if query in prefetched else await tavily_search.ainvoke(query)
+    gathered = {"query": query, "results": results}
+    if PIPELINED_EXTRACTION and not results.startswith("No results found"):
+        try:
+            structured_output_model = get_model("extract_findings").with_structured_output(ExtractedFindings)
+            gathered["findings"] = (await structured_output_model.ainvoke(_extract_prompt(query, results))).findings
+        except Exception as e:
+            _extraction_failed(gathered, e)
+    return gathered
+
+
+def gather_information(state: ResearchAgentState, config: RunnableConfig):
+    """
+    Search every uncovered plan step and extract findings per search as it completes.
+
+    Each plan step runs search -> extraction on its own worker, so one step's
+    extraction overlaps the others' searches and the report only has to reduce.
+    """
+    gathered_info, pending_queries, plan_note = _recall_or_queue(state)
+    # Searches started speculatively during scoping answer the plan steps they match
+    prefetched = search_prefetcher.claim(_run_key(config), pending_queries)
+    gathered_info.extend(_gather_pool.map(lambda query: _search_and_extract(query, prefetched), pending_queries))
+    return _gathered_update(state, gathered_info, prefetch_hits=len(prefetched), plan_note=plan_note)
+
+
+async def agather_information(state: ResearchAgentState, config: RunnableConfig):
+    """Async variant of `gather_information`; all plan steps are searched and extracted concurrently."""
+    gathered_info, pending_queries, plan_note = _recall_or_queue(state)
+    prefetched = await search_prefetcher.aclaim(_run_key(config), pending_queries)
+    gathered_info.extend(await asyncio.gather(*(_asearch_and_extract(query, prefetched) for query in pending_queries)))
+    return _gathered_update(state, gathered_info, prefetch_hits=len(prefetched), plan_note=plan_note)
+
+
+def route_gathering(state: ResearchAgentState) -> Literal["gather_information", "research_with_tools", "supervisor"]:
+    """Gather with one search per plan step, the researcher subgraph, or parallel sub-researchers."""
+    if GATHER_MODE == "researcher":
+        return "research_with_tools"
+    if GATHER_MODE == "supervisor":
+        return "supervisor"
+    return "gather_information"
+
+
+def _researcher_topic(state: ResearchAgentState) -> str:
+    steps = state.research_plan.steps if state.research_plan is not None else []
+    plan = "\n".join(f"{step.step_number}. {step.description}" for step in steps)
+    return f"{state.research_brief}\n\nResearch plan:\n{plan}" if plan else state.research_brief
+
+
+def _researcher_update(state: ResearchAgentState, result: dict):
+    # Only the compressed findings go upward; raw notes stay in the subgraph
+    gathered_info = [InformationItem(
+        query=state.research_brief,
+        source="researcher",
+        snippet=result.get("compressed_research", ""),
+        metadata={"tool_call_iterations": result.get("tool_call_iterations", 0), "raw_notes": len(result.get("raw_notes", []))},
+    )]
+    return _gathered_update(state, gathered_info)
+
+
+def research_with_tools(state: ResearchAgentState, config: RunnableConfig):
+    """Run the ReAct researcher subgraph on the brief and plan, keeping its compressed findings."""
+    result = researcher_agent.invoke(researcher_input(_researcher_topic(state)), config=config)
+    return _researcher_update(state, result)
+
+
+async def aresearch_with_tools(state: ResearchAgentState, config: RunnableConfig):
+    result = await researcher_agent.ainvoke(researcher_input(_researcher_topic(state)), config=config)
+    return _researcher_update(state, result)
+
+
+def cluster_steps(steps, max_groups: int, min_similarity: float):
+    """Group related plan steps (term overlap) into at most ``max_groups`` clusters."""
+    clusters = [([step], set(tokenize(step.description))) for step in steps]
+
+    def similarity(a, b):
+        return len(a[1] & b[1]) / len(a[1] | b[1]) if a[1] | b[1] else 0.0
 
-    import re
+    while len(clusters) > 1:
+        pairs = [(similarity(clusters[i], clusters[j]), i, j)
+                 for i in range(len(clusters)) for j in range(i + 1, len(clusters))]
+        best, i, j = max(pairs)
+        if best < min_similarity and len(clusters) <= max_groups:
+            break
+        merged = (clusters[i][0] + clusters[j][0], clusters[i][1] | clusters[j][1])
+        clusters = [c for k, c in enumerate(clusters) if k not in (i, j)] + [merged]
+    return [sorted(group, key=lambda step: step.step_number) for group, _ in clusters]
+
+
+def supervisor(state: ResearchAgentState):
+    """Fan-out point for sub-researchers; the dispatch itself happens in `dispatch_sub_research`."""
+    # Clear findings left over from an earlier run on the same thread
+    return {"current_step": "Dispatching sub-researchers", "sub_findings": None}
+
+
+def dispatch_sub_research(state: ResearchAgentState):
+    """Send each cluster of related plan steps to its own sub-researcher, in parallel."""
+    steps = state.research_plan.steps if state.research_plan is not None else []
+    if not steps:
+        return "join_findings"
+    groups = cluster_steps(steps, SUPERVISOR_MAX_WORKERS, SUPERVISOR_CLUSTER_SIMILARITY)
+    return [Send("sub_researcher", SubResearchTask(research_brief=state.research_brief, steps=group)) for group in groups]
+
+
+def _sub_research_topic(task: SubResearchTask) -> str:
+    plan = "\n".join(f"- {step.description}" for step in task.steps)
+    return f"{task.research_brief}\n\nFocus only on these parts of the research plan:\n{plan}"
+
+
+def _sub_research_update(task: SubResearchTask, result: dict):
+    # Workers write only to the `sub_findings` reducer so parallel updates merge cleanly
+    return {"sub_findings": [InformationItem(
+        query="; ".join(step.description for step in task.steps),
+        source="sub-researcher",
+        snippet=result.get("compressed_research", ""),
+        metadata={"steps": [step.step_number for step in task.steps],
+                  "tool_call_iterations": result.get("tool_call_iterations", 0)},
+    )]}
+
+
+def sub_researcher(task: SubResearchTask, config: RunnableConfig):
+    """Research one cluster of plan steps with the researcher subgraph and return a compact finding."""
+    result = researcher_agent.invoke(researcher_input(_sub_research_topic(task)), config=config)
+    return _sub_research_update(task, result)
+
+
+async def asub_researcher(task: SubResearchTask, config: RunnableConfig):
+    result = await researcher_agent.ainvoke(researcher_input(_sub_research_topic(task)), config=config)
+    return _sub_research_update(task, result)
+
+
+def join_findings(state: ResearchAgentState):
+    """Join the sub-researchers' findings into the gathered information for the report."""
+    return _gathered_update(state, list(state.sub_findings))
+
+
+def _graph_input(state: ResearchAgentState):
+    """Extract plottable data from gathered information into `build_graph` arguments."""
     gathered = state.gathered_information
     data = []
     # Determine axes from state or fallback
-    x_label = getattr(state, "graph_x_label", "X")
-    y_label = getattr(state, "graph_y_label", "Y")
-    chart_type = getattr(state, "graph_type", "bar")
+    x_label = state.graph_x_label or "X"
+    y_label = state.graph_y_label or "Y"
+    chart_type = (state.graph_type or "bar").lower()
+    if chart_type not in CHART_TYPES:
+        # e.g. "scatter" or "histogram": keep the requested axes on a supported chart
+        chart_type = "bar"
     items = gathered.items if hasattr(gathered, "items") else gathered
 
     # Try to extract pairs based on axis labels
@@ -209,7 +573,8 @@ def generate_graph_node(state: ResearchAgentState):
         snippet = item.snippet if hasattr(item, "snippet") else str(item)
         # Try to find lines with both axis values
         # Example: "Year: 2020, Price: 2.5" or "Region: Central, Quantity: 1000"
-        pattern = rf"{x_label}[:\s]*([\w\-]+)[,;\s]+{y_label}[:\s]*([\d\.]+)"
+        # Axis labels come from the user ("price (USD)"), so they are matched literally
+        pattern = rf"{re.escape(x_label)}[:\s]*([\w\-]+)[,;\s]+{re.escape(y_label)}[:\s]*([\d\.]+)"
         matches = re.findall(pattern, snippet, re.IGNORECASE)
         for x_val, y_val in matches:
             try:
@@ -247,23 +612,32 @@ def generate_graph_node(state: ResearchAgentState):
         "y_key": "value",
         "x_label": x_label,
         "y_label": y_label,
-        "filename": getattr(state, "graph_filename", "research_graph.png")
     }
-    graph_path = draw_graph.invoke(graph_input)
+    return graph_input, msg
 
+
+def generate_graph_node(state: ResearchAgentState):
+    """Store the chart as a Vega-Lite spec; the client renders it and exports rasterize it on demand."""
+    graph_input, msg = _graph_input(state)
+    graph = build_graph(**graph_input)
     return propagate_state(state, {
-        "messages": [{"type": "ai", "content": f"{msg} Graph saved to: {graph_path}"}],
-        "graph_paths": state.graph_paths + [graph_path]
+        "messages": [status_message(f"{msg} Chart '{graph.title}' ({graph.chart_type}, {len(graph.data)} points) ready.")],
+        "graphs": state.graphs + [graph]
     })
 
 
+async def agenerate_graph_node(state: ResearchAgentState):
+    # Building a spec is cheap, so there is nothing to take off the event loop
+    return generate_graph_node(state)
+
+
 def evaluate_information(state: ResearchAgentState):
     iterations = state["iterations"] if isinstance(state, dict) else state.iterations
     gathered_info = state["gathered_information"] if isinstance(state, dict) else state.gathered_information
     # Handle GatheredInformation object or fallback to list/tuple
     if iterations >= (state["max_iterations"] if isinstance(state, dict) else state.max_iterations):
         return propagate_state(state, {
-            "messages": [{"type": "ai", "content": "Enough information collected."}],
+            "messages": [status_message("Enough information collected.")],
             "current_step": "Evaluation complete"
         })
     if hasattr(gathered_info, "items"):
@@ -281,13 +655,19 @@ def evaluate_information(state: ResearchAgentState):
         else:
             extra_queries.append("More info on (unknown)")
     return propagate_state(state, {
-        "messages": [{"type": "ai", "content": "More info needed."}],
+        "messages": [status_message("More info needed.")],
         # Optionally, add extra_queries to messages or a new field if needed
         "current_step": "Evaluation requested more info"
     })
 
 
-def generate_report(state: ResearchAgentState):
+async def aevaluate_information(state: ResearchAgentState):
+    # No I/O here, so the async variant simply reuses the sync logic
+    return evaluate_information(state)
+
+
+def _report_prompt(state: ResearchAgentState):
+    """Build the report prompt from per-section snippets retrieved from the vector index."""
     gathered_info = state["gathered_information"] if isinstance(state, dict) else state.gathered_information
     research_brief = state["research_brief"] if isinstance(state, dict) else state.research_brief
     # Handle GatheredInformation object or fallback to list/tuple
@@ -297,57 +677,120 @@ def generate_report(state: ResearchAgentState):
         items = gathered_info
     else:
         items = []
-    all_info = "\n\n".join([
-        f"Query: {i.get('query', '') if isinstance(i, dict) else getattr(i, 'query', '')}\nResults: {i.get('results', '') if isinstance(i, dict) else getattr(i, 'snippet', '')}"
+    items = [
+        InformationItem(query=i.get("query", ""), source=i.get("source", ""), snippet=i.get("results", ""))
+        if isinstance(i, dict) else i
         for i in items
-    ])
+    ]
+    research_plan = state["research_plan"] if isinstance(state, dict) else state.research_plan
+    # One report section per plan step; each gets only its own top-k snippets so the
+    # prompt grows with the number of sections, not with the amount of gathered data
+    section_queries = [step.description for step in research_plan.steps] if research_plan else []
+    index = build_index(items)
+    # Filled while the prompt is built; resolves the model's [S#] citations afterwards
+    sources = SourceTable() if REPORT_SOURCE_IDS else None
+    section_blocks = []
+    for section_query in section_queries or [research_brief]:
+        hits = index.query(section_query, k=REPORT_SNIPPETS_PER_SECTION)
+        if sources is not None:
+            snippets = "\n".join(f"- {sources.cite_item(item.source or item.query, item.snippet)}" for item, _ in hits)
+        else:
+            snippets = "\n".join(f"- ({item.source or item.query}) {item.snippet}" for item, _ in hits)
+        section_blocks.append(f"Section focus: {section_query}\n{snippets or '- No matching information.'}")
+    all_info = "\n\n".join(section_blocks)
+    citation_rules = """
+    Sources are given as IDs like [S1]. Cite them inline by ID right after the statements they
+    support, e.g. "... grew 4% in 2023 [S2].", using only IDs listed above. Do not write out URLs.
+    """ if sources is not None else ""
 
     report_prompt = f"""
     Based on the following research info, create a comprehensive report.
 
     Research brief: {research_brief}
 
-    Info:
+    Info (grouped by section):
     {all_info}
-
+    {citation_rules}
     Use structured output: ResearchReportSchema
     """
-    structured_output_model = model.with_structured_output(ResearchReport)
-    response = structured_output_model.invoke([HumanMessage(content=report_prompt)])
+    return research_brief, sources, [HumanMessage(content=report_prompt)]
+
+
+def _report_model(sources: Optional[SourceTable]):
+    # With source IDs the model writes no references; they are expanded from the table
+    return get_model("generate_report").with_structured_output(ResearchReport if sources is None else ReportDraft)
+
+
+def _report_update(state: ResearchAgentState, research_brief: str, sources: Optional[SourceTable], response):
+    report = response.dict() if sources is None else sources.expand_report(response.dict())
+    research_memory.add_report(research_brief, report)
 
     return propagate_state(state, {
-        "messages": [{"type": "ai", "content": f"Report generated: {response.topic}"}],
-        "research_report": response.dict(),
+        "messages": [status_message(f"Report generated: {response.topic}")],
+        "research_report": report,
         "current_step": "Report generation complete"
     })
 
 
+def generate_report(state: ResearchAgentState):
+    research_brief, sources, prompt = _report_prompt(state)
+    response = _report_model(sources).invoke(prompt)
+    return _report_update(state, research_brief, sources, response)
+
+
+async def agenerate_report(state: ResearchAgentState):
+    research_brief, sources, prompt = _report_prompt(state)
+    response = await _report_model(sources).ainvoke(prompt)
+    return _report_update(state, research_brief, sources, response)
+
+
 # ===== GRAPH CONSTRUCTION =====
-checkpointer = InMemorySaver()
+# Large state fields are stored once per content hash; checkpoints keep references
+checkpointer = create_checkpointer()
 research_builder = StateGraph(ResearchAgentState, input_schema=ResearchAgentState)
 
 # Scoping nodes
-research_builder.add_node("clarify_with_user", clarify_with_user)
-research_builder.add_node("write_research_brief", write_research_brief)
+research_builder.add_node("prefetch_searches", RunnableLambda(prefetch_searches, afunc=aprefetch_searches))
+research_builder.add_node(
+    "clarify_with_user",
+    RunnableLambda(clarify_with_user, afunc=aclarify_with_user),
+    destinations=("write_research_brief", END),
+)
+research_builder.add_node("write_research_brief", RunnableLambda(write_research_brief, afunc=awrite_research_brief))
+research_builder.add_node(
+    "scope_and_plan",
+    RunnableLambda(scope_and_plan, afunc=ascope_and_plan),
+    destinations=("gather_information", "research_with_tools", "supervisor", "clarify_with_user", END),
+)
 
 # Research nodes
-research_builder.add_node("plan_research", plan_research)
-research_builder.add_node("gather_information", gather_information)
-research_builder.add_node("generate_graph", generate_graph_node)
-research_builder.add_node("evaluate_information", evaluate_information)
-research_builder.add_node("generate_report", generate_report)
+research_builder.add_node("plan_research", RunnableLambda(plan_research, afunc=aplan_research))
+research_builder.add_node("gather_information", RunnableLambda(gather_information, afunc=agather_information))
+research_builder.add_node("research_with_tools", RunnableLambda(research_with_tools, afunc=aresearch_with_tools))
+research_builder.add_node("supervisor", supervisor)
+research_builder.add_node("sub_researcher", RunnableLambda(sub_researcher, afunc=asub_researcher), input_schema=SubResearchTask)
+research_builder.add_node("join_findings", join_findings)
+research_builder.add_node("generate_graph", RunnableLambda(generate_graph_node, afunc=agenerate_graph_node))
+research_builder.add_node("evaluate_information", RunnableLambda(evaluate_information, afunc=aevaluate_information))
+research_builder.add_node("generate_report", RunnableLambda(generate_report, afunc=agenerate_report))
 
 # Edges
-research_builder.add_edge(START, "clarify_with_user")
-research_builder.add_edge("clarify_with_user", "write_research_brief")
+research_builder.add_edge(START, "prefetch_searches")
+research_builder.add_conditional_edges("prefetch_searches", route_scoping, ["scope_and_plan", "clarify_with_user"])
 research_builder.add_edge("write_research_brief", "plan_research")
-research_builder.add_edge("plan_research", "gather_information")
+research_builder.add_conditional_edges("plan_research", route_gathering, ["gather_information", "research_with_tools", "supervisor"])
+research_builder.add_conditional_edges("supervisor", dispatch_sub_research, ["sub_researcher", "join_findings"])
+research_builder.add_edge("sub_researcher", "join_findings")
+research_builder.add_edge("join_findings", "generate_graph")
 research_builder.add_edge("gather_information", "generate_graph")
+research_builder.add_edge("research_with_tools", "generate_graph")
 research_builder.add_edge("generate_graph", "evaluate_information")
 research_builder.add_edge("evaluate_information", "generate_report")
 research_builder.add_edge("generate_report", END)
 
-# Compile
+# Compile. Use `agent.invoke`/`agent.stream` from sync code, or
+# `await agent.ainvoke(...)` / `async for chunk in agent.astream(...)` to run many
+# sessions concurrently on one event loop.
 agent = research_builder.compile(checkpointer=checkpointer)
 
 
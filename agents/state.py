@@ -1,8 +1,9 @@
 import operator
 from pydantic import BaseModel, Field
 from typing import Annotated, List, Optional, Dict, Sequence, TypedDict, Union
-from langchain_core.messages import AIMessage, HumanMessage, BaseMessage
+from langchain_core.messages import AIMessage, HumanMessage, BaseMessage, AnyMessage
 from langgraph.graph.message import add_messages
+from utils.gathered_store import GatheredStore
 
 class ResearchAgentInput(BaseModel):
     research_brief: str  # The structured research brief from scoping agent
@@ -26,9 +27,13 @@ class InformationItem(BaseModel):
     snippet: str = Field(..., description="Relevant snippet or extracted text")
     metadata: Optional[Dict] = Field(default=None, description="Any additional metadata from the source")
 
+class ExtractedFindings(BaseModel):
+    findings: List[str] = Field(..., description="Concise factual findings relevant to the query, each ending with its source URL in parentheses")
+
 class GatheredInformation(BaseModel):
     topic: str = Field(..., description="The research topic")
-    items: List[InformationItem] = Field(..., description="List of gathered information items")
+    # Columnar; accepts a list of InformationItem (or dicts) and yields InformationItem-like views
+    items: GatheredStore = Field(..., description="List of gathered information items")
 
 class GraphDataPoint(BaseModel):
     x: str = Field(..., description="X-axis value")
@@ -40,6 +45,7 @@ class Graph(BaseModel):
     x_label: str = Field(..., description="Label for the X-axis")
     y_label: str = Field(..., description="Label for the Y-axis")
     data: List[GraphDataPoint] = Field(..., description="Data points for the chart")
+    spec: Optional[Dict] = Field(default=None, description="Vega-Lite spec (data plus encoding) rendered by the client")
     file_path: Optional[str] = Field(default=None, description="Saved file path for the graph image")
 
 class Evaluation(BaseModel):
@@ -55,15 +61,25 @@ class ResearchReportSection(BaseModel):
     title: str = Field(..., description="Section title")
     content: str = Field(..., description="Section content in detail")
 
-class ResearchReport(BaseModel):
+class ReportDraft(BaseModel):
+    """The report as written by the model, citing sources inline by ID; references are filled in locally."""
     topic: str = Field(..., description="The research topic")
     summary: str = Field(..., description="High-level summary of the research")
     key_findings: List[str] = Field(..., description="Bullet-point list of key findings")
     sections: List[ResearchReportSection] = Field(..., description="Detailed sections of the report")
     conclusion: Optional[str] = Field(default=None, description="Closing thoughts or recommendations")
+
+class ResearchReport(ReportDraft):
     references: Optional[List[str]] = Field(default=None, description="List of references or sources cited")
 
 
+def merge_findings(existing, new):
+    """Reducer for parallel sub-researcher findings; an update of None clears them."""
+    if new is None:
+        return []
+    return list(existing or []) + list(new)
+
+
 # --- Move ResearchAgentState outside of ResearchReport ---
 class ResearchAgentState(BaseModel):
     research_brief: str
@@ -71,12 +87,26 @@ class ResearchAgentState(BaseModel):
     gathered_information: Optional[GatheredInformation] = None
     graphs: List[Graph] = []
     graph_paths: List[str] = []
+    # Chart details from the clarification step; None falls back to a bar chart with generic axes
+    graph_type: Optional[str] = None
+    graph_x_label: Optional[str] = None
+    graph_y_label: Optional[str] = None
     evaluation: Optional[EvaluationResult] = None
     research_report: Optional[ResearchReport] = None
     iterations: int = 0
     max_iterations: int = 2
     current_step: Optional[str] = None
-    messages: List[Union[AIMessage, HumanMessage]] = []
+    # Appended to, not replaced: nodes return only their own status messages, and the user's
+    # turns must stay in state for the brief, plan and report
+    messages: Annotated[List[AnyMessage], add_messages] = []
+    # Compact findings from parallel sub-researchers, joined before the report
+    sub_findings: Annotated[List[InformationItem], merge_findings] = []
+
+
+class SubResearchTask(BaseModel):
+    """Input for one sub-researcher: the brief and the cluster of plan steps it covers."""
+    research_brief: str
+    steps: List[ResearchStep]
 
 
 class ResearcherState(TypedDict):
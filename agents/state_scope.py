@@ -81,6 +81,22 @@ class ResearchQuestion(BaseModel):
         description="Structured JSON array of data points for plotting. Example: [{name: 'Entity A', metric: 10}, {name: 'Entity B', metric: 20}]",
     )
 
+
+class ScopeAndPlan(BaseModel):
+    """Schema for clarification decision, research brief and plan in one structured call."""
+
+    clarification: ClarifyWithUser = Field(
+        description="The clarification decision, exactly as it would be made on its own.",
+    )
+    brief: Optional[ResearchQuestion] = Field(
+        default=None,
+        description="The research brief. None if clarification is needed.",
+    )
+    plan: Optional[ResearchPlan] = Field(
+        default=None,
+        description="The step-by-step research plan for the brief. None if clarification is needed.",
+    )
+
     
 class FinalReport(BaseModel):
     """Schema for structured final report generation."""
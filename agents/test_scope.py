@@ -2,8 +2,8 @@
 import uuid
 import json
 from langchain_core.messages import AIMessage, HumanMessage
-from scoping_agent import agent  # Your compiled StateGraph
-from state import ResearchAgentState  # Your Pydantic state schema
+from agents.scoping_agent import agent  # Your compiled StateGraph
+from agents.state import ResearchAgentState  # Your Pydantic state schema
 
 # -----------------------------
 # CONFIG
@@ -36,63 +36,65 @@ def prompt_required_fields():
 # -----------------------------
 # RUN AGENT END-TO-END
 # -----------------------------
-state = prompt_required_fields()
-step_counter = 1
+# Run with `python -m agents.test_scope`; for unattended runs use `python -m agents.batch_runner`
+if __name__ == "__main__":
+    state = prompt_required_fields()
+    step_counter = 1
 
-while True:
-    # Always ensure user_input is present in state before invoking agent
-    if not state.get("user_input"):
-        state["user_input"] = input("Describe your research request: ").strip()
+    while True:
+        # Always ensure user_input is present in state before invoking agent
+        if not state.get("user_input"):
+            state["user_input"] = input("Describe your research request: ").strip()
 
-    state = agent.invoke(state, config=config)
+        state = agent.invoke(state, config=config)
 
-    # Print last AI message if any
-    if state.get("messages"):
-        last_ai = state["messages"][-1]
-        print(f"\n=== Step {step_counter} AI Output ===")
-        print(getattr(last_ai, "content", str(last_ai)))
-        step_counter += 1
+        # Print last AI message if any
+        if state.get("messages"):
+            last_ai = state["messages"][-1]
+            print(f"\n=== Step {step_counter} AI Output ===")
+            print(getattr(last_ai, "content", str(last_ai)))
+            step_counter += 1
 
-    # If AI asks a clarification question, prompt user for input
-    if state.get("messages") and "?" in getattr(state["messages"][-1], "content", ""):
-        clarification = input("\n--- Clarification requested ---\n" + getattr(state["messages"][-1], "content", "") + "\nYour reply: ")
-        state["messages"].append(HumanMessage(content=clarification))
-        # Optionally, prompt for missing fields if question matches known schema
-        if "location" in getattr(state["messages"][-1], "content", "").lower():
-            location = input("Location (city/country): ").strip()
-            state["user_input"] += f" in {location}"
-        if "graph type" in getattr(state["messages"][-1], "content", "").lower():
-            graph_type = input("Graph type (bar, line, pie, etc.): ").strip()
-            state["user_input"] += f" with a {graph_type} graph"
-        if "x-axis" in getattr(state["messages"][-1], "content", "").lower():
-            x_axis = input("X-axis label: ").strip()
-            state["user_input"] += f" (X-axis: {x_axis})"
-        if "y-axis" in getattr(state["messages"][-1], "content", "").lower():
-            y_axis = input("Y-axis label: ").strip()
-            state["user_input"] += f" (Y-axis: {y_axis})"
+        # If AI asks a clarification question, prompt user for input
+        if state.get("messages") and "?" in getattr(state["messages"][-1], "content", ""):
+            clarification = input("\n--- Clarification requested ---\n" + getattr(state["messages"][-1], "content", "") + "\nYour reply: ")
+            state["messages"].append(HumanMessage(content=clarification))
+            # Optionally, prompt for missing fields if question matches known schema
+            if "location" in getattr(state["messages"][-1], "content", "").lower():
+                location = input("Location (city/country): ").strip()
+                state["user_input"] += f" in {location}"
+            if "graph type" in getattr(state["messages"][-1], "content", "").lower():
+                graph_type = input("Graph type (bar, line, pie, etc.): ").strip()
+                state["user_input"] += f" with a {graph_type} graph"
+            if "x-axis" in getattr(state["messages"][-1], "content", "").lower():
+                x_axis = input("X-axis label: ").strip()
+                state["user_input"] += f" (X-axis: {x_axis})"
+            if "y-axis" in getattr(state["messages"][-1], "content", "").lower():
+                y_axis = input("Y-axis label: ").strip()
+                state["user_input"] += f" (Y-axis: {y_axis})"
 
-    # Print the research brief if available
-    if state.get("research_brief"):
-        print("\n=== RESEARCH BRIEF ===\n")
-        print(state["research_brief"])
+        # Print the research brief if available
+        if state.get("research_brief"):
+            print("\n=== RESEARCH BRIEF ===\n")
+            print(state["research_brief"])
 
-    # Print the research plan if available
-    if state.get("research_plan"):
-        print("\n=== RESEARCH PLAN ===\n")
-        print(state["research_plan"])
+        # Print the research plan if available
+        if state.get("research_plan"):
+            print("\n=== RESEARCH PLAN ===\n")
+            print(state["research_plan"])
 
-    # Print gathered information if available
-    if state.get("gathered_information"):
-        print("\n=== GATHERED INFORMATION ===\n")
-        print(state["gathered_information"])
+        # Print gathered information if available
+        if state.get("gathered_information"):
+            print("\n=== GATHERED INFORMATION ===\n")
+            print(state["gathered_information"])
 
-    # Print the research report if generated
-    if state.get("research_report"):
-        print("\n=== FINAL RESEARCH REPORT ===\n")
-        print(json.dumps(state["research_report"], indent=2))
-        break
+        # Print the research report if generated
+        if state.get("research_report"):
+            print("\n=== FINAL RESEARCH REPORT ===\n")
+            print(json.dumps(state["research_report"], indent=2))
+            break
 
-    # Optional: safety check to prevent infinite loops
-    if step_counter > 20:
-        print("Reached max steps, exiting loop to avoid infinite run.")
-        break
+        # Optional: safety check to prevent infinite loops
+        if step_counter > 20:
+            print("Reached max steps, exiting loop to avoid infinite run.")
+            break
@@ -1,34 +1,179 @@
+import abc
+import asyncio
+import math
+import random
+import time
 from datetime import datetime
 from pathlib import Path
-from tavily import TavilyClient
+from tavily import TavilyClient, AsyncTavilyClient
 from typing import List, Dict, Optional
 import os
 from dotenv import load_dotenv
 from langchain.tools import tool
-import matplotlib.pyplot as plt
+from langchain_core.tools import StructuredTool
+import json
 
-# Folder to save generated graphs
-GRAPH_OUTPUT_DIR = "graphs"
-os.makedirs(GRAPH_OUTPUT_DIR, exist_ok=True)
+from utils.cassettes import CassetteSearchBackend, cassette
+from utils.chart_specs import build_graph
+from utils.hedged_search import HedgedSearchBackend, ResultCache
+from utils.single_flight import SINGLE_FLIGHT_ENABLED, SingleFlight
 
 load_dotenv()
 
-class SearchTool:
-    def __init__(self):
+class SearchBackend(abc.ABC):
+    """Interface for the search providers behind `tavily_search`.
+
+    Backends return result dicts with at least ``title``, ``url`` and ``content``.
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        """Top ``max_results`` results for ``query``."""
+
+    async def asearch(self, query: str, max_results: int = 5) -> List[Dict]:
+        return await asyncio.to_thread(self.search, query, max_results)
+
+
+class TavilyBackend(SearchBackend):
+    name = "tavily"
+
+    def __init__(self, api_base_url: Optional[str] = None):
         api_key = os.getenv("TAVILY_API_KEY")
         if not api_key:
             raise ValueError("TAVILY_API_KEY not found in environment variables.")
-        self.client = TavilyClient(api_key=api_key)
-    
+        # Another Tavily-compatible endpoint, e.g. the local fake server used for load tests
+        api_base_url = api_base_url or os.getenv("TAVILY_API_BASE_URL")
+        self.client = TavilyClient(api_key=api_key, api_base_url=api_base_url)
+        self.async_client = AsyncTavilyClient(api_key=api_key, api_base_url=api_base_url)
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        response = self.client.search(query=query, max_results=max_results)
+        return response.get('results', [])
+
+    async def asearch(self, query: str, max_results: int = 5) -> List[Dict]:
+        response = await self.async_client.search(query=query, max_results=max_results)
+        return response.get('results', [])
+
+
+class LocalCorpusBackend(SearchBackend):
+    """BM25 search over an on-disk index of local documents (see `utils.local_corpus`)."""
+
+    name = "local"
+
+    def __init__(self, index_dir: str, corpus_dir: Optional[str] = None):
+        from utils.local_corpus import LocalCorpusIndex
+        self.index = LocalCorpusIndex(index_dir)
+        if corpus_dir:
+            # Only new or changed files are read, so this is cheap after the first run
+            self.index.update(corpus_dir)
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        return self.index.search(query, max_results)
+
+
+class FakeSearchBackend(SearchBackend):
+    """Offline backend returning synthetic results after a log-normal delay around ``latency`` seconds."""
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def _delay(self) -> float:
+        return random.lognormvariate(math.log(self.latency), 0.4) if self.latency > 0 else 0.0
+
+    @staticmethod
+    def _results(query: str, max_results: int) -> List[Dict]:
+        return [
+            {"title": f"{query} ({i})", "url": f"https://example.com/{i}?q={query.replace(' ', '+')}",
+             "content": f"Synthetic result {i} about {query}."}
+            for i in range(1, max_results + 1)
+        ]
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        time.sleep(self._delay())
+        return self._results(query, max_results)
+
+    async def asearch(self, query: str, max_results: int = 5) -> List[Dict]:
+        await asyncio.sleep(self._delay())
+        return self._results(query, max_results)
+
+
+def _build_backend(name: str) -> SearchBackend:
+    if name == "tavily":
+        return TavilyBackend()
+    if name == "local":
+        return LocalCorpusBackend(
+            index_dir=os.getenv("LOCAL_CORPUS_INDEX", os.path.join("research_memory", "corpus_index")),
+            corpus_dir=os.getenv("LOCAL_CORPUS_DIR"),
+        )
+    if name == "fake":
+        return FakeSearchBackend(latency=float(os.getenv("SEARCH_FAKE_LATENCY", "0")))
+    raise ValueError(f"Unknown search backend '{name}'. Choose 'tavily', 'local' or 'fake'.")
+
+
+def _hedged(primary) -> HedgedSearchBackend:
+    """Wrap a remote backend with hedging, a per-call timeout and the SEARCH_FALLBACK chain ("cache", "local")."""
+    fallback_names = [n.strip().lower() for n in os.getenv("SEARCH_FALLBACK", "cache").split(",") if n.strip()]
+    cache = ResultCache(int(os.getenv("SEARCH_CACHE_SIZE", "512"))) if "cache" in fallback_names else None
+    return HedgedSearchBackend(
+        primary,
+        fallbacks=[_build_backend(n) for n in fallback_names if n != "cache"],
+        cache=cache,
+        hedge_percentile=float(os.getenv("SEARCH_HEDGE_PERCENTILE", "95")),
+        timeout=float(os.getenv("SEARCH_TIMEOUT", "10")),
+    )
+
+
+def create_search_backend(name: Optional[str] = None) -> SearchBackend:
+    """Build the backend named by ``name`` or the SEARCH_BACKEND env var ("tavily", "local" or "fake").
+
+    Remote backends are hedged with a fallback chain unless SEARCH_HEDGING is false.
+    When a cassette is recording or replaying (CASSETTE_MODE), the (hedged) backend is
+    wrapped by it, so each served search is recorded once however many attempts it took.
+    """
+    if cassette.replaying:
+        # Recorded results only; no provider client (or API key) needed
+        return cassette.wrap_search(None)
+    name = (name or os.getenv("SEARCH_BACKEND", "tavily")).lower()
+    backend = _build_backend(name)
+    # The local index answers in milliseconds from this process; hedging it would only duplicate work
+    if name != "local" and os.getenv("SEARCH_HEDGING", "true").lower() == "true":
+        backend = _hedged(backend)
+    return cassette.wrap_search(backend)
+
+
+class SearchTool:
+    def __init__(self, backend: Optional[SearchBackend] = None):
+        self.backend = backend or create_search_backend()
+        # Identical searches in flight at the same time (duplicate plan steps, concurrent sessions) share one call
+        self.flights = SingleFlight()
+
+    def stats(self) -> Optional[Dict]:
+        """Hedging and fallback counters of the backend, when it is hedged."""
+        backend = self.backend.backend if isinstance(self.backend, CassetteSearchBackend) else self.backend
+        return backend.stats() if isinstance(backend, HedgedSearchBackend) else None
+
     def search(self, query: str, max_results: int = 5) -> List[Dict]:
         try:
-            response = self.client.search(query=query, max_results=max_results)
-            return response.get('results', [])
+            if not SINGLE_FLIGHT_ENABLED:
+                return self.backend.search(query, max_results)
+            return self.flights.do((query, max_results), lambda: self.backend.search(query, max_results))
         except Exception as e:
             return [{"error": f"Search failed: {str(e)}"}]
-    
-    def process_search_results(self, query: str, max_results: int = 5) -> str:
-        results = self.search(query, max_results)
+
+    async def asearch(self, query: str, max_results: int = 5) -> List[Dict]:
+        try:
+            if not SINGLE_FLIGHT_ENABLED:
+                return await self.backend.asearch(query, max_results)
+            return await self.flights.ado((query, max_results), lambda: self.backend.asearch(query, max_results))
+        except Exception as e:
+            return [{"error": f"Search failed: {str(e)}"}]
+
+    @staticmethod
+    def format_search_results(query: str, results: List[Dict]) -> str:
         if not results or "error" in results[0]:
             return "No results found or search failed."
         
@@ -39,13 +184,18 @@ class SearchTool:
             formatted_results += f"   Content: {result.get('content', 'No content')[:200]}...\n\n"
         
         return formatted_results
+    
+    def process_search_results(self, query: str, max_results: int = 5) -> str:
+        return self.format_search_results(query, self.search(query, max_results))
+
+    async def aprocess_search_results(self, query: str, max_results: int = 5) -> str:
+        return self.format_search_results(query, await self.asearch(query, max_results))
 
 search_tool = SearchTool()
 
-@tool(parse_docstring=True)
-def tavily_search(query: str, max_results: int = 5) -> str:
+def _tavily_search(query: str, max_results: int = 5) -> str:
     """
-    Perform a search using Tavily and return formatted results.
+    Perform a search with the configured backend (Tavily by default) and return formatted results.
 
     Args:
         query (str): The search query string
@@ -57,6 +207,20 @@ def tavily_search(query: str, max_results: int = 5) -> str:
     return search_tool.process_search_results(query=query, max_results=max_results)
 
 
+async def _atavily_search(query: str, max_results: int = 5) -> str:
+    return await search_tool.aprocess_search_results(query=query, max_results=max_results)
+
+
+# Sync and async implementations behind one tool, so `.invoke` and `.ainvoke`
+# both do native I/O instead of `.ainvoke` falling back to a worker thread
+tavily_search = StructuredTool.from_function(
+    func=_tavily_search,
+    coroutine=_atavily_search,
+    name="tavily_search",
+    parse_docstring=True,
+)
+
+
 @tool(parse_docstring=True)
 def think_tool(reflection: str) -> str:
     """
@@ -83,57 +247,27 @@ def draw_graph(
     y_key: Optional[str] = None,
     x_label: str = "",
     y_label: str = "",
-    filename: str = "graph.png"
 ) -> str:
     """
-    Draw a graph (bar, line, pie) from structured data and save as an image.
+    Describe a graph (bar, line, pie) from structured data as a Vega-Lite chart spec.
 
     Args:
         title (str): Title of the graph
         data (List[Dict]): List of dictionaries containing data points
         chart_type (str): 'bar', 'line', or 'pie'
-        x_key (str, optional): Key in each dict for X-axis (ignored for pie)
-        y_key (str, optional): Key in each dict for Y-axis (ignored for pie)
+        x_key (str, optional): Key in each dict for X-axis (category labels for pie)
+        y_key (str, optional): Key in each dict for Y-axis (slice sizes for pie)
         x_label (str): Label for X-axis
         y_label (str): Label for Y-axis
-        filename (str): Output filename (saved in graphs folder)
 
     Returns:
-        str: File path to the saved graph image
+        str: The chart's Vega-Lite spec as JSON, rendered by the client
     """
-    plt.figure(figsize=(10,6))
-
-    if chart_type.lower() == "bar":
-        x_data = [item[x_key] for item in data]
-        y_data = [item[y_key] for item in data]
-        plt.bar(x_data, y_data, color='skyblue')
-        plt.xlabel(x_label)
-        plt.ylabel(y_label)
-        plt.xticks(rotation=45, ha='right')
-
-    elif chart_type.lower() == "line":
-        x_data = [item[x_key] for item in data]
-        y_data = [item[y_key] for item in data]
-        plt.plot(x_data, y_data, marker='o', linestyle='-', color='green')
-        plt.xlabel(x_label)
-        plt.ylabel(y_label)
-        plt.xticks(rotation=45, ha='right')
-
-    elif chart_type.lower() == "pie":
-        labels = [item[x_key] for item in data]
-        sizes = [item[y_key] for item in data]
-        plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140)
-
-    else:
-        return f"Error: Unsupported chart_type '{chart_type}'. Choose 'bar', 'line', or 'pie'."
-
-    plt.title(title)
-    plt.tight_layout()
-
-    output_path = os.path.join(GRAPH_OUTPUT_DIR, filename)
-    plt.savefig(output_path)
-    plt.close()
-    return f"Graph saved to: {output_path}"
+    try:
+        graph = build_graph(title, data, chart_type, x_key, y_key, x_label, y_label)
+    except (ValueError, KeyError, TypeError) as e:
+        return f"Error: {e}"
+    return json.dumps(graph.spec)
 
 
 def get_today_str() -> str:
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import uuid
 import streamlit as st
@@ -8,51 +9,17 @@ from langchain_core.messages import AIMessage, HumanMessage
 
 # === Import your modules ===
 from agents.research_agent import agent as research_agent
-from utils.document_export import export_to_txt, export_to_docx, export_to_pdf
+from utils.document_export import export_to_txt, export_to_docx, export_to_pdf, format_research_report
+from utils.chart_specs import spec_of
+from utils.gathered_store import GatheredStore
 from utils.tracing import configure_tracing
+from utils.profiling import PROFILE_RUNS, profile_invoke
 from agents.state import ResearchAgentState
 from agents.scoping_agent import agent as agent  # Your compiled StateGraph
 
 load_dotenv()
 thread_id = str(uuid.uuid4())
 config = {"configurable": {"thread_id": thread_id}}
-def format_research_report(report_data):
-    """Convert the research report JSON to formatted Markdown"""
-    if isinstance(report_data, str):
-        try:
-            report_data = json.loads(report_data)
-        except:
-            return report_data  # Return as-is if it's not valid JSON
-    
-    markdown = f"# {report_data.get('topic', 'Research Report')}\n\n"
-    
-    # Summary
-    markdown += f"## Summary\n{report_data.get('summary', '')}\n\n"
-    
-    # Key Findings
-    if 'key_findings' in report_data and report_data['key_findings']:
-        markdown += "## Key Findings\n"
-        for finding in report_data['key_findings']:
-            markdown += f"- {finding}\n"
-        markdown += "\n"
-    
-    # Sections
-    if 'sections' in report_data and report_data['sections']:
-        for section in report_data['sections']:
-            markdown += f"## {section.get('title', 'Section')}\n"
-            markdown += f"{section.get('content', '')}\n\n"
-    
-    # Conclusion
-    if 'conclusion' in report_data and report_data['conclusion']:
-        markdown += f"## Conclusion\n{report_data['conclusion']}\n\n"
-    
-    # References
-    if 'references' in report_data and report_data['references']:
-        markdown += "## References\n"
-        for i, ref in enumerate(report_data['references'], 1):
-            markdown += f"{i}. {ref}\n"
-    
-    return markdown
 # === Page Config ===
 st.set_page_config(
     page_title="DigDeep",
@@ -68,6 +35,134 @@ except Exception as e:
     tracing_enabled = False
     st.warning(f"LangSmith tracing not configured: {e}")
 
+# === Cached Rendering (keyed by report hash) ===
+def report_hash(report) -> str:
+    """Stable key for a report, whether stored as a model or a dict."""
+    data = report.model_dump() if hasattr(report, "model_dump") else report
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def formatted_report(report_key, _report):
+    """Markdown for a report; only ``report_key`` is hashed, not the report itself."""
+    return format_research_report(_report)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def export_docx(report_key, graphs_json, _report_markdown) -> bytes:
+    """DOCX export; charts are rasterized here, once per report and chart set."""
+    return export_to_docx(_report_markdown, graphs=json.loads(graphs_json))[0]
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def export_pdf(report_key, graphs_json, _report_markdown) -> bytes:
+    return export_to_pdf(_report_markdown, graphs=json.loads(graphs_json))[0]
+
+
+# === History & Results Fragments ===
+# Each part of the History & Results tab reruns on its own when a widget inside it
+# is used; report markdown and exports are memoized by report hash above, and
+# DOCX/PDF are only generated when downloaded.
+HISTORY_PAGE_SIZE = 20
+
+
+@st.fragment
+def history_sidebar():
+    history = st.session_state.research_history
+    pages = max(1, -(-len(history) // HISTORY_PAGE_SIZE))
+    page = st.number_input("Page", 1, pages, 1, key="history_page") if pages > 1 else 1
+    start = (page - 1) * HISTORY_PAGE_SIZE
+    for i, research in enumerate(history[start:start + HISTORY_PAGE_SIZE], start):
+        if st.button(f"{research['timestamp']}: {research['query'][:30]}...", key=f"history_{i}"):
+            st.session_state.current_research = research
+            st.session_state.user_input = research['query']
+            # The selection changes the whole page, not just this fragment
+            st.rerun()
+
+
+@st.fragment
+def report_view(research):
+    markdown = formatted_report(research["report_hash"], research["report"])
+    st.subheader("Research Report")
+    tab_report, tab_copy = st.tabs(["View Report", "Copy Report"])
+    with tab_report:
+        st.write(markdown)
+    with tab_copy:
+        st.code(markdown, language="markdown")
+
+
+@st.fragment
+def graphs_view(research):
+    st.subheader("Graph Visualization")
+    if research.get("graphs"):
+        # Specs are drawn by Vega-Lite in the browser
+        for spec in research["graphs"]:
+            st.vega_lite_chart(spec)
+    elif research.get("graph_paths"):
+        for graph_path in research["graph_paths"]:
+            if os.path.exists(graph_path):
+                st.image(graph_path, caption="Generated Graph", use_column_width=True)
+            else:
+                st.info(f"Graph file not found: {graph_path}")
+    else:
+        st.info("No graph generated for this research.")
+
+
+@st.fragment
+def export_view(research):
+    markdown = formatted_report(research["report_hash"], research["report"])
+    st.subheader("Export Report")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        txt_data, txt_name = export_to_txt(markdown)
+        st.download_button("Download as TXT", txt_data, txt_name, mime="text/plain")
+    # Built only when the button is clicked, not on every rerun that shows the report
+    key, graphs_json = research["report_hash"], json.dumps(research.get("graphs", []))
+    with col2:
+        st.download_button("Download as DOCX", lambda: export_docx(key, graphs_json, markdown), "research_report.docx",
+                           mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    with col3:
+        st.download_button("Download as PDF", lambda: export_pdf(key, graphs_json, markdown), "research_report.pdf",
+                           mime="application/pdf")
+
+
+@st.fragment
+def profile_view(profile):
+    with st.expander("Profile"):
+        st.write(f"**Wall time:** {profile['wall_seconds']} s — **Peak traced memory:** {profile['peak_traced_mb']} MB — "
+                 f"**Samples:** {profile['samples']}")
+        st.caption(f"Profile files: {os.path.dirname(profile['stacks_path'])}")
+        for node, sites in profile["allocations"].items():
+            st.write(f"**{node}**")
+            st.table(sites[:5])
+        col_stacks, col_allocs = st.columns(2)
+        with col_stacks:
+            with open(profile["stacks_path"], "rb") as f:
+                st.download_button("Download flamegraph stacks", f.read(), "stacks.folded", mime="text/plain")
+        with col_allocs:
+            with open(profile["allocations_path"], "rb") as f:
+                st.download_button("Download allocations", f.read(), "allocations.json", mime="application/json")
+
+
+@st.fragment
+def details_view(research):
+    with st.expander("View Research Details"):
+        st.write(f"**Query:** {research['query']}")
+        st.write(f"**Iterations:** {research['iterations']}")
+        st.subheader("Gathered Information")
+        for i, info in enumerate(research.get("gathered_info", [])):
+            if isinstance(info, dict) or hasattr(info, "snippet"):
+                # Dicts from older history records, or views over the columnar GatheredStore
+                query, snippet = (info.get('query', ''), info.get('snippet', '')) if isinstance(info, dict) else (info.query, info.snippet)
+                st.write(f"**Query {i+1}:** {query}")
+                with st.expander(f"View results for Query {i+1}"):
+                    st.text(snippet)
+            else:
+                st.write(f"**Query {i+1}:** {info}")
+                
+            st.divider()
+
+
 # === Session State Defaults ===
 defaults = {
     "research_history": [],
@@ -105,14 +200,15 @@ with st.sidebar:
         help="How many search cycles to perform before generating report?",
         key="sidebar_max_iterations"
     )
+    profile_run = st.checkbox(
+        "Profile runs", value=PROFILE_RUNS,
+        help="Record a stack-sample flamegraph and per-node allocation sites for each run (slower)",
+        key="sidebar_profile_run"
+    )
     
     st.markdown("---")
     st.header("Research History")
-    for i, research in enumerate(st.session_state.research_history):
-        if st.button(f"{research['timestamp']}: {research['query'][:30]}...", key=f"history_{i}"):
-            st.session_state.current_research = research
-            st.session_state.user_input = research['query']
-            st.rerun()
+    history_sidebar()
 
 # === Tabs ===
 tab1, tab2 = st.tabs(["New Research", "History & Results"])
@@ -145,8 +241,10 @@ with tab1:
     
     if st.button("Generate Brief and Research", disabled=not initial_message):
             try:
-                
-                state = agent.invoke(state, config=config)
+                if profile_run:
+                    state, profile = profile_invoke(agent, state, config)
+                else:
+                    state, profile = agent.invoke(state, config=config), None
                 if state.get("messages") and "?" in getattr(state["messages"][-1], "content", ""):
                     st.warning("The agent needs clarification to generate the brief:")
                     clarification = st.text_input("Your reply:", key="clarify_brief")
@@ -170,10 +268,11 @@ with tab1:
                     gathered_info = []
                     gathered_information = state.get("gathered_information")
                     if gathered_information is not None:
-                        if hasattr(gathered_information, "items"):
+                        if isinstance(gathered_information, dict):
+                            gathered_info = GatheredStore.coerce(gathered_information.get("items", []))
+                        elif hasattr(gathered_information, "items"):
+                            # Kept columnar in the session history; rows are read through views
                             gathered_info = gathered_information.items
-                        elif isinstance(gathered_information, dict):
-                            gathered_info = gathered_information.get("items", [])
                         elif isinstance(gathered_information, list):
                             gathered_info = gathered_information
                     research_record = {
@@ -181,9 +280,12 @@ with tab1:
                         "query": initial_message,
                         "brief": state.get("research_brief", ""),
                         "report": state.get("research_report", ""),
+                        "report_hash": report_hash(state.get("research_report", "")),
                         "graph_paths": state.get("graph_paths", []),
+                        "graphs": [spec_of(graph) for graph in state.get("graphs") or []],
                         "gathered_info": gathered_info,
-                        "iterations": state.get("iterations", 0)
+                        "iterations": state.get("iterations", 0),
+                        "profile": profile
                     }
                     st.session_state.research_history.insert(0, research_record)
                     st.session_state.current_research = research_record
@@ -201,6 +303,9 @@ with tab2:
         st.info("No research history yet. Run a research query to see results here.")
     elif st.session_state.current_research:
         research = st.session_state.current_research
+        # Records saved before report hashes were stored get theirs once
+        if "report_hash" not in research:
+            research["report_hash"] = report_hash(research["report"])
         st.header(f"Research: {research['query']}")
         st.caption(f"Completed on {research['timestamp']} ({research['iterations']} iterations)")
         
@@ -210,49 +315,12 @@ with tab2:
         st.subheader("Research Brief")
         st.write(research["brief"])
         
-        st.subheader("Research Report")
-        tab_report, tab_copy = st.tabs(["View Report", "Copy Report"])
-        with tab_report:
-            st.write(format_research_report(research["report"]))
-        with tab_copy:
-            st.code(format_research_report(research["report"]), language="markdown")
-        
-        st.subheader("Graph Visualization")
-        if research.get("graph_paths"):
-            for graph_path in research["graph_paths"]:
-                if os.path.exists(graph_path):
-                    st.image(graph_path, caption="Generated Graph", use_column_width=True)
-                else:
-                    st.info(f"Graph file not found: {graph_path}")
-        else:
-            st.info("No graph generated for this research.")
-        formatted_research_report = format_research_report(research["report"])
-        st.subheader("Export Report")
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            txt_data, txt_name = export_to_txt(formatted_research_report)
-            st.download_button("Download as TXT", txt_data, txt_name, mime="text/plain")
-        with col2:
-            doc_data, doc_name = export_to_docx(formatted_research_report)
-            st.download_button("Download as DOCX", doc_data, doc_name,
-                               mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
-        with col3:
-            pdf_data, pdf_name = export_to_pdf(formatted_research_report)
-            st.download_button("Download as PDF", pdf_data, pdf_name, mime="application/pdf")
-        
-        with st.expander("View Research Details"):
-            st.write(f"**Query:** {research['query']}")
-            st.write(f"**Iterations:** {research['iterations']}")
-            st.subheader("Gathered Information")
-            for i, info in enumerate(research.get("gathered_info", [])):
-                if isinstance(info, dict):
-                    st.write(f"**Query {i+1}:** {info.get('query', '')}")
-                    with st.expander(f"View results for Query {i+1}"):
-                        st.text(info.get('snippet', ''))
-                else:
-                    st.write(f"**Query {i+1}:** {info}")
-                    
-                st.divider()
+        report_view(research)
+        graphs_view(research)
+        export_view(research)
+        if research.get("profile"):
+            profile_view(research["profile"])
+        details_view(research)
     else:
         # If there's history but no current research selected
         st.info("Select a research from the sidebar to view details")
@@ -0,0 +1,323 @@
+"""Async HTTP API for the research graph.
+
+Endpoints:
+- ``POST /runs`` with ``{"query": ..., "clarification": ...}`` starts a run and returns its id
+- ``GET /runs/{run_id}`` returns status, brief, per-node timings and any error
+- ``GET /runs/{run_id}/events`` streams node start/end and status events as server-sent events
+  (past events are replayed first, so late subscribers see the whole run)
+- ``POST /runs/{run_id}/clarification`` with ``{"reply": ...}`` resumes a run waiting for clarification
+- ``GET /runs/{run_id}/report`` returns the report as JSON and Markdown, with charts as Vega-Lite specs
+- ``GET /runs/{run_id}/export/{fmt}`` downloads the report as ``txt``, ``md``, ``docx`` or ``pdf``
+- ``GET /health`` reports active runs and single-flight coalescing counts for searches and LLM calls
+
+Runs execute as tasks on the server's event loop with `agent.astream`, sharing
+the process-wide model instances (cached per tier by the model registry) and
+the search tool's Tavily clients, so connections are pooled across runs. Set
+``MODEL_PROVIDER=fake`` and ``SEARCH_BACKEND=fake`` to exercise the API offline.
+
+    uvicorn server:app --port 8000
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, HumanMessage
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from agents.model_registry import model_registry
+from agents.tools import search_tool
+from utils.chart_specs import spec_of
+from utils.document_export import export_to_docx, export_to_pdf, export_to_txt, format_research_report
+from utils.history_compaction import message_text
+
+load_dotenv()
+
+# Runs executing at the same time; further submissions wait in "queued"
+API_MAX_CONCURRENT_RUNS = int(os.getenv("API_MAX_CONCURRENT_RUNS", "8"))
+# Finished runs kept in memory for status, report and export requests
+API_MAX_STORED_RUNS = int(os.getenv("API_MAX_STORED_RUNS", "200"))
+# Seconds between SSE keep-alive comments
+SSE_KEEPALIVE_SECONDS = 15
+
+_FINAL_STATUSES = ("completed", "failed", "needs_clarification")
+_EXPORT_TYPES = {
+    "txt": "text/plain",
+    "md": "text/markdown",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+
+
+class Run:
+    """One research run: its status, the event log streamed to clients and the final state."""
+
+    def __init__(self, query: str, clarification: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.query = query
+        self.clarification = clarification
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.question: Optional[str] = None
+        self.final: Dict = {}
+        self.node_seconds: Dict[str, float] = {}
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict] = []
+        self.config = {"configurable": {"thread_id": f"api-{self.id}"}}
+        self._changed = asyncio.Condition()
+
+    async def emit(self, event: str, **data) -> None:
+        async with self._changed:
+            self.events.append({"event": event, "time": round(time.time(), 3), **data})
+            self._changed.notify_all()
+
+    async def wait_for_events(self, seen: int, timeout: float) -> None:
+        async with self._changed:
+            if len(self.events) == seen:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    @property
+    def graphs(self) -> List[Dict]:
+        return [spec_of(graph) for graph in self.final.get("graphs") or []]
+
+    @property
+    def report(self):
+        report = self.final.get("research_report")
+        return report.model_dump() if hasattr(report, "model_dump") else report
+
+    def summary(self) -> Dict:
+        return {
+            "run_id": self.id,
+            "query": self.query,
+            "status": self.status,
+            "question": self.question,
+            "error": self.error,
+            "research_brief": self.final.get("research_brief", ""),
+            "node_seconds": self.node_seconds,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class RunManager:
+    def __init__(self, graph, max_concurrent: int = API_MAX_CONCURRENT_RUNS, max_stored: int = API_MAX_STORED_RUNS):
+        self.graph = graph
+        self.max_stored = max_stored
+        self.runs: "OrderedDict[str, Run]" = OrderedDict()
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._tasks: set = set()
+
+    def get(self, run_id: str) -> Optional[Run]:
+        return self.runs.get(run_id)
+
+    def _evict(self) -> None:
+        finished = [run_id for run_id, run in self.runs.items() if run.status in _FINAL_STATUSES]
+        checkpointer = getattr(self.graph, "checkpointer", None)
+        for run_id in finished[:max(0, len(self.runs) - self.max_stored)]:
+            run = self.runs.pop(run_id)
+            # The thread's checkpoints (and, with a blob store, its unshared blobs) go with the run
+            if checkpointer is not None and hasattr(checkpointer, "delete_thread"):
+                checkpointer.delete_thread(run.config["configurable"]["thread_id"])
+
+    def _start(self, run: Run, state: Dict) -> None:
+        task = asyncio.create_task(self._execute(run, state))
+        # Keep a reference so the task is not garbage collected mid-run
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def submit(self, query: str, clarification: Optional[str] = None) -> Run:
+        run = Run(query, clarification)
+        self.runs[run.id] = run
+        self._evict()
+        self._start(run, {"research_brief": "", "messages": [AIMessage(content=query)]})
+        return run
+
+    def resume(self, run: Run, reply: str) -> None:
+        run.status, run.question = "queued", None
+        # Only the reply: the rest of the state comes from the thread's checkpoint, and
+        # re-sending it would add reducer-backed fields such as sub_findings twice
+        self._start(run, {"messages": [HumanMessage(content=reply)]})
+
+    async def _execute(self, run: Run, state: Dict) -> None:
+        async with self._semaphore:
+            run.status = "running"
+            await run.emit("status", status="running")
+            started: Dict[str, float] = {}
+            try:
+                async for mode, chunk in self.graph.astream(state, config=run.config, stream_mode=["tasks", "values"]):
+                    if mode == "values":
+                        run.final = chunk
+                    elif "input" in chunk:
+                        started[chunk["id"]] = time.perf_counter()
+                        await run.emit("node_start", node=chunk["name"])
+                    elif chunk["id"] in started:
+                        seconds = time.perf_counter() - started.pop(chunk["id"])
+                        run.node_seconds[chunk["name"]] = round(run.node_seconds.get(chunk["name"], 0.0) + seconds, 3)
+                        await run.emit("node_end", node=chunk["name"], seconds=round(seconds, 3),
+                                       error=str(chunk["error"]) if chunk.get("error") else None)
+            except Exception as e:
+                run.status, run.error = "failed", f"{type(e).__name__}: {e}"
+            else:
+                if run.report:
+                    run.status = "completed"
+                else:
+                    messages = run.final.get("messages") or []
+                    run.question = message_text(messages[-1]) if messages else ""
+                    run.status = "needs_clarification"
+            run.finished_at = time.time()
+        if run.status == "needs_clarification" and run.clarification:
+            # The reply supplied with the submission answers the first question
+            reply, run.clarification = run.clarification, None
+            await run.emit("status", status="needs_clarification", question=run.question)
+            self.resume(run, reply)
+            return
+        await run.emit("status", status=run.status, question=run.question, error=run.error)
+
+
+# ===== HANDLERS =====
+
+def _not_found(run_id: str) -> JSONResponse:
+    return JSONResponse({"error": f"Unknown run '{run_id}'."}, status_code=404)
+
+
+async def _json_body(request: Request) -> Dict:
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, ValueError):
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+async def submit_run(request: Request) -> JSONResponse:
+    body = await _json_body(request)
+    query = str(body.get("query", "")).strip()
+    if not query:
+        return JSONResponse({"error": "'query' is required."}, status_code=400)
+    run = request.app.state.runs.submit(query, body.get("clarification"))
+    return JSONResponse(run.summary(), status_code=202)
+
+
+async def get_run(request: Request) -> JSONResponse:
+    run = request.app.state.runs.get(request.path_params["run_id"])
+    return JSONResponse(run.summary()) if run else _not_found(request.path_params["run_id"])
+
+
+async def stream_events(request: Request) -> Response:
+    run = request.app.state.runs.get(request.path_params["run_id"])
+    if run is None:
+        return _not_found(request.path_params["run_id"])
+
+    async def events():
+        seen = 0
+        while True:
+            while seen < len(run.events):
+                event = run.events[seen]
+                seen += 1
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+                if event["event"] == "status" and event["status"] in _FINAL_STATUSES and run.status == event["status"]:
+                    return
+            if await request.is_disconnected():
+                return
+            await run.wait_for_events(seen, SSE_KEEPALIVE_SECONDS)
+            if seen == len(run.events):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+async def answer_clarification(request: Request) -> JSONResponse:
+    run = request.app.state.runs.get(request.path_params["run_id"])
+    if run is None:
+        return _not_found(request.path_params["run_id"])
+    if run.status != "needs_clarification":
+        return JSONResponse({"error": f"Run is {run.status}, not waiting for clarification."}, status_code=409)
+    reply = str((await _json_body(request)).get("reply", "")).strip()
+    if not reply:
+        return JSONResponse({"error": "'reply' is required."}, status_code=400)
+    request.app.state.runs.resume(run, reply)
+    return JSONResponse(run.summary(), status_code=202)
+
+
+def _finished_report(request: Request):
+    run = request.app.state.runs.get(request.path_params["run_id"])
+    if run is None:
+        return None, _not_found(request.path_params["run_id"])
+    if run.status != "completed":
+        return None, JSONResponse({"error": f"Run is {run.status}; no report yet."}, status_code=409)
+    return run, None
+
+
+async def get_report(request: Request) -> JSONResponse:
+    run, error = _finished_report(request)
+    if error:
+        return error
+    return JSONResponse(json.loads(json.dumps({
+        "run_id": run.id,
+        "research_brief": run.final.get("research_brief", ""),
+        "research_report": run.report,
+        "markdown": format_research_report(run.report),
+        # Vega-Lite specs, for the client to render
+        "graphs": run.graphs,
+    }, default=str)))
+
+
+async def export_report(request: Request) -> Response:
+    run, error = _finished_report(request)
+    if error:
+        return error
+    fmt = request.path_params["fmt"]
+    if fmt not in _EXPORT_TYPES:
+        return JSONResponse({"error": f"Unsupported format '{fmt}'. Choose one of {sorted(_EXPORT_TYPES)}."}, status_code=400)
+    markdown = format_research_report(run.report)
+    if fmt in ("txt", "md"):
+        data, _ = export_to_txt(markdown)
+        data = data.encode("utf-8")
+    else:
+        # Document rendering and chart rasterization are CPU-bound; keep them off the event loop
+        data, _ = await run_in_threadpool(export_to_docx if fmt == "docx" else export_to_pdf, markdown, graphs=run.graphs)
+    filename = f"research_report_{run.id[:8]}.{fmt}"
+    return Response(data, media_type=_EXPORT_TYPES[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+async def health(request: Request) -> JSONResponse:
+    runs = request.app.state.runs.runs.values()
+    return JSONResponse({
+        "status": "ok",
+        "active_runs": sum(run.status in ("queued", "running") for run in runs),
+        # Identical searches and prompts that shared another run's in-flight call
+        "coalescing": {"search": search_tool.flights.stats(), "llm": model_registry.flights.stats()},
+    })
+
+
+def create_app(graph=None) -> Starlette:
+    """Build the API around a compiled graph (the scoping agent by default)."""
+    if graph is None:
+        from agents.scoping_agent import agent as graph
+    app = Starlette(routes=[
+        Route("/health", health),
+        Route("/runs", submit_run, methods=["POST"]),
+        Route("/runs/{run_id}", get_run),
+        Route("/runs/{run_id}/events", stream_events),
+        Route("/runs/{run_id}/clarification", answer_clarification, methods=["POST"]),
+        Route("/runs/{run_id}/report", get_report),
+        Route("/runs/{run_id}/export/{fmt}", export_report),
+    ])
+    app.state.runs = RunManager(graph)
+    return app
+
+
+app = create_app()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Run the graphs offline: fake models and search, no memory store or tracing
+os.environ.setdefault("MODEL_PROVIDER", "fake")
+os.environ.setdefault("SEARCH_BACKEND", "fake")
+os.environ.setdefault("RESEARCH_MEMORY_ENABLED", "false")
+os.environ.setdefault("LANGSMITH_TRACING", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
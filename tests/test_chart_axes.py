@@ -0,0 +1,29 @@
+from langchain_core.messages import HumanMessage
+
+import agents.scoping_agent as scoping_agent
+from agents.clarification_heuristics import heuristic_clarification
+from agents.state import GatheredInformation, InformationItem, ResearchAgentState
+
+REQUEST = "Compare gyms in Kampala with a line chart, x-axis: gym name, y-axis: price in UGX"
+
+
+def test_clarified_axes_reach_the_graph_input():
+    state = ResearchAgentState(research_brief="", messages=[HumanMessage(content=REQUEST)])
+    response = heuristic_clarification(state.messages)
+    update = scoping_agent._route_clarification(state, response).update
+
+    state = ResearchAgentState(**{**update, "gathered_information": GatheredInformation(topic="gyms", items=[
+        InformationItem(query="gyms", source="https://example.com", snippet="Gym name: Fitclub, price in UGX: 150000"),
+    ])})
+    graph_input, _ = scoping_agent._graph_input(state)
+
+    assert (graph_input["chart_type"], graph_input["x_label"], graph_input["y_label"]) == ("line", "gym name", "price in UGX")
+    assert graph_input["data"] == [{"name": "Fitclub", "value": 150000.0}]
+
+
+def test_graph_input_defaults_without_clarified_chart():
+    state = ResearchAgentState(research_brief="", graph_type="scatter", gathered_information=GatheredInformation(
+        topic="gyms", items=[InformationItem(query="gyms", source="https://example.com", snippet="about 12 gyms")]))
+    graph_input, _ = scoping_agent._graph_input(state)
+
+    assert (graph_input["chart_type"], graph_input["x_label"], graph_input["y_label"]) == ("bar", "X", "Y")
@@ -0,0 +1,54 @@
+import asyncio
+import uuid
+
+from langchain_core.messages import AIMessage
+
+import agents.scoping_agent as scoping_agent
+from agents.state_scope import ClarifyWithUser
+
+
+def _ask_for_clarification(messages):
+    return ClarifyWithUser(need_clarification=True, question="Which city?", verification="",
+                           has_location=False, needs_visualization=False)
+
+
+def _fresh_request():
+    return {"research_brief": "", "messages": [AIMessage(content="User research request: best coffee shops in Nairobi")]}
+
+
+def _config():
+    return {"configurable": {"thread_id": str(uuid.uuid4())}}
+
+
+def test_clarification_ended_run_discards_its_prefetch(monkeypatch):
+    monkeypatch.setattr(scoping_agent, "HEURISTIC_CLARIFICATION", True)
+    monkeypatch.setattr(scoping_agent, "heuristic_clarification", _ask_for_clarification)
+    prefetched = scoping_agent.search_prefetcher.stats()["prefetched"]
+
+    out = scoping_agent.agent.invoke(_fresh_request(), _config())
+
+    assert out["research_plan"] is None
+    assert scoping_agent.search_prefetcher.stats()["prefetched"] > prefetched
+    assert scoping_agent.search_prefetcher.pending() == 0
+
+
+def test_async_clarification_ended_run_discards_its_prefetch(monkeypatch):
+    monkeypatch.setattr(scoping_agent, "HEURISTIC_CLARIFICATION", True)
+    monkeypatch.setattr(scoping_agent, "heuristic_clarification", _ask_for_clarification)
+
+    out = asyncio.run(scoping_agent.agent.ainvoke(_fresh_request(), _config()))
+
+    assert out["research_plan"] is None
+    assert scoping_agent.search_prefetcher.pending() == 0
+
+
+def test_no_prefetch_outside_search_gathering(monkeypatch):
+    monkeypatch.setattr(scoping_agent, "GATHER_MODE", "researcher")
+    prefetched = scoping_agent.search_prefetcher.stats()["prefetched"]
+    pending = scoping_agent.search_prefetcher.pending()
+    state = scoping_agent.ResearchAgentState(**_fresh_request())
+
+    scoping_agent.prefetch_searches(state, _config())
+
+    assert scoping_agent.search_prefetcher.stats()["prefetched"] == prefetched
+    assert scoping_agent.search_prefetcher.pending() == pending
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from agents.model_registry import FakeChatModel
+from utils.single_flight import CoalescingModel, SingleFlight
+
+
+class RecordingHandler(BaseCallbackHandler):
+    def __init__(self):
+        self.events = []
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.events.append("start")
+
+    def on_llm_end(self, response, **kwargs):
+        self.events.append(("end", response.generations[0][0].message.content))
+
+
+def _model(flights):
+    return CoalescingModel(flights, FakeChatModel(latency=0.3, responses=["shared reply"]), "fast")
+
+
+def test_concurrent_callers_each_get_their_callbacks():
+    flights = SingleFlight()
+    model = _model(flights)
+    handlers = [RecordingHandler(), RecordingHandler()]
+    replies = [None, None]
+
+    def call(i):
+        replies[i] = model.invoke("same prompt", {"callbacks": [handlers[i]]}).content
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert flights.stats()["coalesced"] == 1
+    assert replies == ["shared reply", "shared reply"]
+    for handler in handlers:
+        assert handler.events == ["start", ("end", "shared reply")]
+
+
+def test_concurrent_async_callers_each_get_their_callbacks():
+    flights = SingleFlight()
+    model = _model(flights)
+    handlers = [RecordingHandler(), RecordingHandler()]
+
+    async def run():
+        return await asyncio.gather(*(model.ainvoke("same prompt", {"callbacks": [h]}) for h in handlers))
+
+    replies = asyncio.run(run())
+
+    assert flights.stats()["coalesced"] == 1
+    assert [reply.content for reply in replies] == ["shared reply", "shared reply"]
+    for handler in handlers:
+        assert handler.events == ["start", ("end", "shared reply")]
+
+
+def test_call_options_are_part_of_the_key():
+    flights = SingleFlight()
+    model = _model(flights)
+
+    async def run():
+        return await asyncio.gather(model.ainvoke("same prompt"), model.ainvoke("same prompt", stop=["\n"]))
+
+    asyncio.run(run())
+
+    assert flights.stats()["coalesced"] == 0
@@ -0,0 +1,116 @@
+"""Per-rerun latency of the Streamlit app as research history grows.
+
+Seeds the session with ``N`` synthetic research records (report, charts,
+gathered items) and times script reruns with Streamlit's `AppTest`, which
+executes ``app.py`` the way the server does on every widget interaction:
+
+- ``full rerun``: the whole script, e.g. after a sidebar widget changes
+- ``history click``: selecting another record from the sidebar
+- ``history page``: paging through the sidebar history, a widget inside the
+  history fragment (needs more than one page of history)
+
+    python -m utils.app_benchmark --history 1,10,50,200 --reruns 10
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+from typing import Dict, List
+
+# The benchmark never runs the graph, but importing app.py builds it
+os.environ.setdefault("MODEL_PROVIDER", "fake")
+os.environ.setdefault("SEARCH_BACKEND", "fake")
+os.environ.setdefault("RESEARCH_MEMORY_ENABLED", "false")
+os.environ.setdefault("LANGSMITH_TRACING", "false")
+
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def synthetic_record(index: int, rng: random.Random) -> Dict:
+    words = [f"term{rng.randrange(5000)}" for _ in range(4000)]
+
+    def text(n: int) -> str:
+        start = rng.randrange(len(words) - n)
+        return " ".join(words[start:start + n])
+
+    points = [{"x": f"{2015 + i}", "y": round(rng.uniform(10, 100), 1)} for i in range(10)]
+    return {
+        "timestamp": f"2024-01-01 00:{index // 60:02d}:{index % 60:02d}",
+        "query": f"Synthetic research topic {index}: {text(8)}",
+        "brief": text(80),
+        "report": {
+            "topic": f"Topic {index}",
+            "summary": text(150),
+            "key_findings": [text(25) for _ in range(8)],
+            "sections": [{"title": f"Section {s}", "content": text(300)} for s in range(6)],
+            "conclusion": text(60),
+            "references": [f"https://example.com/{index}/{r}" for r in range(10)],
+        },
+        "graph_paths": [],
+        "graphs": [{
+            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+            "title": f"Chart {index}", "width": "container", "data": {"values": points},
+            "mark": {"type": "bar", "tooltip": True},
+            "encoding": {"x": {"field": "x", "type": "nominal", "sort": None},
+                         "y": {"field": "y", "type": "quantitative"}},
+        }],
+        "gathered_info": [{"query": text(6), "snippet": text(120)} for _ in range(20)],
+        "iterations": 2,
+        "profile": None,
+    }
+
+
+def _median_ms(samples: List[float]) -> float:
+    return statistics.median(samples) * 1000
+
+
+def measure(history_size: int, reruns: int) -> Dict[str, float]:
+    rng = random.Random(history_size)
+    app = AppTest.from_file(APP_PATH, default_timeout=120)
+    app.session_state["research_history"] = [synthetic_record(i, rng) for i in range(history_size)]
+    app.session_state["current_research"] = app.session_state["research_history"][0]
+    app.run()
+
+    full = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        full.append(time.perf_counter() - start)
+
+    clicks = []
+    history_buttons = [b for b in app.sidebar.button if (b.key or "").startswith("history_")]
+    for i in range(min(reruns, len(history_buttons))):
+        start = time.perf_counter()
+        app.sidebar.button(key=history_buttons[i % len(history_buttons)].key).click().run()
+        clicks.append(time.perf_counter() - start)
+
+    pages = []
+    if len(app.sidebar.number_input):
+        for i in range(reruns):
+            start = time.perf_counter()
+            app.sidebar.number_input(key="history_page").set_value(1 + (i + 1) % 2).run()
+            pages.append(time.perf_counter() - start)
+    return {"history": history_size, "full_rerun_ms": _median_ms(full),
+            "history_click_ms": _median_ms(clicks) if clicks else 0.0,
+            "history_page_ms": _median_ms(pages) if pages else 0.0}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Streamlit rerun latency against history size.")
+    parser.add_argument("--history", default="1,10,50,200", help="Comma-separated history sizes")
+    parser.add_argument("--reruns", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'history':>8s} {'full rerun ms':>14s} {'history click ms':>17s} {'history page ms':>16s}")
+    for size in (int(s) for s in args.history.split(",")):
+        result = measure(size, args.reruns)
+        print(f"{result['history']:8d} {result['full_rerun_ms']:14.1f} {result['history_click_ms']:17.1f} "
+              f"{result['history_page_ms']:16.1f}")
+
+
+if __name__ == "__main__":
+    main()
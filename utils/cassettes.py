@@ -0,0 +1,294 @@
+"""Record/replay cassettes for LLM and search I/O.
+
+In ``record`` mode every model call (per graph node) and every search is
+passed through to the real provider and appended to a JSONL cassette together
+with its latency. In ``replay`` mode the recorded responses are returned
+without any network access, after sleeping the recorded latency multiplied by
+``latency_scale`` (``1`` reproduces the original timing, ``0`` replays
+instantly). This makes runs reproducible for debugging and lets load tests
+replay real traffic shapes.
+
+Requests are matched by a hash of the node, output schema, bound tools, their
+options (``include_raw``, ``tool_choice``, ...) and input messages (or the
+search query). An LLM request that was not recorded falls back to the
+recordings of the same node and schema, cycling in recording order, so replays
+still work when prompts contain dates. A search that was not recorded raises
+`CassetteMiss` (reported as a failed search), since another query's results
+would silently change what the run is about; with ``search_fallback`` (e.g.
+for load tests replaying a traffic shape) it is served another recorded
+search's results instead, with a logged warning.
+
+Searches are recorded as served by the hedged backend, so a hedged duplicate
+request is recorded once.
+
+Configure with ``CASSETTE_MODE`` (``off``, ``record``, ``replay``),
+``CASSETTE_PATH``, ``CASSETTE_LATENCY_SCALE`` and ``CASSETTE_SEARCH_FALLBACK``.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, convert_to_messages, message_to_dict, messages_from_dict
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when nothing was recorded for a request."""
+
+
+def input_messages(input: Any) -> List[BaseMessage]:
+    """A model input (string, prompt value or message-likes) as a list of messages."""
+    if isinstance(input, str):
+        return [HumanMessage(content=input)]
+    if hasattr(input, "to_messages"):
+        return input.to_messages()
+    return convert_to_messages(input)
+
+
+def messages_key(input: Any) -> List:
+    """JSON-serialisable form of a model input: message types, contents and tool calls."""
+    # Message ids are random per run, so only type, content and tool calls identify a request
+    return [[m.type, m.content, [(c["name"], c["args"]) for c in getattr(m, "tool_calls", None) or []]]
+            for m in input_messages(input)]
+
+
+def request_hash(data: Dict) -> str:
+    """SHA-256 of a JSON-serialisable request description."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _encode(output: Any) -> Dict:
+    if isinstance(output, dict) and isinstance(output.get("raw"), BaseMessage):
+        # with_structured_output(..., include_raw=True)
+        error = output.get("parsing_error")
+        return {"type": "raw", "value": {
+            "raw": _encode(output["raw"]), "parsed": _encode(output.get("parsed")),
+            "parsing_error": f"{type(error).__name__}: {error}" if error is not None else None,
+        }}
+    if isinstance(output, BaseMessage):
+        return {"type": "message", "value": message_to_dict(output)}
+    if isinstance(output, BaseModel):
+        return {"type": "model", "value": output.model_dump(mode="json")}
+    return {"type": "json", "value": output}
+
+
+def _decode(data: Dict, schema: Any = None) -> Any:
+    if data["type"] == "raw":
+        value = data["value"]
+        error = value["parsing_error"]
+        return {"raw": _decode(value["raw"]), "parsed": _decode(value["parsed"], schema),
+                "parsing_error": ValueError(error) if error else None}
+    if data["type"] == "message":
+        return messages_from_dict([data["value"]])[0]
+    if data["type"] == "model" and isinstance(schema, type) and issubclass(schema, BaseModel):
+        return schema.model_validate(data["value"])
+    return data["value"]
+
+
+class Cassette:
+    def __init__(self, mode: str = "off", path: Optional[str] = None, latency_scale: float = 1.0,
+                 search_fallback: bool = False):
+        self._lock = threading.Lock()
+        self.configure(mode, path, latency_scale, search_fallback)
+
+    def configure(self, mode: str, path: Optional[str] = None, latency_scale: float = 1.0,
+                  search_fallback: bool = False) -> None:
+        """(Re)set the mode, cassette file, latency scale and search fallback; replay mode loads the file."""
+        if mode not in ("off", "record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}'. Choose 'off', 'record' or 'replay'.")
+        with self._lock:
+            self.mode = mode
+            self.path = path
+            self.latency_scale = latency_scale
+            self.search_fallback = search_fallback
+            self._exact: Dict[str, List[Dict]] = defaultdict(list)
+            self._by_group: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+            self._cursors: Dict[Any, int] = defaultdict(int)
+            self.stats = {"recorded": 0, "replayed": 0, "fallbacks": 0}
+            if mode == "replay":
+                self._load()
+
+    @classmethod
+    def from_env(cls) -> "Cassette":
+        return cls(
+            mode=os.getenv("CASSETTE_MODE", "off").lower(),
+            path=os.getenv("CASSETTE_PATH", os.path.join("cassettes", "session.jsonl")),
+            latency_scale=float(os.getenv("CASSETTE_LATENCY_SCALE", "1.0")),
+            search_fallback=os.getenv("CASSETTE_SEARCH_FALLBACK", "false").lower() == "true",
+        )
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._exact[entry["key"]].append(entry)
+                    self._by_group[(entry["kind"], entry["group"])].append(entry)
+
+    # ===== RECORD / REPLAY =====
+
+    def record(self, kind: str, group: str, key: str, response: Dict, latency: float) -> None:
+        entry = {"kind": kind, "group": group, "key": key, "response": response, "latency": round(latency, 4)}
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Appended per interaction so an interrupted recording is still usable
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.stats["recorded"] += 1
+
+    def lookup(self, kind: str, group: str, key: str) -> Dict:
+        """Next recorded entry for ``key``, or for its group when the exact request was not recorded.
+
+        Searches only fall back to their group when ``search_fallback`` is set.
+        """
+        with self._lock:
+            entries, cursor_key = self._exact.get(key), key
+            if not entries:
+                if kind == "search" and not self.search_fallback:
+                    raise CassetteMiss(f"Search {key[:12]} was not recorded in {self.path}.")
+                entries, cursor_key = self._by_group.get((kind, group)), (kind, group)
+                if not entries:
+                    raise CassetteMiss(f"No recorded {kind} interaction for '{group}' in {self.path}.")
+                if kind == "search":
+                    logger.warning("Search %s was not recorded in %s; replaying another search's results.",
+                                   key[:12], self.path)
+                self.stats["fallbacks"] += 1
+            entry = entries[self._cursors[cursor_key] % len(entries)]
+            self._cursors[cursor_key] += 1
+            self.stats["replayed"] += 1
+        return entry
+
+    def replay_delay(self, entry: Dict) -> float:
+        return entry["latency"] * self.latency_scale
+
+    # ===== WRAPPERS =====
+
+    def wrap_model(self, model, node: str):
+        """Route a node's model calls through the cassette; ``model`` may be None when replaying."""
+        if self.mode == "off":
+            return model
+        return CassetteModel(self, model, node)
+
+    def wrap_search(self, backend):
+        """Route a search backend's calls through the cassette; ``backend`` may be None when replaying."""
+        if self.mode == "off":
+            return backend
+        return CassetteSearchBackend(self, backend)
+
+
+class CassetteModel(Runnable):
+    """Chat model stand-in that records or replays calls, including structured output and bound tools."""
+
+    def __init__(self, cassette: Cassette, model, node: str, schema: Any = None, tools: Sequence = (),
+                 schema_kwargs: Optional[Dict] = None, tool_kwargs: Optional[Dict] = None):
+        self.cassette = cassette
+        self.model = model
+        self.node = node
+        self.schema = schema
+        self.tools = tuple(tools)
+        self.schema_kwargs = dict(schema_kwargs or {})
+        self.tool_kwargs = dict(tool_kwargs or {})
+
+    def _target(self):
+        target = self.model
+        if self.tools:
+            target = target.bind_tools(list(self.tools), **self.tool_kwargs)
+        if self.schema is not None:
+            target = target.with_structured_output(self.schema, **self.schema_kwargs)
+        return target
+
+    def bind_tools(self, tools, **kwargs):
+        return CassetteModel(self.cassette, self.model, self.node, self.schema, tools, self.schema_kwargs, kwargs)
+
+    def with_structured_output(self, schema, **kwargs):
+        return CassetteModel(self.cassette, self.model, self.node, schema, self.tools, kwargs, self.tool_kwargs)
+
+    def _request(self, input) -> Tuple[str, str]:
+        schema_name = getattr(self.schema, "__name__", None)
+        group = f"{self.node}:{schema_name or 'text'}"
+        tool_names = [getattr(tool, "name", str(tool)) for tool in self.tools]
+        request = {"node": self.node, "schema": schema_name, "tools": tool_names, "messages": messages_key(input)}
+        if self.schema_kwargs or self.tool_kwargs:
+            # Only added when set, so cassettes recorded without options keep their keys
+            request["options"] = [self.schema_kwargs, self.tool_kwargs]
+        key = request_hash(request)
+        return group, key
+
+    def invoke(self, input, config=None, **kwargs):
+        group, key = self._request(input)
+        if self.cassette.replaying:
+            entry = self.cassette.lookup("llm", group, key)
+            time.sleep(self.cassette.replay_delay(entry))
+            return _decode(entry["response"], self.schema)
+        start = time.perf_counter()
+        output = self._target().invoke(input, config, **kwargs)
+        self.cassette.record("llm", group, key, _encode(output), time.perf_counter() - start)
+        return output
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        group, key = self._request(input)
+        if self.cassette.replaying:
+            entry = self.cassette.lookup("llm", group, key)
+            await asyncio.sleep(self.cassette.replay_delay(entry))
+            return _decode(entry["response"], self.schema)
+        start = time.perf_counter()
+        output = await self._target().ainvoke(input, config, **kwargs)
+        self.cassette.record("llm", group, key, _encode(output), time.perf_counter() - start)
+        return output
+
+
+class CassetteSearchBackend:
+    """Search backend stand-in that records or replays result lists."""
+
+    name = "cassette"
+
+    def __init__(self, cassette: Cassette, backend):
+        self.cassette = cassette
+        self.backend = backend
+
+    @staticmethod
+    def _request(query: str, max_results: int) -> str:
+        return request_hash({"query": query, "max_results": max_results})
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        key = self._request(query, max_results)
+        if self.cassette.replaying:
+            entry = self.cassette.lookup("search", "search", key)
+            time.sleep(self.cassette.replay_delay(entry))
+            return entry["response"]["value"]
+        start = time.perf_counter()
+        results = self.backend.search(query, max_results)
+        self.cassette.record("search", "search", key, _encode(results), time.perf_counter() - start)
+        return results
+
+    async def asearch(self, query: str, max_results: int = 5) -> List[Dict]:
+        key = self._request(query, max_results)
+        if self.cassette.replaying:
+            entry = self.cassette.lookup("search", "search", key)
+            await asyncio.sleep(self.cassette.replay_delay(entry))
+            return entry["response"]["value"]
+        start = time.perf_counter()
+        results = await self.backend.asearch(query, max_results)
+        self.cassette.record("search", "search", key, _encode(results), time.perf_counter() - start)
+        return results
+
+
+cassette = Cassette.from_env()
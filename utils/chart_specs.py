@@ -0,0 +1,86 @@
+"""Declarative chart specs.
+
+Charts are stored as Vega-Lite v5 specs (inline data plus encoding) in
+`Graph.spec` and drawn by the browser: `st.vega_lite_chart` in the Streamlit
+app, or any Vega-Lite renderer for HTTP API clients. Nothing is rendered while
+a run executes. `rasterize` turns a spec into a PNG only for DOCX/PDF export,
+importing matplotlib on first use and drawing on a private figure, so exports
+from concurrent sessions do not share pyplot state.
+"""
+
+import io
+from typing import Any, Dict, List, Optional
+
+from agents.state import Graph, GraphDataPoint
+
+VEGA_LITE_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+CHART_TYPES = ("bar", "line", "pie")
+
+
+def chart_spec(title: str, chart_type: str, points: List[GraphDataPoint], x_label: str = "", y_label: str = "") -> Dict:
+    """Vega-Lite spec for ``points`` (``x`` category, ``y`` value) as a bar, line or pie chart."""
+    if chart_type not in CHART_TYPES:
+        raise ValueError(f"Unsupported chart_type '{chart_type}'. Choose 'bar', 'line', or 'pie'.")
+    # Keep the points in the given order instead of Vega-Lite's default alphabetical sort
+    x = {"field": "x", "type": "nominal", "sort": None, "title": x_label or None}
+    y = {"field": "y", "type": "quantitative", "title": y_label or None}
+    if chart_type == "pie":
+        mark, encoding = {"type": "arc", "tooltip": True}, {"theta": {**y, "stack": True}, "color": x}
+    else:
+        mark = {"type": chart_type, "tooltip": True, **({"point": True} if chart_type == "line" else {})}
+        encoding = {"x": {**x, "axis": {"labelAngle": -45}}, "y": y}
+    return {
+        "$schema": VEGA_LITE_SCHEMA,
+        "title": title,
+        "width": "container",
+        "data": {"values": [{"x": p.x, "y": p.y} for p in points]},
+        "mark": mark,
+        "encoding": encoding,
+    }
+
+
+def build_graph(title: str, data: List[Dict], chart_type: str = "bar", x_key: Optional[str] = None,
+                y_key: Optional[str] = None, x_label: str = "", y_label: str = "") -> Graph:
+    """`Graph` with its Vega-Lite spec from rows of ``data`` keyed by ``x_key``/``y_key``."""
+    chart_type = chart_type.lower()
+    points = [GraphDataPoint(x=str(row[x_key]), y=float(row[y_key])) for row in data]
+    return Graph(title=title, chart_type=chart_type, x_label=x_label, y_label=y_label, data=points,
+                 spec=chart_spec(title, chart_type, points, x_label, y_label))
+
+
+def spec_of(graph: Any) -> Dict:
+    """Vega-Lite spec of a `Graph`, a `Graph` dict (as read back from state) or a bare spec."""
+    if isinstance(graph, Graph):
+        return graph.spec or chart_spec(graph.title, graph.chart_type, graph.data, graph.x_label, graph.y_label)
+    return graph.get("spec") or graph
+
+
+def rasterize(graph: Any, dpi: int = 100) -> bytes:
+    """PNG of anything `spec_of` accepts."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    spec = spec_of(graph)
+    values = spec["data"]["values"]
+    xs, ys = [str(v["x"]) for v in values], [float(v["y"]) for v in values]
+    encoding = spec["encoding"]
+    figure = Figure(figsize=(10, 6), dpi=dpi)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    if spec["mark"]["type"] == "arc":
+        axes.pie(ys, labels=xs, autopct="%1.1f%%", startangle=140)
+    else:
+        if spec["mark"]["type"] == "bar":
+            axes.bar(xs, ys, color="skyblue")
+        else:
+            axes.plot(xs, ys, marker="o", linestyle="-", color="green")
+        axes.set_xlabel(encoding["x"].get("title") or "")
+        axes.set_ylabel(encoding["y"].get("title") or "")
+        axes.tick_params(axis="x", labelrotation=45)
+        for label in axes.get_xticklabels():
+            label.set_horizontalalignment("right")
+    axes.set_title(spec.get("title", ""))
+    figure.tight_layout()
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    return buffer.getvalue()
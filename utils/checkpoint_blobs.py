@@ -0,0 +1,268 @@
+"""Content-addressed blob storage for large checkpoint values.
+
+Most nodes return the full state, so every checkpoint re-serializes
+`gathered_information`, `messages` and the report even when they did not
+change. `BlobStoreSerializer` wraps the checkpointer's serializer: values whose
+serialized form is at least ``min_bytes`` are stored once, zlib-compressed,
+under their SHA-256 digest, and the checkpoint only keeps a short reference.
+Identical values across checkpoints, threads and runs share one blob.
+`BlobStoreSaver` is the in-memory checkpointer to use with it: deleting a
+thread also deletes the blobs that no remaining checkpoint refers to.
+
+Compare checkpoint write sizes with and without blobs::
+
+    python -m utils.checkpoint_blobs
+"""
+
+import hashlib
+import os
+import threading
+import zlib
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+_REF_PREFIX = "blobref:"
+
+
+class BlobStore:
+    """Hash -> compressed bytes, kept in memory or as files under ``path``."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._blobs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    def _file(self, digest: str) -> str:
+        return os.path.join(self.path, digest[:2], digest)
+
+    def put(self, data: bytes) -> str:
+        """Store ``data`` (if not already present) and return its digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self._blobs or (self.path and os.path.exists(self._file(digest))):
+                return digest
+            compressed = zlib.compress(data, 6)
+            if self.path:
+                os.makedirs(os.path.dirname(self._file(digest)), exist_ok=True)
+                tmp_path = self._file(digest) + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(compressed)
+                os.replace(tmp_path, self._file(digest))
+            else:
+                self._blobs[digest] = compressed
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        with self._lock:
+            compressed = self._blobs.get(digest)
+        if compressed is None:
+            with open(self._file(digest), "rb") as f:
+                compressed = f.read()
+        return zlib.decompress(compressed)
+
+    def delete(self, digests: Iterable[str]) -> int:
+        """Remove the given blobs; return how many were present."""
+        removed = 0
+        with self._lock:
+            for digest in digests:
+                if self._blobs.pop(digest, None) is not None:
+                    removed += 1
+                elif self.path:
+                    try:
+                        os.remove(self._file(digest))
+                        removed += 1
+                    except OSError:
+                        pass
+        return removed
+
+    def __len__(self) -> int:
+        if not self.path:
+            return len(self._blobs)
+        return sum(len(files) for _, _, files in os.walk(self.path))
+
+    def stored_bytes(self) -> int:
+        """Compressed size of all blobs."""
+        if not self.path:
+            with self._lock:
+                return sum(len(blob) for blob in self._blobs.values())
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, files in os.walk(self.path) for name in files
+        )
+
+
+class BlobStoreSerializer(SerializerProtocol):
+    """Checkpoint serializer that moves large values into a `BlobStore`."""
+
+    def __init__(self, store: BlobStore, serde: SerializerProtocol = None, min_bytes: int = 1024):
+        self.store = store
+        self.serde = serde or JsonPlusSerializer()
+        self.min_bytes = min_bytes
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        typ, data = self.serde.dumps_typed(obj)
+        if len(data) < self.min_bytes:
+            return typ, data
+        return f"{_REF_PREFIX}{typ}", self.store.put(data).encode()
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        typ, payload = data
+        if not typ.startswith(_REF_PREFIX):
+            return self.serde.loads_typed(data)
+        return self.serde.loads_typed((typ[len(_REF_PREFIX):], self.store.get(payload.decode())))
+
+
+class BlobStoreSaver(InMemorySaver):
+    """`InMemorySaver` over a `BlobStoreSerializer` whose `delete_thread` also deletes unreferenced blobs.
+
+    Writes and deletes hold one lock, so a blob is never deleted between being
+    stored and its reference being saved by a concurrent write.
+    """
+
+    def __init__(self, serde: BlobStoreSerializer):
+        super().__init__(serde=serde)
+        self.store = serde.store
+        self._gc_lock = threading.RLock()
+
+    def put(self, *args, **kwargs):
+        with self._gc_lock:
+            return super().put(*args, **kwargs)
+
+    def put_writes(self, *args, **kwargs) -> None:
+        with self._gc_lock:
+            super().put_writes(*args, **kwargs)
+
+    def referenced_digests(self, thread_id: Optional[str] = None) -> Set[str]:
+        """Digests of the blobs referred to by one thread's checkpoints and writes, or by all threads'."""
+        values = []
+        for tid, namespaces in self.storage.items():
+            if thread_id is None or tid == thread_id:
+                for checkpoints in namespaces.values():
+                    for checkpoint, metadata, _ in checkpoints.values():
+                        values += (checkpoint, metadata)
+        values += [value for key, value in self.blobs.items() if thread_id is None or key[0] == thread_id]
+        values += [write[2] for key, writes in self.writes.items() if thread_id is None or key[0] == thread_id
+                   for write in writes.values()]
+        return {payload.decode() for typ, payload in values if typ.startswith(_REF_PREFIX)}
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._gc_lock:
+            candidates = self.referenced_digests(thread_id)
+            super().delete_thread(thread_id)
+            self.store.delete(candidates - self.referenced_digests())
+
+
+def create_checkpoint_serde() -> Optional[SerializerProtocol]:
+    """Serializer for the graph checkpointer per CHECKPOINT_BLOBS / CHECKPOINT_BLOB_DIR / CHECKPOINT_BLOB_MIN_BYTES.
+
+    Returns None (the checkpointer's default serializer) when blobs are disabled.
+    """
+    if os.getenv("CHECKPOINT_BLOBS", "true").lower() != "true":
+        return None
+    return BlobStoreSerializer(
+        BlobStore(os.getenv("CHECKPOINT_BLOB_DIR") or None),
+        min_bytes=int(os.getenv("CHECKPOINT_BLOB_MIN_BYTES", "1024")),
+    )
+
+
+def create_checkpointer() -> InMemorySaver:
+    """The graph's checkpointer: a `BlobStoreSaver`, or a plain `InMemorySaver` when blobs are disabled."""
+    serde = create_checkpoint_serde()
+    return BlobStoreSaver(serde) if serde else InMemorySaver()
+
+
+def checkpoint_bytes(saver) -> int:
+    """Serialized bytes held by an `InMemorySaver` (checkpoints, channel values and pending writes)."""
+    total = 0
+    for namespaces in saver.storage.values():
+        for checkpoints in namespaces.values():
+            for checkpoint, metadata, _ in checkpoints.values():
+                total += len(checkpoint[1]) + len(metadata[1])
+    total += sum(len(value[1]) for value in saver.blobs.values())
+    total += sum(len(write[2][1]) for writes in saver.writes.values() for write in writes.values())
+    return total
+
+
+def _benchmark(runs: int = 5, items: int = 30) -> None:
+    """Run a pass-through graph shaped like the research graph with and without blob offloading."""
+    import random
+    import uuid
+
+    from langchain_core.messages import AIMessage
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langgraph.graph import END, START, StateGraph
+
+    from agents.state import (
+        GatheredInformation, InformationItem, ResearchAgentState, ResearchReport, ResearchReportSection,
+    )
+
+    rng = random.Random(0)
+    vocabulary = [f"{rng.choice('bcdfghklmnprst')}{rng.choice('aeiou')}{rng.choice('nrstl')}{i}" for i in range(5000)]
+
+    def text(words: int) -> str:
+        # Non-repetitive filler so compression ratios resemble real search results
+        return " ".join(rng.choices(vocabulary, k=words))
+
+    nodes = ["plan_research", "gather_information", "generate_graph", "evaluate_information", "generate_report"]
+
+    def make_node(name):
+        def node(state: ResearchAgentState):
+            update = state.model_dump()
+            update["messages"] = list(state.messages) + [AIMessage(content=f"{name} done")]
+            if name == "gather_information":
+                update["gathered_information"] = GatheredInformation(topic="benchmark", items=[
+                    InformationItem(query=f"query {i}", source=f"https://example.com/{i}",
+                                    snippet=text(150))
+                    for i in range(items)
+                ])
+            if name == "generate_report":
+                update["research_report"] = ResearchReport(
+                    topic=state.research_brief, summary=text(150), key_findings=[text(30) for _ in range(8)],
+                    sections=[ResearchReportSection(title=f"Section {i}", content=text(300)) for i in range(5)],
+                )
+            return update
+        return node
+
+    builder = StateGraph(ResearchAgentState)
+    for name in nodes:
+        builder.add_node(name, make_node(name))
+    builder.add_edge(START, nodes[0])
+    for a, b in zip(nodes, nodes[1:]):
+        builder.add_edge(a, b)
+    builder.add_edge(nodes[-1], END)
+
+    results = {}
+    for label, serde in (("default", None), ("blobs", BlobStoreSerializer(BlobStore()))):
+        saver = BlobStoreSaver(serde) if serde else InMemorySaver()
+        graph = builder.compile(checkpointer=saver)
+        thread_ids = [str(uuid.uuid4()) for _ in range(runs)]
+        for run, thread_id in enumerate(thread_ids):
+            # Distinct content per run, so only repeats within a run can be deduplicated
+            graph.invoke(
+                {"research_brief": f"benchmark brief {run}", "messages": [AIMessage(content="Research solar batteries")]},
+                config={"configurable": {"thread_id": thread_id}},
+            )
+        blob_bytes = serde.store.stored_bytes() if serde else 0
+        results[label] = (checkpoint_bytes(saver), blob_bytes)
+        if serde:
+            blobs_before = len(serde.store)
+            saver.delete_thread(thread_ids[0])
+            blobs_one = len(serde.store)
+            for thread_id in thread_ids[1:]:
+                saver.delete_thread(thread_id)
+            print(f"blobs: {blobs_before} stored, {blobs_one} after deleting one of {runs} threads, "
+                  f"{len(serde.store)} after deleting all")
+    base = results["default"][0]
+    for label, (checkpoints, blobs) in results.items():
+        total = checkpoints + blobs
+        print(f"{label:8s} checkpoints={checkpoints:>10,d} B  blobs={blobs:>9,d} B  "
+              f"total={total:>10,d} B  ({total / base:.1%} of default)")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,138 @@
+"""Source-ID citations for the report prompt.
+
+Gathered snippets repeat their full URLs (``URL: https://...`` lines, findings
+ending in ``(https://...)``), and the model used to write every reference out
+again. `SourceTable` gives each distinct source a short ID (``S1``, ``S2``, ...)
+in order of first appearance; `cite` replaces the URLs in prompt text with
+``[S1]`` markers. The model cites by ID only, and `expand_report` fills in the
+report's ``references`` locally from the table. Markers whose ID is not in the
+table (invented by the model) are dropped, so every remaining citation can be
+traced back to a gathered source.
+
+Compare report prompt sizes with and without source IDs::
+
+    python -m utils.citations
+"""
+
+import re
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+_URL_RE = re.compile(r"[a-z][a-z0-9+.-]*://[^\s()\[\]<>\"']+", re.IGNORECASE)
+# "1. Title\n   URL: https://..." blocks from `SearchTool.format_search_results`
+_TITLED_URL_RE = re.compile(r"^\s*\d+\.\s+(.+?)\s*\n\s*URL:\s*(\S+)", re.MULTILINE)
+_CITATION_RE = re.compile(r"\s?\[(S\d+(?:\s*,\s*S\d+)*)\]")
+
+
+def normalize_source(url: str) -> str:
+    """Key under which two spellings of one source share an ID (case of scheme/host, fragment, trailing slash)."""
+    url = url.rstrip(".,;:")
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
+
+
+class SourceTable:
+    """Deduplicated sources with compact IDs, built while the report prompt is assembled."""
+
+    def __init__(self):
+        self.sources: List[str] = []
+        self.titles: Dict[str, str] = {}
+        self._ids: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def id_for(self, url: str, title: Optional[str] = None) -> str:
+        key = normalize_source(url)
+        source_id = self._ids.get(key)
+        if source_id is None:
+            self.sources.append(url.rstrip(".,;:"))
+            source_id = self._ids[key] = f"S{len(self.sources)}"
+        if title and source_id not in self.titles:
+            self.titles[source_id] = title
+        return source_id
+
+    def cite(self, text: str) -> str:
+        """``text`` with every URL replaced by its ``[S#]`` marker."""
+        for title, url in _TITLED_URL_RE.findall(text):
+            self.id_for(url, title)
+        return _URL_RE.sub(lambda m: f"[{self.id_for(m.group(0))}]", text)
+
+    def cite_item(self, source: str, snippet: str) -> str:
+        """Prompt line for one snippet: ``[S#] snippet`` for a URL source, else ``(source) snippet``."""
+        if not _URL_RE.fullmatch(source or ""):
+            return f"({source}) {self.cite(snippet)}"
+        source_id = self.id_for(source)
+        # A result block's own "URL:" line would only repeat the label
+        return f"[{source_id}] " + re.sub(rf"\n\s*URL:\s*\[{source_id}\]", "", self.cite(snippet))
+
+    def reference(self, source_id: str) -> Optional[str]:
+        """Full reference for an ID, or None if it is not in the table."""
+        index = int(source_id[1:]) - 1
+        if not 0 <= index < len(self.sources):
+            return None
+        title = self.titles.get(source_id)
+        return f"[{source_id}] {title} — {self.sources[index]}" if title else f"[{source_id}] {self.sources[index]}"
+
+    def expand_report(self, report: Dict) -> Dict:
+        """Copy of a report dict with unknown citations removed and ``references`` built from the cited IDs."""
+        cited: List[str] = []
+
+        def keep_known(match: re.Match) -> str:
+            ids = [i.strip() for i in match.group(1).split(",") if self.reference(i.strip())]
+            for source_id in ids:
+                if source_id not in cited:
+                    cited.append(source_id)
+            return f" [{', '.join(ids)}]" if ids else ""
+
+        def resolve(text: Optional[str]) -> Optional[str]:
+            return _CITATION_RE.sub(keep_known, text) if text else text
+
+        report = dict(report)
+        report["summary"] = resolve(report.get("summary"))
+        report["key_findings"] = [resolve(finding) for finding in report.get("key_findings") or []]
+        report["sections"] = [
+            {**section, "content": resolve(section.get("content"))} for section in report.get("sections") or []
+        ]
+        report["conclusion"] = resolve(report.get("conclusion"))
+        report["references"] = [self.reference(source_id) for source_id in cited] or None
+        return report
+
+
+def _benchmark(queries: int = 8, results_per_query: int = 5) -> None:
+    """Report prompt size and reference output size with full URLs against source IDs."""
+    import os
+    import random
+
+    # Only the result formatting is used; no search backend is needed
+    os.environ.setdefault("SEARCH_BACKEND", "fake")
+    from agents.tools import SearchTool
+
+    rng = random.Random(0)
+    domains = ["www.example-research-institute.org", "news.example.com", "data.example.gov", "journal.example.edu"]
+    pool = [(f"Article {i}", f"https://{rng.choice(domains)}/reports/2024/{i}/analysis-of-market-trends-and-outlook"
+                              f"?utm_source=search&ref={rng.randrange(1000)}") for i in range(queries * results_per_query // 2)]
+    results = {
+        # Sources recur across queries, as they do for related plan steps
+        f"query {q}": [{"title": title, "url": url, "content": " ".join(f"word{rng.randrange(1000)}" for _ in range(40))}
+                       for title, url in rng.sample(pool, results_per_query)]
+        for q in range(queries)
+    }
+    blocks = [SearchTool.format_search_results(query, hits) for query, hits in results.items()]
+    full_prompt = "\n".join(blocks)
+    table = SourceTable()
+    cited_prompt = "\n".join(table.cite(block) for block in blocks)
+    # What the model writes for references: every URL in full, against a few ID markers
+    full_refs = "\n".join(table.sources)
+    cited_refs = " ".join(f"[{source_id}]" for source_id in (f"S{i + 1}" for i in range(len(table))))
+
+    def tokens(text: str) -> int:
+        return len(text) // 4
+
+    print(f"{queries * results_per_query} results, {len(table)} distinct sources")
+    print(f"prompt:     {tokens(full_prompt):6d} -> {tokens(cited_prompt):6d} tokens (approx.)")
+    print(f"references: {tokens(full_refs):6d} -> {tokens(cited_refs):6d} tokens (approx.)")
+
+
+if __name__ == "__main__":
+    _benchmark()
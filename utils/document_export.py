@@ -3,15 +3,58 @@ from docx.shared import Inches, Pt
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from io import BytesIO
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+from reportlab.lib.units import inch
 from reportlab.lib.styles import getSampleStyleSheet
+import json
 import re
 
+from utils.chart_specs import rasterize
+
+def format_research_report(report_data):
+    """Convert the research report JSON to formatted Markdown"""
+    if isinstance(report_data, str):
+        try:
+            report_data = json.loads(report_data)
+        except:
+            return report_data  # Return as-is if it's not valid JSON
+    
+    markdown = f"# {report_data.get('topic', 'Research Report')}\n\n"
+    
+    # Summary
+    markdown += f"## Summary\n{report_data.get('summary', '')}\n\n"
+    
+    # Key Findings
+    if 'key_findings' in report_data and report_data['key_findings']:
+        markdown += "## Key Findings\n"
+        for finding in report_data['key_findings']:
+            markdown += f"- {finding}\n"
+        markdown += "\n"
+    
+    # Sections
+    if 'sections' in report_data and report_data['sections']:
+        for section in report_data['sections']:
+            markdown += f"## {section.get('title', 'Section')}\n"
+            markdown += f"{section.get('content', '')}\n\n"
+    
+    # Conclusion
+    if 'conclusion' in report_data and report_data['conclusion']:
+        markdown += f"## Conclusion\n{report_data['conclusion']}\n\n"
+    
+    # References
+    if 'references' in report_data and report_data['references']:
+        markdown += "## References\n"
+        for i, ref in enumerate(report_data['references'], 1):
+            markdown += f"{i}. {ref}\n"
+    
+    return markdown
+
+
 def export_to_txt(report_content, filename="research_report.txt"):
     
     return report_content, filename
 
-def export_to_docx(report_content, filename="research_report.docx"):
+def export_to_docx(report_content, filename="research_report.docx", graphs=None):
     
     doc = Document()
     
@@ -36,6 +79,11 @@ def export_to_docx(report_content, filename="research_report.docx"):
             
             doc.add_paragraph(line)
     
+    # Charts are stored as specs; they are rasterized only here, for the document
+    if graphs:
+        doc.add_heading('Charts', level=1)
+        for graph in graphs:
+            doc.add_picture(BytesIO(rasterize(graph)), width=Inches(6))
     
     buffer = BytesIO()
     doc.save(buffer)
@@ -43,7 +91,7 @@ def export_to_docx(report_content, filename="research_report.docx"):
     
     return buffer.getvalue(), filename
 
-def export_to_pdf(report_content, filename="research_report.pdf"):
+def export_to_pdf(report_content, filename="research_report.pdf", graphs=None):
    
     
     buffer = BytesIO()
@@ -76,6 +124,11 @@ def export_to_pdf(report_content, filename="research_report.pdf"):
            
             story.append(Paragraph(line, styles['BodyText']))
     
+    if graphs:
+        story.append(Paragraph("Charts", styles['Heading1']))
+        for graph in graphs:
+            story.append(Image(BytesIO(rasterize(graph)), width=6 * inch, height=3.6 * inch))
+            story.append(Spacer(1, 12))
     
     doc.build(story)
     
@@ -0,0 +1,236 @@
+"""Local fake LLM and search servers for load tests.
+
+One uvicorn process serves an OpenAI-compatible ``POST /v1/chat/completions``
+and a Tavily-compatible ``POST /search``, each answering after a log-normally
+distributed delay around a configured median. Pointing the ``openai`` model
+provider (``base_url``) and the Tavily backend (``TAVILY_API_BASE_URL``) at it
+puts the real HTTP clients, their connection pools and sockets into what a
+load test measures, without any network access or API keys.
+
+Structured-output requests (``response_format`` with a JSON schema, or a
+forced tool call) are answered with a placeholder instance of the schema;
+plain requests get a fixed text reply. Latency medians are per model name, so
+each tier can have its own.
+
+`FakeServer` runs the server in a child process, so its event loop and
+threads do not count towards the client's thread count and RSS::
+
+    with FakeServer({"fake-fast": 0.6, "fake-strong": 6.0}, search_latency=1.2) as server:
+        ...  # base URLs: server.openai_url, server.tavily_url
+
+or standalone::
+
+    python utils/fake_servers.py --port 8900 --llm-latency '{"fake-fast": 0.6}' --search-latency 1.2
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+# Spread of the log-normal latency around the median, as in the in-process fakes
+LLM_LATENCY_SIGMA = 0.35
+SEARCH_LATENCY_SIGMA = 0.4
+
+
+def placeholder_json(schema: Dict[str, Any], defs: Optional[Dict[str, Any]] = None) -> Any:
+    """Build a minimal value that validates against a JSON schema (defaults where given)."""
+    defs = schema.get("$defs", {}) if defs is None else defs
+    if "$ref" in schema:
+        return placeholder_json(defs[schema["$ref"].rsplit("/", 1)[-1]], defs)
+    if "default" in schema:
+        return schema["default"]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [option for option in schema[key] if option.get("type") != "null"] or schema[key]
+            return placeholder_json(options[0], defs)
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        return {name: placeholder_json(prop, defs) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [placeholder_json(schema.get("items", {}), defs)]
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 1.0
+    if kind == "boolean":
+        return False
+    if kind == "null":
+        return None
+    return "fake"
+
+
+def _delay(median: float, sigma: float) -> float:
+    return random.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    message: Dict[str, Any] = {"role": "assistant", "content": "fake response", "refusal": None}
+    response_format = body.get("response_format") or {}
+    tool_choice = body.get("tool_choice")
+    if response_format.get("type") == "json_schema":
+        message["content"] = json.dumps(placeholder_json(response_format["json_schema"]["schema"]))
+    elif response_format.get("type") == "json_object":
+        message["content"] = "{}"
+    elif isinstance(tool_choice, dict):
+        # A forced call, e.g. with_structured_output(method="function_calling")
+        name = tool_choice["function"]["name"]
+        tool = next(t for t in body.get("tools", []) if t["function"]["name"] == name)
+        message["content"] = None
+        message["tool_calls"] = [{
+            "id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+            "function": {"name": name, "arguments": json.dumps(placeholder_json(tool["function"].get("parameters", {})))},
+        }]
+    prompt_tokens = _estimate_tokens(json.dumps(body.get("messages", [])))
+    completion_tokens = _estimate_tokens(json.dumps(message))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": message, "logprobs": None,
+                     "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def _search_results(query: str, max_results: int) -> Dict[str, Any]:
+    return {
+        "query": query,
+        "results": [
+            {"title": f"{query} ({i})", "url": f"https://example.com/{i}?q={query.replace(' ', '+')}",
+             "content": f"Synthetic result {i} about {query}.", "score": round(1 - i / 100, 2)}
+            for i in range(1, max_results + 1)
+        ],
+    }
+
+
+def create_app(llm_latency: Dict[str, float], search_latency: float, default_llm_latency: float = 0.0):
+    """Starlette app serving the fake chat-completions and search endpoints."""
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    async def chat_completions(request: Request) -> JSONResponse:
+        body = await request.json()
+        if body.get("stream"):
+            return JSONResponse({"error": {"message": "Streaming is not supported by the fake server."}}, status_code=400)
+        await asyncio.sleep(_delay(llm_latency.get(body.get("model"), default_llm_latency), LLM_LATENCY_SIGMA))
+        return JSONResponse(_completion(body))
+
+    async def search(request: Request) -> JSONResponse:
+        body = await request.json()
+        start = time.perf_counter()
+        await asyncio.sleep(_delay(search_latency, SEARCH_LATENCY_SIGMA))
+        response = _search_results(body.get("query", ""), int(body.get("max_results", 5)))
+        response["response_time"] = round(time.perf_counter() - start, 3)
+        return JSONResponse(response)
+
+    async def health(request: Request) -> JSONResponse:
+        return JSONResponse({"status": "ok"})
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/search", search, methods=["POST"]),
+        Route("/health", health),
+    ])
+
+
+def _free_port(host: str) -> int:
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class FakeServer:
+    """Runs the fake servers in a child process for the duration of a ``with`` block."""
+
+    def __init__(self, llm_latency: Dict[str, float], search_latency: float, host: str = "127.0.0.1",
+                 port: int = 0, startup_timeout: float = 20.0):
+        self.llm_latency = dict(llm_latency)
+        self.search_latency = search_latency
+        self.host = host
+        self.port = port or _free_port(host)
+        self.startup_timeout = startup_timeout
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def openai_url(self) -> str:
+        return self.url + "/v1"
+
+    @property
+    def tavily_url(self) -> str:
+        return self.url
+
+    def start(self) -> "FakeServer":
+        self._process = subprocess.Popen([
+            sys.executable, os.path.abspath(__file__), "--host", self.host, "--port", str(self.port),
+            "--llm-latency", json.dumps(self.llm_latency), "--search-latency", str(self.search_latency),
+        ])
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"Fake server exited with code {self._process.returncode} during startup.")
+            try:
+                with socket.create_connection((self.host, self.port), timeout=0.2):
+                    return self
+            except OSError:
+                time.sleep(0.05)
+        self.stop()
+        raise RuntimeError(f"Fake server did not accept connections on {self.url} within {self.startup_timeout}s.")
+
+    def stop(self) -> None:
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+
+    def __enter__(self) -> "FakeServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve fake OpenAI-compatible chat and Tavily-compatible search APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--llm-latency", default="{}", help='JSON map of model name to median latency in seconds')
+    parser.add_argument("--default-llm-latency", type=float, default=0.0,
+                        help="Median latency for models not in --llm-latency")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Median search latency in seconds")
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(json.loads(args.llm_latency), args.search_latency, args.default_llm_latency)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""Columnar storage for gathered information items.
+
+A deep research run gathers thousands of snippets, mostly under a few dozen
+queries and a few hundred URLs. As a list of `InformationItem` models, every
+item carries its own copies of the query, source and metadata strings, a
+Pydantic instance and a ``__dict__``, and every checkpoint and history record
+repeats them all. `GatheredStore` keeps the same data in columns instead:
+
+- queries, sources and metadata (as canonical JSON) are interned in tables,
+  and each row holds integer ids into them (``array('i')``)
+- snippets are UTF-8 encoded into one ``bytearray``, and each row holds the
+  end offset of its snippet (``array('Q')``)
+
+Rows are read through `ItemView`, which decodes its fields on access and has
+the same attributes as `InformationItem`. ``to_item()`` builds a real model
+when one is needed. Filtering by query or source compares ids and never
+decodes text. `GatheredStore` is a Pydantic type: `GatheredInformation.items`
+still accepts a list of items or dicts, and serializes to `to_columns()`.
+
+Compare memory, serialized size and iteration time with ``List[InformationItem]``::
+
+    python -m utils.gathered_store
+"""
+
+import json
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+
+class ItemView:
+    """Read-only view of one row of a `GatheredStore`, attribute-compatible with `InformationItem`."""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "GatheredStore", row: int):
+        self._store = store
+        self._row = row
+
+    @property
+    def query(self) -> str:
+        return self._store.queries[self._store.query_ids[self._row]]
+
+    @property
+    def source(self) -> str:
+        return self._store.sources[self._store.source_ids[self._row]]
+
+    @property
+    def snippet(self) -> str:
+        return self._store.snippet(self._row)
+
+    @property
+    def metadata(self) -> Optional[Dict]:
+        # Shared by every row with the same metadata, so treat it as read-only
+        return self._store.metadata(self._row)
+
+    def to_item(self):
+        """Materialize the row as an `InformationItem`."""
+        # Imported here: agents.state imports this module for `GatheredInformation`
+        from agents.state import InformationItem
+
+        return InformationItem(query=self.query, source=self.source, snippet=self.snippet, metadata=self.metadata)
+
+    def model_dump(self) -> Dict:
+        return {"query": self.query, "source": self.source, "snippet": self.snippet, "metadata": self.metadata}
+
+    def __eq__(self, other) -> bool:
+        if not hasattr(other, "snippet"):
+            return NotImplemented
+        return (self.query, self.source, self.snippet, self.metadata) == (
+            other.query, other.source, other.snippet, other.metadata)
+
+    def __repr__(self) -> str:
+        return f"ItemView(query={self.query!r}, source={self.source!r}, snippet={self.snippet[:60]!r})"
+
+
+class GatheredStore:
+    """Append-only columnar table of (query, source, snippet, metadata) rows."""
+
+    def __init__(self):
+        self.queries: List[str] = []
+        self.sources: List[str] = []
+        self._metadata: List[Dict] = []
+        self._query_index: Dict[str, int] = {}
+        self._source_index: Dict[str, int] = {}
+        self._metadata_index: Dict[str, int] = {}
+        self.query_ids = array("i")
+        self.source_ids = array("i")
+        # -1 for rows without metadata
+        self.metadata_ids = array("i")
+        # Row i's snippet is text[ends[i - 1]:ends[i]]
+        self.ends = array("Q")
+        self.text = bytearray()
+
+    # ===== BUILDING =====
+
+    @staticmethod
+    def _intern(value: str, table: List[str], index: Dict[str, int]) -> int:
+        ident = index.get(value)
+        if ident is None:
+            ident = index[value] = len(table)
+            table.append(value)
+        return ident
+
+    def append(self, query: str, source: str, snippet: str, metadata: Optional[Dict] = None) -> None:
+        self.query_ids.append(self._intern(query or "", self.queries, self._query_index))
+        self.source_ids.append(self._intern(source or "", self.sources, self._source_index))
+        if metadata is None:
+            self.metadata_ids.append(-1)
+        else:
+            key = json.dumps(metadata, sort_keys=True, default=str)
+            ident = self._metadata_index.get(key)
+            if ident is None:
+                ident = self._metadata_index[key] = len(self._metadata)
+                self._metadata.append(metadata)
+            self.metadata_ids.append(ident)
+        self.text += (snippet or "").encode("utf-8")
+        self.ends.append(len(self.text))
+
+    def extend(self, items: Iterable[Any]) -> None:
+        """Append `InformationItem`s, `ItemView`s or dicts (``results`` is accepted for ``snippet``)."""
+        for item in items:
+            if isinstance(item, dict):
+                self.append(item.get("query", ""), item.get("source", ""),
+                            item.get("snippet", item.get("results", "")), item.get("metadata"))
+            else:
+                self.append(item.query, item.source, item.snippet, item.metadata)
+
+    @classmethod
+    def from_items(cls, items: Iterable[Any]) -> "GatheredStore":
+        store = cls()
+        store.extend(items)
+        return store
+
+    # ===== ACCESS =====
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [ItemView(self, i) for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("GatheredStore row out of range")
+        return ItemView(self, row)
+
+    def __iter__(self) -> Iterator[ItemView]:
+        return (ItemView(self, row) for row in range(len(self)))
+
+    def snippet(self, row: int) -> str:
+        ends = self.ends
+        return self.text[ends[row - 1] if row else 0:ends[row]].decode("utf-8")
+
+    def snippets(self) -> Iterator[str]:
+        """All snippets in row order, without creating views."""
+        text, start = self.text, 0
+        for end in self.ends:
+            yield text[start:end].decode("utf-8")
+            start = end
+
+    def metadata(self, row: int) -> Optional[Dict]:
+        ident = self.metadata_ids[row]
+        return self._metadata[ident] if ident >= 0 else None
+
+    def materialize(self) -> List[Any]:
+        """All rows as `InformationItem` models."""
+        return [view.to_item() for view in self]
+
+    def rows(self, query: Optional[str] = None, source: Optional[str] = None) -> List[int]:
+        """Row numbers with the given query and/or source, matched on interned ids."""
+        rows = range(len(self))
+        if query is not None:
+            query_id = self._query_index.get(query, -1)
+            rows = [row for row, ident in zip(rows, self.query_ids) if ident == query_id]
+        if source is not None:
+            source_id = self._source_index.get(source, -1)
+            source_ids = self.source_ids
+            rows = [row for row in rows if source_ids[row] == source_id]
+        return list(rows)
+
+    def filter(self, query: Optional[str] = None, source: Optional[str] = None,
+               predicate: Optional[Callable[[ItemView], bool]] = None) -> "GatheredStore":
+        """New store with the matching rows; ``predicate`` only sees rows that passed the id match."""
+        views = (ItemView(self, row) for row in self.rows(query, source))
+        return GatheredStore.from_items(view for view in views if predicate is None or predicate(view))
+
+    # ===== SERIALIZATION =====
+
+    def to_columns(self) -> Dict:
+        """JSON-compatible columns, as stored in checkpoints and returned by ``model_dump()``."""
+        return {
+            "queries": list(self.queries),
+            "sources": list(self.sources),
+            "metadata": list(self._metadata),
+            "query_ids": self.query_ids.tolist(),
+            "source_ids": self.source_ids.tolist(),
+            "metadata_ids": self.metadata_ids.tolist(),
+            "ends": self.ends.tolist(),
+            "text": self.text.decode("utf-8"),
+        }
+
+    @classmethod
+    def from_columns(cls, columns: Dict) -> "GatheredStore":
+        store = cls()
+        store.queries = list(columns["queries"])
+        store.sources = list(columns["sources"])
+        store._metadata = list(columns["metadata"])
+        store._query_index = {value: i for i, value in enumerate(store.queries)}
+        store._source_index = {value: i for i, value in enumerate(store.sources)}
+        store._metadata_index = {json.dumps(m, sort_keys=True, default=str): i for i, m in enumerate(store._metadata)}
+        store.query_ids = array("i", columns["query_ids"])
+        store.source_ids = array("i", columns["source_ids"])
+        store.metadata_ids = array("i", columns["metadata_ids"])
+        store.ends = array("Q", columns["ends"])
+        store.text = bytearray(columns["text"].encode("utf-8"))
+        return store
+
+    @classmethod
+    def coerce(cls, value: Any) -> "GatheredStore":
+        """A store from a store, its columns, or a list of items/views/dicts."""
+        if isinstance(value, GatheredStore):
+            return value
+        if isinstance(value, dict) and "ends" in value:
+            return cls.from_columns(value)
+        if isinstance(value, (list, tuple)):
+            return cls.from_items(value)
+        raise TypeError(f"Cannot build a GatheredStore from {type(value).__name__}.")
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        from pydantic_core import core_schema
+
+        return core_schema.no_info_plain_validator_function(
+            cls.coerce,
+            json_schema_input_schema=core_schema.list_schema(core_schema.dict_schema()),
+            serialization=core_schema.plain_serializer_function_ser_schema(lambda store: store.to_columns()),
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, GatheredStore):
+            return NotImplemented
+        return self.to_columns() == other.to_columns()
+
+    def __repr__(self) -> str:
+        return (f"GatheredStore({len(self)} items, {len(self.queries)} queries, "
+                f"{len(self.sources)} sources, {len(self.text)} text bytes)")
+
+
+def _benchmark(items: int = 5000, queries: int = 40, sources: int = 600) -> None:
+    """Memory, serialized size and iteration/filter time of the store against ``List[InformationItem]``."""
+    import random
+    import time
+    import tracemalloc
+
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    from agents.state import InformationItem
+
+    rng = random.Random(0)
+    words = [f"term{rng.randrange(20000)}" for _ in range(20000)]
+
+    def text(n: int) -> str:
+        start = rng.randrange(len(words) - n)
+        return " ".join(words[start:start + n])
+
+    query_pool = [f"Research question {q}: {text(10)}" for q in range(queries)]
+    source_pool = [f"https://www.example.com/articles/{s}/{text(3).replace(' ', '-')}" for s in range(sources)]
+    rows = []
+    for i in range(items):
+        query = query_pool[i % queries]
+        rows.append({"query": query, "source": rng.choice(source_pool), "snippet": text(rng.randrange(40, 120)),
+                     "metadata": {"from_memory": False, "search": query} if i % 2 else None})
+
+    def timed(build):
+        tracemalloc.start()
+        start = time.perf_counter()
+        value = build()
+        seconds = time.perf_counter() - start
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return value, seconds, size
+
+    def fresh(row: Dict) -> Dict:
+        # Own string copies per item, as they arrive from separate search responses
+        return {k: v.encode().decode() if isinstance(v, str) else dict(v) if v else v for k, v in row.items()}
+
+    model_list, list_seconds, list_bytes = timed(lambda: [InformationItem(**fresh(row)) for row in rows])
+    store, store_seconds, store_bytes = timed(lambda: GatheredStore.from_items(fresh(row) for row in rows))
+
+    serde = JsonPlusSerializer()
+    list_serialized = len(serde.dumps_typed(model_list)[1])
+    store_serialized = len(serde.dumps_typed(store.to_columns())[1])
+
+    def scan(snippets) -> float:
+        start = time.perf_counter()
+        sum(len(snippet) for snippet in snippets)
+        return time.perf_counter() - start
+
+    target = source_pool[0]
+    start = time.perf_counter()
+    [item for item in model_list if item.source == target]
+    list_filter = time.perf_counter() - start
+    start = time.perf_counter()
+    store.rows(source=target)
+    store_filter = time.perf_counter() - start
+
+    print(f"{items} items, {queries} queries, {sources} sources")
+    print(f"{'':>22s} {'List[InformationItem]':>22s} {'GatheredStore':>14s}")
+    print(f"{'memory (MB)':>22s} {list_bytes / 1e6:22.2f} {store_bytes / 1e6:14.2f}")
+    print(f"{'serialized (MB)':>22s} {list_serialized / 1e6:22.2f} {store_serialized / 1e6:14.2f}")
+    print(f"{'build (ms)':>22s} {list_seconds * 1000:22.1f} {store_seconds * 1000:14.1f}")
+    print(f"{'iterate views (ms)':>22s} {scan(item.snippet for item in model_list) * 1000:22.1f} "
+          f"{scan(view.snippet for view in store) * 1000:14.1f}")
+    print(f"{'iterate snippets (ms)':>22s} {'':>22s} {scan(store.snippets()) * 1000:14.1f}")
+    print(f"{'filter by source (ms)':>22s} {list_filter * 1000:22.2f} {store_filter * 1000:14.2f}")
+
+
+if __name__ == "__main__":
+    _benchmark()
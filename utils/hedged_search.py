@@ -0,0 +1,302 @@
+"""Hedged search requests, per-call timeouts and fallback for tail latency.
+
+`HedgedSearchBackend` wraps the primary search backend. Every call starts one
+primary request. If it has not answered after the ``hedge_percentile`` of
+recent primary latencies, a duplicate request is sent and the first success
+wins; a first request that fails early is retried the same way. When both fail, or neither answers within ``timeout`` seconds, the query
+is served from the fallbacks in order: ``cache`` (results of earlier successful
+primary calls) and/or another backend such as the local corpus index. Served
+latency is therefore bounded by ``timeout`` plus the fallback's own latency.
+
+`stats()` reports the hedge rate, hedge wins, timeouts, fallbacks, and the
+p50/p95/p99 of served latency next to the p99 of the first primary request
+alone, which is what every call would have waited without hedging.
+
+Compare latency percentiles with and without hedging on a heavy-tailed fake backend::
+
+    python -m utils.hedged_search
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (``q`` in 0-100) of a non-empty sequence."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+class SearchTimeout(TimeoutError):
+    """Raised when the primary backend did not answer within the per-call timeout."""
+
+
+class ResultCache:
+    """LRU of the last successful results per (query, max_results)."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, query: str, max_results: int, results: List[Dict]) -> None:
+        if self.max_entries <= 0 or not results:
+            return
+        with self._lock:
+            self._entries[(query, max_results)] = results
+            self._entries.move_to_end((query, max_results))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        with self._lock:
+            results = self._entries.get((query, max_results))
+        if results is None:
+            raise LookupError(f"No cached results for '{query}'.")
+        return results
+
+    async def asearch(self, query: str, max_results: int = 5) -> List[Dict]:
+        return self.search(query, max_results)
+
+
+class HedgedSearchBackend:
+    """Search backend wrapper that hedges slow primary calls and falls back when the primary is slow or failing."""
+
+    name = "hedged"
+
+    def __init__(self, primary, fallbacks: Sequence = (), cache: Optional[ResultCache] = None,
+                 hedge_percentile: float = 95.0, timeout: float = 10.0, initial_hedge_delay: float = 2.0,
+                 min_hedge_delay: float = 0.05, max_hedge_fraction: float = 0.2, min_samples: int = 20,
+                 window: int = 200, max_workers: int = 32):
+        self.primary = primary
+        self.cache = cache
+        self.fallbacks = ([cache] if cache is not None else []) + list(fallbacks)
+        self.hedge_percentile = hedge_percentile
+        self.timeout = timeout
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        # Hedges sent while the provider is slow across the board only add load, so they are budgeted
+        self.max_hedge_fraction = max_hedge_fraction
+        self.min_samples = min_samples
+        self._primary_latencies: deque = deque(maxlen=window)
+        self._first_latencies: deque = deque(maxlen=window)
+        self._served_latencies: deque = deque(maxlen=window)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search-hedge")
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "hedged": 0, "hedge_wins": 0, "timeouts": 0, "errors": 0,
+                        "fallbacks": 0, "fallback_misses": 0}
+
+    # ===== BOOKKEEPING =====
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait on the first request before sending a hedge."""
+        with self._lock:
+            samples = list(self._primary_latencies)
+        if len(samples) < self.min_samples:
+            return self.initial_hedge_delay
+        return max(self.min_hedge_delay, percentile(samples, self.hedge_percentile))
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            return self._counts["hedged"] < self.max_hedge_fraction * self._counts["calls"]
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def _record_primary(self, seconds: float, first: bool) -> None:
+        with self._lock:
+            self._primary_latencies.append(seconds)
+            if first:
+                self._first_latencies.append(seconds)
+
+    def _record_served(self, seconds: float) -> None:
+        with self._lock:
+            self._served_latencies.append(seconds)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+            served, first = list(self._served_latencies), list(self._first_latencies)
+        calls = counts["calls"] or 1
+        stats = {**counts, "hedge_rate": counts["hedged"] / calls, "fallback_rate": counts["fallbacks"] / calls}
+        if served:
+            stats.update({f"p{q}_seconds": percentile(served, q) for q in (50, 95, 99)})
+        if first:
+            # Latency of the first request alone (for a cancelled async request, its elapsed time: a lower bound)
+            stats["unhedged_p99_seconds"] = percentile(first, 99)
+        return stats
+
+    # ===== SYNC =====
+
+    def _attempt(self, query: str, max_results: int, first: bool) -> List[Dict]:
+        start = time.perf_counter()
+        results = self.primary.search(query, max_results)
+        # Recorded even when the other attempt already won, so the percentile sees the real tail
+        self._record_primary(time.perf_counter() - start, first)
+        return results
+
+    def _served(self, query: str, max_results: int, results: List[Dict], start: float, hedge_won: bool) -> List[Dict]:
+        if self.cache is not None:
+            self.cache.put(query, max_results, results)
+        if hedge_won:
+            self._count("hedge_wins")
+        self._record_served(time.perf_counter() - start)
+        return results
+
+    def _fell_back(self, results: List[Dict], start: float) -> List[Dict]:
+        self._count("fallbacks")
+        self._record_served(time.perf_counter() - start)
+        return results
+
+    def _fallback_error(self, query: str, timed_out: bool, error: Optional[Exception]) -> Exception:
+        if timed_out:
+            self._count("timeouts")
+            return SearchTimeout(f"Search for '{query}' timed out after {self.timeout:.1f}s.")
+        return error
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        self._count("calls")
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        first = self._executor.submit(self._attempt, query, max_results, True)
+        pending, hedge, error = {first}, None, None
+        # A blocking provider call cannot be cancelled; a losing attempt finishes in its worker thread
+        done, _ = wait(pending, timeout=min(self.hedge_delay(), self.timeout))
+        while True:
+            for future in done:
+                pending.discard(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    self._count("errors")
+                    error = e
+                    continue
+                return self._served(query, max_results, results, start, hedge_won=future is hedge)
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            # Sent once the first request is slow, or straight away as a retry when it failed fast
+            if hedge is None and self._may_hedge():
+                self._count("hedged")
+                hedge = self._executor.submit(self._attempt, query, max_results, False)
+                pending.add(hedge)
+            if not pending:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        error = self._fallback_error(query, bool(pending), error)
+        for backend in self.fallbacks:
+            try:
+                results = backend.search(query, max_results)
+            except Exception:
+                continue
+            if results:
+                return self._fell_back(results, start)
+        self._count("fallback_misses")
+        raise error
+
+    # ===== ASYNC =====
+
+    async def _aattempt(self, query: str, max_results: int, first: bool) -> List[Dict]:
+        start = time.perf_counter()
+        try:
+            results = await self.primary.asearch(query, max_results)
+        except asyncio.CancelledError:
+            # A cancelled loser's elapsed time is a lower bound on its latency
+            self._record_primary(time.perf_counter() - start, first)
+            raise
+        self._record_primary(time.perf_counter() - start, first)
+        return results
+
+    async def asearch(self, query: str, max_results: int = 5) -> List[Dict]:
+        self._count("calls")
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        first = asyncio.ensure_future(self._aattempt(query, max_results, True))
+        pending, hedge, error = {first}, None, None
+        done, _ = await asyncio.wait(pending, timeout=min(self.hedge_delay(), self.timeout))
+        try:
+            while True:
+                for task in done:
+                    pending.discard(task)
+                    if task.exception() is not None:
+                        self._count("errors")
+                        error = task.exception()
+                        continue
+                    return self._served(query, max_results, task.result(), start, hedge_won=task is hedge)
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                # Sent once the first request is slow, or straight away as a retry when it failed fast
+                if hedge is None and self._may_hedge():
+                    self._count("hedged")
+                    hedge = asyncio.ensure_future(self._aattempt(query, max_results, False))
+                    pending.add(hedge)
+                if not pending:
+                    break
+                done, _ = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+        error = self._fallback_error(query, bool(pending), error)
+        for backend in self.fallbacks:
+            try:
+                results = await backend.asearch(query, max_results)
+            except Exception:
+                continue
+            if results:
+                return self._fell_back(results, start)
+        self._count("fallback_misses")
+        raise error
+
+
+def _benchmark(calls: int = 600, concurrency: int = 20, stall_rate: float = 0.03, error_rate: float = 0.01) -> None:
+    """Async searches against a fake backend whose calls occasionally stall or fail, with and without hedging."""
+    import math
+    import random
+
+    class TailBackend:
+        """~50 ms median, with ``stall_rate`` of calls taking 2 s and ``error_rate`` raising."""
+
+        async def asearch(self, query: str, max_results: int = 5) -> List[Dict]:
+            roll = random.random()
+            if roll < error_rate:
+                await asyncio.sleep(0.01)
+                raise ConnectionError("provider error")
+            await asyncio.sleep(2.0 if roll < error_rate + stall_rate else random.lognormvariate(math.log(0.05), 0.3))
+            return [{"title": query, "url": f"https://example.com/?q={query}", "content": query}]
+
+    async def run(backend) -> Tuple[List[float], int]:
+        semaphore, latencies, failures = asyncio.Semaphore(concurrency), [], 0
+
+        async def one(i: int) -> None:
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    # A third of the queries repeat, so the cache fallback has something to serve
+                    await backend.asearch(f"query {i % (calls * 2 // 3)}")
+                except Exception:
+                    failures += 1
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one(i) for i in range(calls)))
+        return latencies, failures
+
+    random.seed(0)
+    hedged = HedgedSearchBackend(TailBackend(), cache=ResultCache(), timeout=0.5, initial_hedge_delay=0.2)
+    for label, backend in (("direct", TailBackend()), ("hedged", hedged)):
+        latencies, failures = asyncio.run(run(backend))
+        print(f"{label:>7}: p50 {percentile(latencies, 50) * 1000:6.0f} ms  p95 {percentile(latencies, 95) * 1000:6.0f} ms  "
+              f"p99 {percentile(latencies, 99) * 1000:6.0f} ms  max {max(latencies) * 1000:6.0f} ms  failed {failures}")
+    stats = hedged.stats()
+    print(f"hedge rate {stats['hedge_rate']:.1%}, hedge wins {stats['hedge_wins']}, timeouts {stats['timeouts']}, "
+          f"fallbacks {stats['fallbacks']}, fallback misses {stats['fallback_misses']}")
+
+
+if __name__ == "__main__":
+    _benchmark()
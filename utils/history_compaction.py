@@ -0,0 +1,84 @@
+"""Bounded conversation history for scoping prompts.
+
+Graph nodes append status messages ("Information gathered. Iteration 1",
+"Graph saved to ...") to `messages`, and clarification turns accumulate over
+a session. `compact_history` drops the status messages, keeps the original
+request and the most recent turns verbatim, and condenses older turns so the
+rendered history stays under a token budget.
+"""
+
+import os
+import re
+from typing import List, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, convert_to_messages, get_buffer_string
+
+STATUS_MESSAGE_NAME = "status"
+SCOPING_HISTORY_MAX_TOKENS = int(os.getenv("SCOPING_HISTORY_MAX_TOKENS", "1500"))
+
+# Status messages written before they were tagged with STATUS_MESSAGE_NAME
+_STATUS_RE = re.compile(
+    r"^(Information gathered\.|Information gathering completed|Research plan created with|Graph saved to|"
+    r"Graph created|No structured data found|No numeric data found|Report generated:|Enough information collected|"
+    r"More info needed|Failed to parse research plan|I have enough details\. I will start)"
+)
+_CONDENSED_WORDS = 25
+
+
+def status_message(content: str) -> dict:
+    """An AI message recording workflow progress, kept out of LLM-facing history."""
+    return {"type": "ai", "content": content, "name": STATUS_MESSAGE_NAME}
+
+
+def is_status_message(message: BaseMessage) -> bool:
+    if getattr(message, "name", None) == STATUS_MESSAGE_NAME:
+        return True
+    return isinstance(message, AIMessage) and bool(_STATUS_RE.match(str(message.content).strip()))
+
+
+def message_text(message) -> str:
+    """Content of a message object or of the message dicts nodes put into state."""
+    return str(message.get("content", "") if isinstance(message, dict) else getattr(message, "content", ""))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def _condense(message: BaseMessage) -> BaseMessage:
+    words = str(message.content).split()
+    content = " ".join(words[:_CONDENSED_WORDS]) + (" ..." if len(words) > _CONDENSED_WORDS else "")
+    return message.model_copy(update={"content": content})
+
+
+def _truncate(message: BaseMessage, max_tokens: int) -> BaseMessage:
+    content = str(message.content)
+    max_chars = max_tokens * 4
+    if len(content) <= max_chars:
+        return message
+    return message.model_copy(update={"content": content[:max_chars] + " ..."})
+
+
+def compact_history(messages: Sequence, max_tokens: int = None, keep_recent: int = 4) -> str:
+    """Render user-relevant turns as a buffer string of at most ~``max_tokens`` tokens."""
+    max_tokens = max_tokens or SCOPING_HISTORY_MAX_TOKENS
+    turns: List[BaseMessage] = [m for m in convert_to_messages(list(messages or [])) if not is_status_message(m)]
+    rendered = get_buffer_string(turns)
+    if not turns or estimate_tokens(rendered) <= max_tokens:
+        return rendered
+
+    # The first turn is the original request; the latest turns carry the open question
+    first, rest = turns[0], turns[1:]
+    recent = rest[-keep_recent:]
+    condensed = [_condense(m) for m in rest[:-keep_recent]] if len(rest) > keep_recent else []
+    while True:
+        rendered = get_buffer_string([first] + condensed + recent)
+        if estimate_tokens(rendered) <= max_tokens or not condensed:
+            break
+        condensed.pop(0)
+    if estimate_tokens(rendered) > max_tokens:
+        # Even the kept turns are too long: give each an equal share of the budget
+        share = max(1, max_tokens // (len(recent) + 1))
+        rendered = get_buffer_string([_truncate(m, share) for m in [first] + recent])
+    return rendered
@@ -0,0 +1,337 @@
+"""On-disk inverted index over a local document corpus.
+
+Indexes a directory of text, markdown and PDF files so research can run
+offline or over internal documents. The index lives in its own directory:
+
+- ``manifest.json``: indexed files (id, mtime, size, length, title, preview,
+  location of the text), segment names and deleted document ids
+- ``<segment>.lex.json``: term -> [offset, count] into the segment's postings
+- ``<segment>.post``: packed (doc id, term frequency) uint32 pairs, memory-mapped
+- ``<segment>.text``: UTF-8 text of the segment's documents, memory-mapped; a
+  merge copies the live documents' text into the merged segment's file
+
+Indexing is incremental: each `update()` writes a new segment for new or
+changed files and marks replaced or removed files as deleted. Segments are
+merged into one once there are more than ``max_segments``. Queries are scored
+with BM25 straight from the memory-mapped postings, and each result's content
+is the passage of its document that matches the most query terms.
+
+Build or refresh an index from the command line::
+
+    python -m utils.local_corpus build <corpus_dir> [--index <index_dir>]
+    python -m utils.local_corpus query "<query>" [--index <index_dir>]
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.research_memory import tokenize
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".markdown", ".rst", ".pdf")
+_POSTING_DTYPE = np.dtype([("doc", "<u4"), ("tf", "<u4")])
+_PREVIEW_CHARS = 1000
+# Characters kept before the first matching word of a passage
+_PASSAGE_LEAD_CHARS = 40
+
+
+def read_document(path: str) -> str:
+    """Extract plain text from a supported file; PDFs need the optional `pypdf` package."""
+    if path.lower().endswith(".pdf"):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            return ""
+        try:
+            return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+        except Exception:
+            return ""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def best_passage(text: str, terms: set, max_chars: int = _PREVIEW_CHARS) -> str:
+    """The window of at most ``max_chars`` characters of ``text`` matching the most distinct ``terms``.
+
+    Ties go to more matches in total, then to the earlier window. The passage
+    starts a few words before its first match, on a word boundary.
+    """
+    # Only the query terms are looked for, as whole tokens (`tokenize` splits on non-alphanumerics)
+    term_re = re.compile(r"(?<![a-z0-9])(?:" + "|".join(map(re.escape, sorted(terms, key=len, reverse=True)))
+                         + r")(?![a-z0-9])", re.IGNORECASE)
+    matches = [(m.start(), m.end(), m.group(0).lower()) for m in term_re.finditer(text)] if terms else []
+    start = 0
+    if matches:
+        counts: Counter = Counter()
+        best, best_score, right = 0, (0, 0), 0
+        for left, (left_start, _, _) in enumerate(matches):
+            while right < len(matches) and matches[right][1] - left_start <= max_chars - _PASSAGE_LEAD_CHARS:
+                counts[matches[right][2]] += 1
+                right += 1
+            score = (sum(1 for count in counts.values() if count > 0), right - left)
+            if score > best_score:
+                best, best_score = left, score
+            counts[matches[left][2]] -= 1
+        start = max(0, matches[best][0] - _PASSAGE_LEAD_CHARS)
+        # Back up to the start of the word the lead cuts into
+        while start > 0 and not text[start - 1].isspace():
+            start -= 1
+    end = start + max_chars
+    words = text[start:end].split()
+    if end < len(text) and not text[end].isspace() and len(words) > 1:
+        # Drop the word the window cuts into
+        words.pop()
+    return " ".join(words)
+
+
+class LocalCorpusIndex:
+    def __init__(self, index_dir: str, max_segments: int = 8, k1: float = 1.2, b: float = 0.75):
+        self.index_dir = index_dir
+        self.max_segments = max_segments
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+
+    # ===== STORAGE =====
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _load(self) -> None:
+        manifest_path = self._path("manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"docs": {}, "segments": [], "next_id": 0, "deleted": []}
+        self._segments = []
+        for name in self.manifest["segments"]:
+            with open(self._path(f"{name}.lex.json"), "r", encoding="utf-8") as f:
+                lexicon = json.load(f)
+            post_path = self._path(f"{name}.post")
+            postings = (np.memmap(post_path, dtype=_POSTING_DTYPE, mode="r")
+                        if os.path.getsize(post_path) else np.zeros(0, dtype=_POSTING_DTYPE))
+            self._segments.append((lexicon, postings))
+        self._texts = {}
+        for path, meta in self.manifest["docs"].items():
+            name = meta.get("text", [None])[0]
+            text_path = self._path(f"{name}.text") if name else None
+            if name and name not in self._texts and os.path.exists(text_path) and os.path.getsize(text_path):
+                self._texts[name] = np.memmap(text_path, dtype=np.uint8, mode="r")
+        self._by_id = {meta["id"]: (path, meta) for path, meta in self.manifest["docs"].items()}
+        self._lengths = np.zeros(self.manifest["next_id"], dtype=np.float32)
+        for meta in self.manifest["docs"].values():
+            self._lengths[meta["id"]] = meta["length"]
+        self._live = np.zeros(self.manifest["next_id"], dtype=bool)
+        self._live[[meta["id"] for meta in self.manifest["docs"].values()]] = True
+        live_lengths = self._lengths[self._live]
+        self._avg_length = float(live_lengths.mean()) if live_lengths.size else 1.0
+
+    def _save_manifest(self) -> None:
+        tmp_path = self._path("manifest.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self._path("manifest.json"))
+
+    def _write_segment(self, name: str, postings: Dict[str, List]) -> None:
+        lexicon, offset = {}, 0
+        records = []
+        for term in sorted(postings):
+            entries = postings[term]
+            lexicon[term] = [offset, len(entries)]
+            records.extend(entries)
+            offset += len(entries)
+        np.array(records, dtype=_POSTING_DTYPE).tofile(self._path(f"{name}.post"))
+        with open(self._path(f"{name}.lex.json"), "w", encoding="utf-8") as f:
+            json.dump(lexicon, f)
+
+    # ===== INDEXING =====
+
+    def update(self, corpus_dir: str) -> Dict[str, int]:
+        """Index new and changed files under ``corpus_dir`` and drop removed ones."""
+        with self._lock:
+            docs = self.manifest["docs"]
+            corpus_root = os.path.abspath(corpus_dir)
+            seen, changed = set(), []
+            for root, _, files in os.walk(corpus_dir):
+                for filename in files:
+                    if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                        continue
+                    path = os.path.abspath(os.path.join(root, filename))
+                    stat = os.stat(path)
+                    seen.add(path)
+                    meta = docs.get(path)
+                    if meta is None or meta["mtime"] != stat.st_mtime or meta["size"] != stat.st_size:
+                        changed.append((path, stat))
+            # Files under this directory only, not under a sibling that shares its prefix ("corpus2")
+            removed = [path for path in docs
+                       if path not in seen and os.path.commonpath([path, corpus_root]) == corpus_root]
+            if not changed and not removed:
+                return {"indexed": 0, "removed": 0, "documents": len(docs)}
+            for path in removed + [path for path, _ in changed if path in docs]:
+                self.manifest["deleted"].append(docs.pop(path)["id"])
+
+            postings: Dict[str, List] = defaultdict(list)
+            name = f"seg-{self.manifest['next_id'] + len(changed):08d}"
+            texts = bytearray()
+            for path, stat in changed:
+                text = read_document(path)
+                encoded = text.encode("utf-8")
+                terms = tokenize(text)
+                doc_id = self.manifest["next_id"]
+                self.manifest["next_id"] += 1
+                for term, tf in Counter(terms).items():
+                    postings[term].append((doc_id, tf))
+                docs[path] = {
+                    "id": doc_id, "mtime": stat.st_mtime, "size": stat.st_size, "length": len(terms),
+                    "title": os.path.basename(path), "preview": " ".join(text[:_PREVIEW_CHARS].split()),
+                    "text": [name, len(texts), len(texts) + len(encoded)],
+                }
+                texts += encoded
+            if texts:
+                with open(self._path(f"{name}.text"), "wb") as f:
+                    f.write(texts)
+            if postings:
+                self._write_segment(name, postings)
+                self.manifest["segments"].append(name)
+            if len(self.manifest["segments"]) > self.max_segments:
+                self._merge_segments()
+            self._save_manifest()
+            self._load()
+            return {"indexed": len(changed), "removed": len(removed), "documents": len(docs)}
+
+    def _merge_segments(self) -> None:
+        """Rewrite all segments as one, dropping postings of deleted documents."""
+        deleted = np.array(sorted(set(self.manifest["deleted"])), dtype=np.uint32)
+        merged: Dict[str, List] = defaultdict(list)
+        for lexicon, postings in self._segments:
+            for term, (offset, count) in lexicon.items():
+                block = np.asarray(postings[offset:offset + count])
+                keep = block[~np.isin(block["doc"], deleted)]
+                merged[term].extend(zip(keep["doc"].tolist(), keep["tf"].tolist()))
+        # Postings written by the current update are not loaded yet
+        old_segments = self.manifest["segments"]
+        for name in old_segments[len(self._segments):]:
+            with open(self._path(f"{name}.lex.json"), "r", encoding="utf-8") as f:
+                lexicon = json.load(f)
+            postings = np.fromfile(self._path(f"{name}.post"), dtype=_POSTING_DTYPE)
+            for term, (offset, count) in lexicon.items():
+                block = postings[offset:offset + count]
+                keep = block[~np.isin(block["doc"], deleted)]
+                merged[term].extend(zip(keep["doc"].tolist(), keep["tf"].tolist()))
+        self._segments = []
+        name = f"seg-{self.manifest['next_id']:08d}-merged"
+        self._write_segment(name, merged)
+        for old in old_segments:
+            for suffix in (".lex.json", ".post"):
+                try:
+                    os.remove(self._path(old + suffix))
+                except OSError:
+                    pass
+        self.manifest["segments"] = [name]
+        self.manifest["deleted"] = []
+        # Live documents' text moves into the merged segment, so replaced and removed
+        # documents' text goes away with the segments that held it
+        sources: Dict[str, Optional[np.ndarray]] = {}
+        texts = bytearray()
+        for meta in sorted(self.manifest["docs"].values(), key=lambda meta: meta["id"]):
+            if "text" not in meta:
+                continue
+            source, start, end = meta["text"]
+            if source in self._texts:
+                sources[source] = self._texts[source]
+            elif source not in sources:
+                # The current update's text file is not loaded yet
+                text_path = self._path(f"{source}.text")
+                sources[source] = np.fromfile(text_path, dtype=np.uint8) if os.path.exists(text_path) else None
+            if sources[source] is None:
+                del meta["text"]
+                continue
+            meta["text"] = [name, len(texts), len(texts) + end - start]
+            texts += bytes(sources[source][start:end])
+        sources.clear()
+        self._texts = {}
+        if texts:
+            with open(self._path(f"{name}.text"), "wb") as f:
+                f.write(texts)
+        for filename in os.listdir(self.index_dir):
+            if filename.endswith(".text") and filename != f"{name}.text":
+                try:
+                    os.remove(self._path(filename))
+                except OSError:
+                    pass
+
+    # ===== RETRIEVAL =====
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        """Return the top documents for ``query`` as search-result dicts (title, url, content, score)."""
+        if max_results <= 0:
+            return []
+        with self._lock:
+            n_docs = int(self._live.sum())
+            if not n_docs:
+                return []
+            scores = np.zeros(self.manifest["next_id"], dtype=np.float32)
+            terms = set(tokenize(query))
+            for term in terms:
+                blocks = [postings[lexicon[term][0]:lexicon[term][0] + lexicon[term][1]]
+                          for lexicon, postings in self._segments if term in lexicon]
+                if not blocks:
+                    continue
+                block = np.concatenate(blocks) if len(blocks) > 1 else blocks[0]
+                doc_ids = block["doc"].astype(np.int64)
+                live = self._live[doc_ids]
+                doc_ids, tf = doc_ids[live], block["tf"][live].astype(np.float32)
+                if not doc_ids.size:
+                    continue
+                idf = np.log(1 + (n_docs - doc_ids.size + 0.5) / (doc_ids.size + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_ids] / self._avg_length)
+                np.add.at(scores, doc_ids, idf * tf * (self.k1 + 1) / (tf + norm))
+            k = min(max_results, scores.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            results = []
+            for doc_id in top:
+                if scores[doc_id] <= 0:
+                    break
+                path, meta = self._by_id[int(doc_id)]
+                results.append({"title": meta["title"], "url": f"file://{path}",
+                                "content": self._passage(meta, terms), "score": float(scores[doc_id])})
+            return results
+
+    def _passage(self, meta: Dict, terms: set) -> str:
+        # Indexes built before document text was stored only have the leading preview
+        name, start, end = meta.get("text", (None, 0, 0))
+        if name not in self._texts:
+            return meta["preview"]
+        return best_passage(bytes(self._texts[name][start:end]).decode("utf-8", errors="ignore"), terms)
+
+    def __len__(self) -> int:
+        return len(self.manifest["docs"])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build or query the local corpus index.")
+    parser.add_argument("command", choices=["build", "query"])
+    parser.add_argument("target", help="Corpus directory for 'build', query text for 'query'")
+    parser.add_argument("--index", default=os.getenv("LOCAL_CORPUS_INDEX", os.path.join("research_memory", "corpus_index")))
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args(argv)
+    index = LocalCorpusIndex(args.index)
+    if args.command == "build":
+        print(json.dumps(index.update(args.target)))
+    else:
+        for result in index.search(args.target, args.k):
+            print(f"{result['score']:.3f}  {result['url']}")
+
+
+if __name__ == "__main__":
+    main()
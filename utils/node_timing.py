@@ -0,0 +1,17 @@
+"""Per-node durations from a graph's ``stream_mode="tasks"`` events.
+
+Used by the batch runner and the load generator, which report seconds per
+graph node without the profilers of `utils.profiling`.
+"""
+
+import time
+from typing import Dict, List
+
+
+def record_task_event(event: Dict, started: Dict[str, float], node_times: Dict[str, List[float]]) -> None:
+    """Accumulate node durations from ``stream_mode="tasks"`` events (a start event has "input")."""
+    now = time.perf_counter()
+    if "input" in event:
+        started[event["id"]] = now
+    elif event["id"] in started:
+        node_times[event["name"]].append(now - started.pop(event["id"]))
@@ -0,0 +1,183 @@
+"""Opt-in profiling of a single graph run.
+
+`profile_invoke` wraps one `agent.invoke` with:
+- a sampling profiler over the run's threads only: the calling thread and
+  any thread while it runs one of this run's graph nodes (nodes that fan out
+  run in worker threads). Stacks are written as collapsed stacks
+  (``stacks.folded``) that flamegraph.pl, inferno or speedscope render
+  directly; each stack is rooted at the graph node that was running on its
+  thread. Work a node hands to its own pool without passing the run's
+  callbacks is not attributed to the run.
+- `tracemalloc`, with the top allocation sites per node taken from snapshot
+  diffs at node start and end (``allocations.json``); nodes that overlap in
+  time see each other's allocations
+
+`tracemalloc` is process-wide: while a profiled run is in progress, every
+allocation in the process is traced, so concurrent unprofiled sessions run
+slower and their allocations can show up in the per-node diffs. To bound
+that, only one profiled run executes at a time; further profiled runs wait
+for it. Runs without profiling never start tracing.
+
+Files go to ``PROFILE_DIR/<run id>/``. Enable with ``PROFILE_RUNS=true`` or
+the sidebar toggle in the Streamlit app.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+PROFILE_RUNS = os.getenv("PROFILE_RUNS", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Seconds between stack samples
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", "10"))
+
+# Snapshots would otherwise report the profiler's own bookkeeping
+_SNAPSHOT_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+# Leaf frames of pool workers and threads blocked outside any node
+_IDLE_LEAVES = ("_worker (thread.py:", "wait (threading.py:", "_wait_for_tstate_lock (threading.py:")
+# One profiled run at a time: tracemalloc is global to the process
+_PROFILE_LOCK = threading.Lock()
+
+
+class NodeTracker(BaseCallbackHandler):
+    """Tracks which graph node runs on which thread and diffs tracemalloc snapshots per node."""
+
+    def __init__(self, top_allocations: int = PROFILE_TOP_ALLOCATIONS):
+        self.top_allocations = top_allocations
+        self.thread_nodes: Dict[int, str] = {}
+        self.allocations: Dict[str, List[Dict[str, Any]]] = {}
+        self._runs: Dict[Any, Tuple[str, int, tracemalloc.Snapshot]] = {}
+        self._lock = threading.Lock()
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        thread_id = threading.get_ident()
+        # A node's own runnable shares its name; skip it when the node is already active on this thread
+        if not node or kwargs.get("name") != node or self.thread_nodes.get(thread_id) == node:
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS) if tracemalloc.is_tracing() else None
+        with self._lock:
+            self.thread_nodes[thread_id] = node
+            self._runs[run_id] = (node, thread_id, snapshot)
+
+    def _finish(self, run_id) -> None:
+        with self._lock:
+            entry = self._runs.pop(run_id, None)
+            if entry is None:
+                return
+            node, thread_id, before = entry
+            self.thread_nodes.pop(thread_id, None)
+        if before is None:
+            return
+        stats = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS).compare_to(before, "lineno")
+        sites = [
+            {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             "size_kb": round(stat.size_diff / 1024, 1), "count": stat.count_diff}
+            for stat in stats if stat.size_diff > 0
+        ][:self.top_allocations]
+        with self._lock:
+            self.allocations.setdefault(node, []).extend(sites)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+
+class StackSampler:
+    """Samples the Python stacks of the profiled run's threads into collapsed-stack counts."""
+
+    def __init__(self, tracker: NodeTracker, interval: float = PROFILE_SAMPLE_INTERVAL,
+                 owner: Optional[int] = None):
+        self.tracker = tracker
+        self.interval = interval
+        # Thread that invoked the run; sampled even when no node is active on it
+        self.owner = owner if owner is not None else threading.get_ident()
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                # Other sessions' threads are not part of this run
+                if thread_id != self.owner and thread_id not in self.tracker.thread_nodes:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                node = self.tracker.thread_nodes.get(thread_id)
+                if node is None and stack and stack[0].startswith(_IDLE_LEAVES):
+                    continue
+                root = node or f"thread:{names.get(thread_id, thread_id)}"
+                self.counts[";".join([root] + stack[::-1])] += 1
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def profile_invoke(agent, state, config: Dict, run_id: Optional[str] = None, output_dir: Optional[str] = None):
+    """Run ``agent.invoke(state, config)`` under the profilers.
+
+    Returns ``(result, profile)`` where ``profile`` holds the output paths,
+    wall time, per-node allocation sites and the peak traced memory. Waits
+    while another profiled run is in progress.
+    """
+    run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    run_dir = os.path.join(output_dir or PROFILE_DIR, run_id)
+    os.makedirs(run_dir, exist_ok=True)
+
+    tracker = NodeTracker()
+    sampler = StackSampler(tracker)
+    config = {**config, "callbacks": list(config.get("callbacks") or []) + [tracker]}
+    with _PROFILE_LOCK:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        sampler.start()
+        begin = time.perf_counter()
+        try:
+            result = agent.invoke(state, config=config)
+        finally:
+            elapsed = time.perf_counter() - begin
+            sampler.stop()
+            _, peak = tracemalloc.get_traced_memory()
+            if not was_tracing:
+                tracemalloc.stop()
+
+    profile = {
+        "run_id": run_id,
+        "wall_seconds": round(elapsed, 3),
+        "peak_traced_mb": round(peak / 2**20, 1),
+        "samples": sum(sampler.counts.values()),
+        "stacks_path": os.path.join(run_dir, "stacks.folded"),
+        "allocations_path": os.path.join(run_dir, "allocations.json"),
+        "allocations": tracker.allocations,
+    }
+    sampler.write_folded(profile["stacks_path"])
+    with open(profile["allocations_path"], "w", encoding="utf-8") as f:
+        json.dump({k: v for k, v in profile.items() if k != "allocations"} | {"nodes": tracker.allocations}, f, indent=2)
+    return result, profile
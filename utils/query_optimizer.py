@@ -0,0 +1,170 @@
+"""Search queries for a research plan.
+
+`plan_research` returns steps such as "Analyze the data to identify trends in
+coffee export volumes", and gathering used to search every step's description
+verbatim. `optimize_plan` sits between the two:
+
+- steps whose ``action`` produces output (summarize, write, chart, ...) are
+  dropped; analysis steps (analyze, compare, ...) are dropped unless they
+  bring up at least two terms that the retrieval steps do not cover
+- each remaining description becomes a keyword query: instruction verbs,
+  filler and stopwords are removed and at most ``max_terms`` terms are kept,
+  in their original order and casing
+- queries whose terms overlap by at least ``min_overlap`` (share of the
+  smaller query) are merged, as long as the merged query still fits in
+  ``max_terms``, so merging never drops a term
+
+Check searches per plan and term coverage on the fixture plans in
+``utils/fixtures/research_plans.jsonl``::
+
+    python -m utils.query_optimizer
+"""
+
+import re
+from typing import List, Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+from utils.research_memory import tokenize
+
+_WORD_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9&+/.'-]*[A-Za-z0-9]|[A-Za-z0-9]")
+
+# Actions that fetch information; actions that produce output from what was fetched and
+# never search; and analysis actions, which search only for what the searches miss.
+# An action with none of these words is treated as retrieval.
+RETRIEVAL_ACTIONS = {
+    "search", "research", "gather", "find", "collect", "collection", "look", "lookup", "investigate",
+    "explore", "review", "retrieve", "query", "browse", "fetch", "survey", "read", "identify",
+}
+OUTPUT_ACTIONS = {
+    "summarize", "summarise", "summary", "synthesize", "synthesise", "synthesis", "compile", "write", "draft",
+    "report", "visualize", "visualise", "visualization", "visualisation", "chart", "graph", "plot", "draw",
+    "present", "presentation", "conclude", "conclusion", "recommend", "recommendation", "organize", "format",
+}
+ANALYSIS_ACTIONS = {
+    "analyze", "analyse", "analysis", "evaluate", "evaluation", "assess", "assessment", "compare", "comparison",
+    "calculate", "compute", "interpret", "rank",
+}
+# Words that describe the task rather than what to search for
+_FILLER = RETRIEVAL_ACTIONS | OUTPUT_ACTIONS | ANALYSIS_ACTIONS | {
+    "data", "information", "info", "sources", "source", "relevant", "key", "various", "different", "including",
+    "such", "using", "based", "current", "latest", "recent", "also", "across", "between", "within", "each",
+    "any", "all", "other", "more", "most", "them", "its", "they", "there", "these", "those", "over", "per",
+    "well", "like", "provide", "overview", "detailed", "comprehensive", "specific", "particular", "focus",
+    "focusing", "step", "results", "findings", "then", "make", "create", "prepare", "use", "used", "has",
+    "have", "been", "was", "were", "can", "could", "should", "would", "may", "might", "do", "does", "not",
+    "if", "when", "where", "who", "why", "than", "so", "only", "both", "via", "etc", "e.g", "i.e",
+    "determine", "understand", "examine", "measuring", "measured", "up", "out", "get", "list",
+    "bar", "line", "pie", "graphs", "charts", "final", "into", "time", "found", "gathered", "collected",
+    "main", "overall", "previous",
+}
+
+
+class PlannedQuery(BaseModel):
+    query: str = Field(..., description="Keyword search query")
+    steps: List[int] = Field(..., description="Numbers of the plan steps this query covers")
+
+
+def _stem(word: str) -> str:
+    """Lowercase, without a plural or possessive ``s``, so "prices" matches "price"."""
+    word = word.lower()
+    if word.endswith("'s"):
+        return word[:-2]
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "is", "us")) else word
+
+
+def step_kind(action: str) -> str:
+    """``retrieval``, ``analysis`` or ``output`` for a plan step's ``action``."""
+    terms = {_stem(term) for term in tokenize(action)}
+    if terms & RETRIEVAL_ACTIONS:
+        return "retrieval"
+    if terms & OUTPUT_ACTIONS:
+        return "output"
+    return "analysis" if terms & ANALYSIS_ACTIONS else "retrieval"
+
+
+def keyword_terms(description: str) -> List[str]:
+    """Content words of a step description, in order, without duplicates (case-insensitive)."""
+    terms, seen = [], set()
+    for word in _WORD_RE.findall(description or ""):
+        key = _stem(word)
+        if key in seen or word.lower() in _FILLER or not tokenize(key):
+            continue
+        seen.add(key)
+        terms.append(word)
+    return terms
+
+
+def _keys(terms: Sequence[str]) -> set:
+    return {_stem(term) for term in terms}
+
+
+def optimize_plan(steps, max_terms: int = 10, min_overlap: float = 0.6, min_coverage: float = 0.5) -> List[PlannedQuery]:
+    """Keyword queries for the plan steps that need a search, with overlapping steps merged."""
+    candidates = [(step, step_kind(step.action), keyword_terms(step.description)) for step in steps]
+    retrieval = [(step, terms) for step, kind, terms in candidates if kind == "retrieval" and terms]
+    covered = set().union(*(_keys(terms) for _, terms in retrieval)) if retrieval else set()
+    for step, kind, terms in candidates:
+        # An analysis step only needs its own search when it brings up something no search covers
+        # ("trends" alone is not a subject)
+        new_terms = _keys(terms) - covered
+        if kind == "analysis" and len(new_terms) >= 2 and 1 - len(new_terms) / len(_keys(terms)) < min_coverage:
+            retrieval.append((step, terms))
+    retrieval.sort(key=lambda pair: pair[0].step_number)
+
+    groups: List[tuple] = []
+    for step, terms in retrieval:
+        terms = terms[:max_terms]
+        for group in groups:
+            group_terms, group_steps = group
+            shared = len(_keys(terms) & _keys(group_terms))
+            merged = group_terms + [t for t in terms if _stem(t) not in _keys(group_terms)]
+            if shared / min(len(terms), len(group_terms)) >= min_overlap and len(merged) <= max_terms:
+                group_terms[:] = merged
+                group_steps.append(step.step_number)
+                break
+        else:
+            groups.append((list(terms), [step.step_number]))
+    return [PlannedQuery(query=" ".join(terms), steps=group_steps) for terms, group_steps in groups]
+
+
+def _coverage(found: int, needed: int) -> str:
+    # A plan without retrieval steps has no terms to cover
+    return f"{found / needed:8.1%}" if needed else f"{'n/a':>8s}"
+
+
+def _benchmark(path: Optional[str] = None) -> None:
+    """Searches per fixture plan with one search per step against optimized queries, and term coverage."""
+    import json
+    import os
+
+    from agents.state import ResearchPlan
+
+    path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "research_plans.jsonl")
+    with open(path, "r", encoding="utf-8") as f:
+        plans = [ResearchPlan(**json.loads(line)) for line in f if line.strip()]
+    total_before = total_after = total_terms = total_covered = 0
+    print(f"{'plan':32s} {'steps':>5s} {'searches':>8s} {'coverage':>8s}")
+    for plan in plans:
+        queries = optimize_plan(plan.steps)
+        # Coverage: content terms of every retrieval step that appear in the query that covers it
+        terms_needed = terms_found = 0
+        for step in plan.steps:
+            if step_kind(step.action) != "retrieval":
+                continue
+            needed = _keys(keyword_terms(step.description))
+            query = next((q for q in queries if step.step_number in q.steps), None)
+            terms_needed += len(needed)
+            terms_found += len(needed & _keys(query.query.split())) if query else 0
+        total_before += len(plan.steps)
+        total_after += len(queries)
+        total_terms += terms_needed
+        total_covered += terms_found
+        print(f"{plan.topic[:32]:32s} {len(plan.steps):5d} {len(queries):8d} {_coverage(terms_found, terms_needed)}")
+        for query in queries:
+            print(f"    {query.steps} {query.query}")
+    print(f"{'total':32s} {total_before:5d} {total_after:8d} {_coverage(total_covered, total_terms)}")
+
+
+if __name__ == "__main__":
+    _benchmark()
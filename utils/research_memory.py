@@ -0,0 +1,221 @@
+"""Local retrieval memory over past research runs.
+
+Gathered information items and finished reports are appended to a JSON Lines
+file and indexed with BM25 so that later runs can reuse them instead of
+searching the web again for a topic that was researched recently. Entries
+older than ``max_age_days`` are never recalled; they are dropped when the file
+is loaded and, once they make up a quarter of the index, the index and the
+file are rebuilt without them.
+"""
+
+import bisect
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from agents.state import InformationItem
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "i",
+    "in", "is", "it", "me", "of", "on", "or", "that", "the", "this", "to",
+    "want", "what", "which", "with", "about", "into", "their", "will",
+}
+# Snippet `SearchTool.format_search_results` returns for an empty or failed search
+_FAILED_SEARCH_PREFIXES = ("No results found", "Search failed")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on non-alphanumerics and drop stopwords."""
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+class MemoryHit(BaseModel):
+    kind: str = Field(..., description="'item' for a gathered snippet, 'report' for a finished report")
+    query: str = Field(..., description="The query or topic the entry was stored under")
+    source: str = Field(default="", description="The source name or URL")
+    text: str = Field(..., description="The stored snippet or report summary")
+    stored_at: float = Field(..., description="Unix timestamp of when the entry was stored")
+    score: float = Field(..., description="BM25 score of the entry for the lookup query")
+    coverage: float = Field(..., description="IDF-weighted share of query terms found in the entry (0-1)")
+
+
+class ResearchMemory:
+    """BM25 index over previously gathered items and reports, persisted to disk.
+
+    Ranking uses BM25; whether a hit is good enough to replace a web search is
+    decided by ``coverage`` (the IDF-weighted fraction of query terms that occur
+    in the entry), which is bounded to 0-1 and so can carry a fixed threshold.
+    """
+
+    def __init__(self, path: Optional[str] = None, min_coverage: float = 0.75,
+                 max_age_days: float = 7.0, k1: float = 1.5, b: float = 0.75, enabled: bool = True):
+        self.enabled = enabled
+        self.path = path if enabled else None
+        self.min_coverage = min_coverage
+        self.max_age_days = max_age_days
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._docs: List[Dict] = []
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._lengths: List[int] = []
+        # Parallel to _docs, in insertion (and so storage time) order
+        self._stored_at: List[float] = []
+        self._seen = set()
+        if self.path and os.path.exists(self.path):
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> "ResearchMemory":
+        """Build the memory from ``RESEARCH_MEMORY_*`` environment variables."""
+        if os.getenv("RESEARCH_MEMORY_ENABLED", "true").lower() in ("0", "false", "no"):
+            return cls(enabled=False)
+        return cls(
+            path=os.getenv("RESEARCH_MEMORY_PATH", os.path.join("research_memory", "memory.jsonl")),
+            min_coverage=float(os.getenv("RESEARCH_MEMORY_MIN_COVERAGE", "0.75")),
+            max_age_days=float(os.getenv("RESEARCH_MEMORY_MAX_AGE_DAYS", "7")),
+        )
+
+    # ===== INDEXING =====
+
+    def _index(self, doc: Dict) -> bool:
+        key = (doc["kind"], doc["query"], doc["source"], doc["text"])
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        doc_id = len(self._docs)
+        terms = tokenize(doc["query"] + " " + doc["text"])
+        self._docs.append(doc)
+        self._lengths.append(len(terms))
+        self._stored_at.append(doc["stored_at"])
+        for term, tf in Counter(terms).items():
+            self._postings[term][doc_id] = tf
+        return True
+
+    def _cutoff(self) -> float:
+        return time.time() - self.max_age_days * 86400
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            content = f.read()
+        # Memories written before the JSON Lines format are a single JSON array
+        docs = json.loads(content) if content.lstrip().startswith("[") else [
+            json.loads(line) for line in content.splitlines() if line.strip()]
+        cutoff = self._cutoff()
+        for doc in sorted(docs, key=lambda d: d["stored_at"]):
+            if doc["stored_at"] >= cutoff:
+                self._index(doc)
+        if len(self._docs) < len(docs):
+            self._rewrite()
+
+    def _reset(self) -> None:
+        self._docs, self._lengths, self._stored_at = [], [], []
+        self._postings = defaultdict(dict)
+        self._seen = set()
+
+    def _prune(self) -> None:
+        """Drop expired entries once they are a quarter of the index, then rewrite the file."""
+        expired = bisect.bisect_left(self._stored_at, self._cutoff())
+        if not expired or expired * 4 < len(self._docs):
+            return
+        fresh = self._docs[expired:]
+        self._reset()
+        for doc in fresh:
+            self._index(doc)
+        self._rewrite()
+
+    def _add(self, docs: List[Dict]) -> None:
+        with self._lock:
+            self._prune()
+            added = [doc for doc in docs if self._index(doc)]
+            self._append(added)
+
+    def add_items(self, items: List[InformationItem]) -> None:
+        """Store gathered items that came from a live search; failed and empty searches are skipped."""
+        if not self.enabled:
+            return
+        now = time.time()
+        self._add([
+            {"kind": "item", "query": item.query, "source": item.source, "text": item.snippet, "stored_at": now}
+            for item in items
+            if item.snippet and not item.snippet.startswith(_FAILED_SEARCH_PREFIXES)
+            and not (item.metadata or {}).get("from_memory") and not (item.metadata or {}).get("error")
+        ])
+
+    def add_report(self, topic: str, report: Dict) -> None:
+        """Store the summary and key findings of a finished report."""
+        if not self.enabled:
+            return
+        text = "\n".join([report.get("summary") or ""] + list(report.get("key_findings") or []))
+        self._add([{"kind": "report", "query": topic, "source": report.get("topic", ""),
+                    "text": text, "stored_at": time.time()}])
+
+    def _append(self, docs: List[Dict]) -> None:
+        if not self.path or not docs:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(doc) + "\n" for doc in docs))
+
+    def _rewrite(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("".join(json.dumps(doc) + "\n" for doc in self._docs))
+        os.replace(tmp_path, self.path)
+
+    # ===== RETRIEVAL =====
+
+    def _idf(self, term: str) -> float:
+        n = len(self._docs)
+        df = len(self._postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 5, kind: Optional[str] = None) -> List[MemoryHit]:
+        """Return the top-k fresh entries for ``query`` ranked by BM25."""
+        terms = set(tokenize(query))
+        if not self.enabled or not terms or not self._docs:
+            return []
+        with self._lock:
+            if not self._lengths:
+                return []
+            avg_len = sum(self._lengths) / len(self._lengths)
+            cutoff = self._cutoff()
+            idf = {t: self._idf(t) for t in terms}
+            total_idf = sum(idf.values()) or 1.0
+            scores: Dict[int, float] = defaultdict(float)
+            matched: Dict[int, float] = defaultdict(float)
+            for term in terms:
+                for doc_id, tf in self._postings.get(term, {}).items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_len)
+                    scores[doc_id] += idf[term] * tf * (self.k1 + 1) / (tf + norm)
+                    matched[doc_id] += idf[term]
+            hits = []
+            for doc_id in sorted(scores, key=scores.get, reverse=True):
+                doc = self._docs[doc_id]
+                if doc["stored_at"] < cutoff or (kind and doc["kind"] != kind):
+                    continue
+                hits.append(MemoryHit(score=scores[doc_id], coverage=matched[doc_id] / total_idf, **doc))
+                if len(hits) >= k:
+                    break
+            return hits
+
+    def recall(self, query: str, k: int = 5, kind: Optional[str] = None) -> List[MemoryHit]:
+        """Return fresh hits whose coverage of ``query`` meets the reuse threshold."""
+        return [h for h in self.search(query, k=k, kind=kind) if h.coverage >= self.min_coverage]
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+
+research_memory = ResearchMemory.from_env()
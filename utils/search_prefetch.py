@@ -0,0 +1,189 @@
+"""Speculative search prefetch while scoping runs.
+
+A few candidate queries are derived locally from the raw user message and
+searched in the background while the scoping LLM calls are in flight.
+`gather_information` then claims any prefetched result whose query is covered
+by a plan step; unclaimed results are discarded.
+"""
+
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from utils.research_memory import tokenize
+
+_ENTITY_RE = re.compile(r"\b[A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*")
+_FILLER = {"best", "top", "report", "research", "show", "find", "give", "tell", "list", "please", "graph", "chart"}
+
+
+def candidate_queries(text: str, limit: int = 3) -> List[str]:
+    """Derive up to ``limit`` keyword/entity search queries from a raw request."""
+    keywords = tokenize(text)
+    if not keywords:
+        return []
+    # Entities are capitalised spans that are not just the sentence-initial word
+    entities = [m.group(0) for m in _ENTITY_RE.finditer(text) if m.start() > 0 and m.group(0).lower() not in _FILLER]
+    core = [w for w in keywords if w not in _FILLER] or keywords
+    candidates = [" ".join(keywords[:8]), " ".join(core[:6])]
+    for entity in entities:
+        entity_terms = set(tokenize(entity))
+        candidates.append(" ".join([entity] + [w for w in core if w not in entity_terms][:3]))
+    unique, seen = [], set()
+    for query in candidates:
+        key = frozenset(tokenize(query))
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(query)
+    return unique[:limit]
+
+
+class SearchPrefetcher:
+    """Background searches keyed by run (thread id), claimed by matching plan-step queries.
+
+    A prefetched query matches a plan-step query when at least ``min_overlap``
+    of the terms of each query occur in the other, so a short generic prefetch
+    never stands in for a more specific step. Each prefetched result is used at
+    most once.
+    """
+
+    def __init__(self, search: Callable[[str], str], asearch: Callable[[str], Awaitable[str]],
+                 max_queries: int = 3, min_overlap: float = 0.6, max_workers: int = 8, ttl_seconds: float = 600):
+        self.search = search
+        self.asearch = asearch
+        self.max_queries = max_queries
+        self.min_overlap = min_overlap
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        # run key -> list of (query, future or task, started_at, completed_at box)
+        self._pending: Dict[str, List[Tuple[str, object, float, list]]] = {}
+        self._stats = {"prefetched": 0, "hits": 0, "discarded": 0, "saved_seconds": 0.0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_queries > 0
+
+    def _register(self, key: str, entries: List[Tuple[str, object, float, list]]) -> None:
+        now = time.time()
+        with self._lock:
+            for stale_key in [k for k, v in self._pending.items() if v and now - v[0][2] > self.ttl_seconds]:
+                self._discard(self._pending.pop(stale_key))
+            self._pending[key] = entries
+            self._stats["prefetched"] += len(entries)
+
+    def start(self, key: str, text: str) -> List[str]:
+        """Start background searches in worker threads for sync graph runs."""
+        queries = candidate_queries(text, self.max_queries) if self.enabled else []
+
+        def timed(query: str, completed: list) -> str:
+            result = self.search(query)
+            completed.append(time.time())
+            return result
+
+        entries = []
+        for query in queries:
+            completed: list = []
+            entries.append((query, self._executor.submit(timed, query, completed), time.time(), completed))
+        self._register(key, entries)
+        return queries
+
+    def astart(self, key: str, text: str) -> List[str]:
+        """Start background searches as tasks on the running event loop for async graph runs."""
+        queries = candidate_queries(text, self.max_queries) if self.enabled else []
+
+        async def timed(query: str, completed: list) -> str:
+            result = await self.asearch(query)
+            completed.append(time.time())
+            return result
+
+        entries = []
+        for query in queries:
+            completed: list = []
+            entries.append((query, asyncio.ensure_future(timed(query, completed)), time.time(), completed))
+        self._register(key, entries)
+        return queries
+
+    def _match(self, key: str, queries: List[str]):
+        """Pop the run's prefetches and pair each plan query with at most one of them."""
+        with self._lock:
+            entries = self._pending.pop(key, [])
+        matches, used = {}, set()
+        for query in queries:
+            step_terms = set(tokenize(query))
+            best, best_overlap = None, self.min_overlap
+            for idx, (prefetched, _, _, _) in enumerate(entries):
+                terms = set(tokenize(prefetched))
+                shared = len(terms & step_terms)
+                overlap = min(shared / len(terms), shared / len(step_terms)) if terms and step_terms else 0.0
+                if idx not in used and overlap >= best_overlap:
+                    best, best_overlap = idx, overlap
+            if best is not None:
+                used.add(best)
+                matches[query] = entries[best]
+        leftovers = [entry for idx, entry in enumerate(entries) if idx not in used]
+        return matches, leftovers
+
+    def _discard(self, entries) -> None:
+        # Caller holds the lock
+        for _, handle, _, _ in entries:
+            handle.cancel()
+        self._stats["discarded"] += len(entries)
+
+    def _record(self, started_at: float, completed: list, claimed_at: float) -> None:
+        # Saved latency is the part of the search that ran before gathering asked for it
+        finished_at = completed[0] if completed else claimed_at
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats["saved_seconds"] += max(0.0, min(finished_at, claimed_at) - started_at)
+
+    def claim(self, key: str, queries: List[str]) -> Dict[str, str]:
+        """Return prefetched results for the plan queries they match, waiting if still running."""
+        matches, leftovers = self._match(key, queries)
+        with self._lock:
+            self._discard(leftovers)
+        results = {}
+        claimed_at = time.time()
+        for query, (_, future, started_at, completed) in matches.items():
+            try:
+                results[query] = future.result()
+            except Exception:
+                continue
+            self._record(started_at, completed, claimed_at)
+        return results
+
+    async def aclaim(self, key: str, queries: List[str]) -> Dict[str, str]:
+        """Async variant of `claim` for prefetches started with `astart`."""
+        matches, leftovers = self._match(key, queries)
+        with self._lock:
+            self._discard(leftovers)
+        results = {}
+        claimed_at = time.time()
+        for query, (_, task, started_at, completed) in matches.items():
+            try:
+                if not isinstance(task, asyncio.Future):
+                    task = asyncio.wrap_future(task)
+                results[query] = await task
+            except Exception:
+                continue
+            self._record(started_at, completed, claimed_at)
+        return results
+
+    def discard(self, key: str) -> None:
+        """Cancel and drop the run's prefetches, e.g. when it ends without gathering."""
+        with self._lock:
+            self._discard(self._pending.pop(key, []))
+
+    def pending(self) -> int:
+        """Number of runs whose prefetches have not been claimed or discarded yet."""
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self) -> Dict[str, float]:
+        """Cumulative prefetch counters, including the hit rate over all prefetched queries."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["hit_rate"] = stats["hits"] / stats["prefetched"] if stats["prefetched"] else 0.0
+        return stats
@@ -0,0 +1,200 @@
+"""Single-flight coalescing of identical concurrent calls.
+
+When several sessions research the same topic at once, or a plan repeats a
+step, identical searches and identical temperature-0 prompts are in flight at
+the same time. `SingleFlight` lets the first caller for a key make the call;
+callers arriving while it is in flight wait for it and receive a copy of its
+result (or its exception) instead of issuing their own. Nothing is cached:
+the key is released as soon as the call finishes.
+
+Sync callers (threads) and async callers (tasks on one event loop) coalesce
+separately, since a thread cannot await another loop's future.
+
+`CoalescingModel` applies this to a chat model, keyed by the model, output
+schema, bound tools, call options and input messages. Only the leader's call
+reaches the model, so followers report their wait to their own callbacks as a
+chat-model run marked ``coalesced``, whose output carries no token usage.
+`stats()` counts calls, coalesced calls and calls currently in flight. Disable
+with ``SINGLE_FLIGHT=false``.
+"""
+
+import asyncio
+import copy
+import json
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import (
+    ensure_config,
+    get_async_callback_manager_for_config,
+    get_callback_manager_for_config,
+)
+from pydantic import BaseModel
+
+from utils.cassettes import input_messages, messages_key, request_hash
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self._counts = {"calls": 0, "coalesced": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], follow: Optional[Callable[[Callable[[], Any]], Any]] = None) -> Any:
+        """Run ``fn()`` unless a call with ``key`` is in flight in another thread; then share its outcome.
+
+        A follower calls ``follow(wait)`` instead of ``wait()`` when given, so it
+        can report the wait (e.g. to its callbacks) around the shared result.
+        """
+        with self._lock:
+            self._counts["calls"] += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self._counts["coalesced"] += 1
+        if not leader:
+            # Callers may mutate what they get back, so followers receive their own copy
+            wait = lambda: copy.deepcopy(future.result())
+            return follow(wait) if follow else wait()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]],
+                  follow: Optional[Callable[[Callable[[], Awaitable[Any]]], Awaitable[Any]]] = None) -> Any:
+        """Async variant of `do` for callers on the same event loop."""
+        loop_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            self._counts["calls"] += 1
+            task = self._tasks.get(loop_key)
+            leader = task is None
+            if leader:
+                task = self._tasks[loop_key] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda _: self._release(loop_key))
+            else:
+                self._counts["coalesced"] += 1
+        if leader:
+            # Shielded, so a cancelled caller does not cancel the call the others are waiting on
+            return await asyncio.shield(task)
+
+        async def wait():
+            return copy.deepcopy(await asyncio.shield(task))
+        return await (follow(wait) if follow else wait())
+
+    def _release(self, loop_key) -> None:
+        with self._lock:
+            self._tasks.pop(loop_key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counts, "in_flight": len(self._calls) + len(self._tasks)}
+
+
+class CoalescingModel(Runnable):
+    """Chat model wrapper that shares one in-flight call among identical concurrent requests."""
+
+    def __init__(self, flights: SingleFlight, model, name: str, schema: Any = None, tools: Sequence = (),
+                 schema_kwargs: Optional[Dict] = None, tool_kwargs: Optional[Dict] = None):
+        self.flights = flights
+        self.model = model
+        self.name = name
+        self.schema = schema
+        self.tools = tuple(tools)
+        # Options such as include_raw, method or tool_choice, passed on and part of the key
+        self.schema_kwargs = dict(schema_kwargs or {})
+        self.tool_kwargs = dict(tool_kwargs or {})
+
+    def _target(self):
+        target = self.model
+        if self.tools:
+            target = target.bind_tools(list(self.tools), **self.tool_kwargs)
+        if self.schema is not None:
+            target = target.with_structured_output(self.schema, **self.schema_kwargs)
+        return target
+
+    def bind_tools(self, tools, **kwargs):
+        return CoalescingModel(self.flights, self.model, self.name, self.schema, tools, self.schema_kwargs, kwargs)
+
+    def with_structured_output(self, schema, **kwargs):
+        return CoalescingModel(self.flights, self.model, self.name, schema, self.tools, kwargs, self.tool_kwargs)
+
+    def _key(self, input, kwargs: Dict) -> str:
+        return request_hash({
+            "model": self.name,
+            "schema": getattr(self.schema, "__name__", None),
+            "tools": [getattr(tool, "name", str(tool)) for tool in self.tools],
+            "options": [self.schema_kwargs, self.tool_kwargs],
+            # Call options such as stop change the reply; callbacks only observe it
+            "kwargs": {k: v for k, v in kwargs.items() if k != "callbacks"},
+            "messages": messages_key(input),
+        })
+
+    def _follower_start(self, input) -> Dict:
+        # Arguments for a follower's chat-model run in its own callbacks
+        return {"serialized": {"name": self.name}, "messages": [input_messages(input)],
+                "name": self.name, "invocation_params": {"coalesced": True}}
+
+    def invoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+
+        def follow(wait):
+            run_manager, = get_callback_manager_for_config(config).on_chat_model_start(**self._follower_start(input))
+            try:
+                result = wait()
+            except BaseException as e:
+                run_manager.on_llm_error(e)
+                raise
+            run_manager.on_llm_end(_shared_llm_result(result))
+            return result
+
+        return self.flights.do(self._key(input, kwargs), lambda: self._target().invoke(input, config, **kwargs), follow)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+
+        async def follow(wait):
+            callback_manager = get_async_callback_manager_for_config(config)
+            run_manager, = await callback_manager.on_chat_model_start(**self._follower_start(input))
+            try:
+                result = await wait()
+            except BaseException as e:
+                await run_manager.on_llm_error(e)
+                raise
+            await run_manager.on_llm_end(_shared_llm_result(result))
+            return result
+
+        return await self.flights.ado(self._key(input, kwargs), lambda: self._target().ainvoke(input, config, **kwargs), follow)
+
+
+def _shared_llm_result(result: Any) -> LLMResult:
+    """Callback output for a follower: the shared reply, without the leader's token usage."""
+    if isinstance(result, dict) and isinstance(result.get("raw"), BaseMessage):
+        message = result["raw"]
+    elif isinstance(result, BaseMessage):
+        message = result
+    elif isinstance(result, BaseModel):
+        message = AIMessage(content=result.model_dump_json())
+    else:
+        message = AIMessage(content=json.dumps(result, default=str))
+    if isinstance(message, AIMessage):
+        # The follower spent no tokens; only the leader's run carries usage
+        message = message.model_copy(update={"usage_metadata": None, "response_metadata": {}})
+    return LLMResult(generations=[[ChatGeneration(message=message)]], llm_output={"coalesced": True})
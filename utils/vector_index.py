@@ -0,0 +1,122 @@
+"""In-process vector index for gathered snippets.
+
+Snippets are embedded locally with hashed TF-IDF (no network, no model
+download) into a NumPy matrix, so retrieving the top-k snippets for a report
+section is a single matrix-vector product.
+"""
+
+import re
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from agents.state import InformationItem
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_URL_RE = re.compile(r"URL:\s*(\S+)")
+
+
+def _bucket(token: str, dim: int) -> int:
+    return zlib.crc32(token.encode("utf-8")) % dim
+
+
+def split_snippet(item: InformationItem) -> List[InformationItem]:
+    """Split an item into index entries: its extracted findings if any, else one per result block."""
+    findings = (item.metadata or {}).get("findings")
+    if findings:
+        return [
+            InformationItem(query=item.query, source=item.source, snippet=finding, metadata=item.metadata)
+            for finding in findings
+        ]
+    blocks = [b.strip() for b in re.split(r"\n\s*\n", item.snippet or "") if b.strip()]
+    if len(blocks) <= 1:
+        return [item]
+    chunks = []
+    for block in blocks:
+        if block.startswith("Search results for"):
+            continue
+        url = _URL_RE.search(block)
+        chunks.append(InformationItem(
+            query=item.query,
+            source=url.group(1) if url else item.source,
+            snippet=block,
+            metadata=item.metadata,
+        ))
+    return chunks or [item]
+
+
+class SnippetIndex:
+    """Hashed TF-IDF index over ``InformationItem`` snippets.
+
+    Rows hold L2-normalised log term frequencies; IDF is tracked per hash
+    bucket and applied on the query side, so adding snippets never requires
+    re-weighting the stored matrix. The matrix is column-major so a query only
+    touches the few contiguous columns of the buckets its terms hash to.
+    """
+
+    def __init__(self, dim: int = 1024, capacity: int = 1024):
+        self.dim = dim
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32, order="F")
+        self._df = np.zeros(dim, dtype=np.float32)
+        self._size = 0
+        self.items: List[InformationItem] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _term_vector(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN_RE.findall((text or "").lower()):
+            vec[_bucket(token, self.dim)] += 1.0
+        np.log1p(vec, out=vec)
+        return vec
+
+    def add(self, items: Iterable[InformationItem]) -> None:
+        """Embed and append items, growing the matrix by doubling when full."""
+        rows, kept = [], []
+        for item in items:
+            vec = self._term_vector(f"{item.query} {item.snippet}")
+            norm = float(np.linalg.norm(vec))
+            if norm == 0.0:
+                continue
+            rows.append(vec / norm)
+            kept.append(item)
+        if not rows:
+            return
+        needed = self._size + len(rows)
+        if needed > self._matrix.shape[0]:
+            capacity = self._matrix.shape[0]
+            while capacity < needed:
+                capacity *= 2
+            grown = np.zeros((capacity, self.dim), dtype=np.float32, order="F")
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+        block = np.stack(rows)
+        self._matrix[self._size:needed] = block
+        self._df += (block > 0).sum(axis=0)
+        self._size = needed
+        self.items.extend(kept)
+
+    def query(self, text: str, k: int = 4) -> List[Tuple[InformationItem, float]]:
+        """Return up to ``k`` items most similar to ``text`` with their scores."""
+        if self._size == 0:
+            return []
+        idf = np.log((1.0 + self._size) / (1.0 + self._df)) + 1.0
+        q = self._term_vector(text)
+        cols = np.flatnonzero(q)
+        if cols.size == 0:
+            return []
+        weights = q[cols] * idf[cols] * idf[cols]
+        scores = self._matrix[:self._size, cols] @ weights
+        k = min(k, self._size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.items[i], float(scores[i])) for i in top if scores[i] > 0]
+
+
+def build_index(items: Iterable[InformationItem], dim: Optional[int] = None) -> SnippetIndex:
+    """Index gathered items, splitting multi-result snippets into separate entries."""
+    index = SnippetIndex(dim=dim or 1024)
+    index.add(chunk for item in items for chunk in split_snippet(item))
+    return index